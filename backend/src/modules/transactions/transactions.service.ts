@@ -3,6 +3,9 @@ import * as admin from 'firebase-admin';
 import { ConfigService } from '../../config/config.service';
 import { TelegramNotificationService } from '../../lib/telegram-notification.service';
 
+// Must match STATS_SHARD_COUNT used by the bot
+const STATS_SHARD_COUNT = parseInt(process.env.STATS_SHARD_COUNT || '10', 10);
+
 @Injectable()
 export class TransactionsService {
   private db: admin.firestore.Firestore;
@@ -65,7 +68,14 @@ export class TransactionsService {
       };
       
        
-      await depositRef.set(depositDoc);
+      // Create the deposit and count it in the statistics atomically
+      const batch = this.db.batch();
+      batch.set(depositRef, depositDoc);
+      this.incrementStatistics(batch, {
+        pending_deposits_count: 1,
+        total_deposit_amount: Number(depositData.amount) || 0
+      });
+      await batch.commit();
       
       
       // Send admin notification
@@ -122,7 +132,14 @@ export class TransactionsService {
         created_at: admin.firestore.FieldValue.serverTimestamp(),
         updated_at: admin.firestore.FieldValue.serverTimestamp(),
       };
-      await withdrawalRef.set(withdrawalDoc);
+      // Create the withdrawal and count it in the statistics atomically
+      const batch = this.db.batch();
+      batch.set(withdrawalRef, withdrawalDoc);
+      this.incrementStatistics(batch, {
+        pending_withdrawals_count: 1,
+        total_withdrawal_amount: withdrawalAmount
+      });
+      await batch.commit();
       
       // Send admin notification
       try {
@@ -140,4 +157,21 @@ export class TransactionsService {
       return { success: false, message: 'Error creating withdrawal', error: error.message };
     }
   }
-} 
\ No newline at end of file
+
+  private incrementStatistics(batch: admin.firestore.WriteBatch, changes: Record<string, number>) {
+    // Keep the bot's sharded statistics counters current, committed with the document write
+    const shardId = String(Math.floor(Math.random() * STATS_SHARD_COUNT));
+    const payload: Record<string, any> = {
+      updated_at: admin.firestore.FieldValue.serverTimestamp()
+    };
+    for (const [field, value] of Object.entries(changes)) {
+      payload[field] = admin.firestore.FieldValue.increment(value);
+    }
+    const shardRef = this.db
+      .collection('stats')
+      .doc('transactions')
+      .collection('shards')
+      .doc(shardId);
+    batch.set(shardRef, payload, { merge: true });
+  }
+}
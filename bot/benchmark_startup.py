@@ -0,0 +1,138 @@
+"""
+Cold-start benchmark: module import and first-update latency with stubbed services
+
+Every sample runs in a fresh interpreter so imports are really cold. Telegram
+requests and the Firebase service are replaced by in-process stubs, so the
+numbers cover the bot's own startup work and nothing on the network.
+
+Usage:
+    python benchmark_startup.py [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STUB_ENVIRONMENT = {
+    'BOT_TOKEN': '123456:benchmark',
+    'ADMIN_ID': '1',
+    'FIREBASE_SERVICE_ACCOUNT': '{}',
+    'FIREBASE_PROJECT_ID': 'benchmark'
+}
+
+START_UPDATE = {
+    'update_id': 1,
+    'message': {
+        'message_id': 1,
+        'date': 0,
+        'chat': {'id': 2, 'type': 'private'},
+        'from': {'id': 2, 'is_bot': False, 'first_name': 'Bench', 'username': 'bench'},
+        'text': '/start',
+        'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}]
+    }
+}
+
+SENT_PHOTO_MESSAGE = {
+    'message_id': 2,
+    'date': 0,
+    'chat': {'id': 2, 'type': 'private'},
+    'photo': [{'file_id': 'benchmark-file-id', 'file_unique_id': 'benchmark', 'width': 1, 'height': 1}]
+}
+
+class StubFirebaseService:
+    """Stands in for AsyncFirebaseService without touching Firestore"""
+    
+    async def create_or_update_user(self, user_data):
+        return True
+    
+    async def flush_user_writes(self):
+        return 0
+
+class StubMediaCache:
+    """Media cache that never has a file_id, so every photo is sent by URL"""
+    
+    async def get(self, url):
+        return None
+    
+    async def set(self, url, file_id):
+        pass
+    
+    async def invalidate(self, url):
+        pass
+
+def install_stubs():
+    """Replace Telegram requests and the Firebase service with in-process stubs"""
+    import types
+    from telebot import asyncio_helper
+    import media_cache
+    
+    async def process_request(token, url, method='get', params=None, files=None, **kwargs):
+        return SENT_PHOTO_MESSAGE
+        
+    asyncio_helper._process_request = process_request
+    
+    # services imports firebase_service lazily, so a stub module keeps firebase_admin out entirely
+    firebase_service = types.ModuleType('firebase_service')
+    service = StubFirebaseService()
+    firebase_service.get_async_firebase_service = lambda: service
+    sys.modules['firebase_service'] = firebase_service
+    media_cache.media_cache = StubMediaCache()
+
+def run_sample():
+    """Measure one cold start in this interpreter and print the timings as JSON"""
+    started = time.perf_counter()
+    import webhook
+    imported = time.perf_counter()
+    
+    install_stubs()
+    stubs_installed = time.perf_counter()
+    
+    investment_bot = webhook.get_investment_bot()
+    investment_bot.process_update_threadsafe(START_UPDATE)
+    first_update = time.perf_counter()
+    
+    # A new update_id, a repeated one would be dropped as a redelivery
+    investment_bot.process_update_threadsafe(dict(START_UPDATE, update_id=2))
+    second_update = time.perf_counter()
+    investment_bot.shutdown()
+    
+    print(json.dumps({
+        'import_ms': (imported - started) * 1000,
+        'first_update_ms': (first_update - stubs_installed) * 1000,
+        'warm_update_ms': (second_update - first_update) * 1000
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='number of cold starts to sample')
+    parser.add_argument('--sample', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.sample:
+        run_sample()
+        return
+        
+    environment = dict(os.environ, **STUB_ENVIRONMENT, LOG_LEVEL='WARNING')
+    directory = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--sample'],
+            cwd=directory,
+            env=environment,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+        
+    print(f"Cold start over {args.runs} runs (median / max, ms):")
+    for metric in ('import_ms', 'first_update_ms', 'warm_update_ms'):
+        values = [sample[metric] for sample in samples]
+        print(f"  {metric:<16} {statistics.median(values):8.1f} {max(values):8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,381 @@
+"""
+Broadcast jobs that message every user, resumable from Firestore checkpoints
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from telebot.asyncio_helper import ApiTelegramException
+from config import BotConfig
+from services import get_async_firebase_service
+from telegram_scheduler import PRIORITY_ADMIN, PRIORITY_BULK, send_priority
+
+logger = logging.getLogger(__name__)
+
+# Counters kept on every job document
+BROADCAST_RESULTS = ('delivered', 'blocked', 'failed')
+
+# 400 descriptions meaning the user can no longer be reached at all
+UNREACHABLE_DESCRIPTIONS = ('chat not found', 'user is deactivated', 'peer_id_invalid')
+
+def classify_delivery_error(error):
+    """
+    Map a failed send to a broadcast result
+    
+    Args:
+        error (Exception): Error raised by the send
+        
+    Returns:
+        str: 'blocked' if the user cannot receive messages from the bot, otherwise 'failed'
+    """
+    if isinstance(error, ApiTelegramException):
+        if error.error_code == 403:
+            return 'blocked'
+        if error.error_code == 400 and any(text in error.description.lower() for text in UNREACHABLE_DESCRIPTIONS):
+            return 'blocked'
+    return 'failed'
+
+class BroadcastEngine:
+    """Sends one message to every document of the users collection, page by page"""
+    
+    def __init__(self, db, collection_name='broadcasts', page_size=200, concurrency=25, lease=120):
+        """
+        Initialize broadcast engine
+        
+        Args:
+            db: Async Firestore client
+            collection_name (str): Collection holding one document per broadcast job
+            page_size (int): Users read and checkpointed at a time
+            concurrency (int): Sends in flight at once, the outbound scheduler sets the rate
+            lease (float): Seconds without a checkpoint after which another instance may resume a job
+        """
+        self.db = db
+        self.collection_name = collection_name
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+    
+    def _job_ref(self, job_id):
+        return self.db.collection(self.collection_name).document(job_id)
+    
+    async def create(self, text, chat_id, message_id=None):
+        """
+        Create a broadcast job
+        
+        Args:
+            text (str): Message sent to every user
+            chat_id (int): Admin chat receiving progress updates
+            message_id (int): Admin message edited with progress
+            
+        Returns:
+            str: Job ID
+        """
+        job_ref = self.db.collection(self.collection_name).document()
+        now = datetime.now(timezone.utc)
+        job = {
+            'text': text,
+            'status': 'queued',
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'cursor': None,
+            'created_at': now,
+            'heartbeat_at': now,
+            'owner': None
+        }
+        job.update({result: 0 for result in BROADCAST_RESULTS})
+        await job_ref.set(job)
+        logger.info(f"Broadcast {job_ref.id} created for chat {chat_id}")
+        return job_ref.id
+    
+    async def get(self, job_id):
+        """
+        Get a broadcast job
+        
+        Args:
+            job_id (str): Job ID
+            
+        Returns:
+            dict: Job data with 'id', or None if it does not exist
+        """
+        doc = await self._job_ref(job_id).get()
+        if not doc.exists:
+            return None
+        job = doc.to_dict()
+        job['id'] = doc.id
+        return job
+    
+    async def cancel(self, job_id):
+        """
+        Stop a broadcast after the page that is being sent
+        
+        Args:
+            job_id (str): Job ID
+            
+        Returns:
+            bool: True if an unfinished job was cancelled
+        """
+        job = await self.get(job_id)
+        if job is None or job['status'] not in ('queued', 'running'):
+            return False
+        await self._job_ref(job_id).update({'status': 'cancelled'})
+        logger.info(f"Broadcast {job_id} cancelled")
+        return True
+    
+    async def _claim(self, job_id):
+        """
+        Take ownership of a queued job, or of a running one whose owner stopped checkpointing
+        
+        Returns:
+            tuple: Claimed job data and the update time of the claim, (None, None)
+                if the job cannot be run here
+        """
+        # Imported here so loading the handlers does not pull in the Firestore client
+        from google.api_core.exceptions import FailedPrecondition, NotFound
+        
+        job_ref = self._job_ref(job_id)
+        doc = await job_ref.get()
+        if not doc.exists:
+            return None, None
+            
+        job = doc.to_dict()
+        if job['status'] == 'running' and job.get('owner') != self.owner:
+            heartbeat_at = job.get('heartbeat_at')
+            if heartbeat_at and heartbeat_at > datetime.now(timezone.utc) - timedelta(seconds=self.lease):
+                return None, None
+        elif job['status'] != 'queued':
+            return None, None
+            
+        claim = {'status': 'running', 'owner': self.owner, 'heartbeat_at': datetime.now(timezone.utc)}
+        try:
+            # Fails if another instance changed the job since it was read
+            result = await job_ref.update(claim, option=self.db.write_option(last_update_time=doc.update_time))
+        except (FailedPrecondition, NotFound):
+            return None, None
+            
+        job.update(claim)
+        job['id'] = doc.id
+        return job, result.update_time
+    
+    async def _checkpoint(self, job_id, checkpoint, update_time):
+        """
+        Record a sent page unless another instance took the job over
+        
+        Args:
+            job_id (str): Job ID
+            checkpoint (dict): Cursor, heartbeat and result increments of the page
+            update_time: Update time of this instance's last write to the job
+            
+        Returns:
+            tuple: Job status and the update time of the checkpoint, None if the
+                checkpoint was dropped because the job is gone or owned elsewhere
+        """
+        from google.api_core.exceptions import FailedPrecondition, NotFound
+        
+        job_ref = self._job_ref(job_id)
+        status = 'running'
+        while True:
+            try:
+                # Fails if anyone wrote the job since this instance last did
+                result = await job_ref.update(checkpoint, option=self.db.write_option(last_update_time=update_time))
+                return status, result.update_time
+            except NotFound:
+                return 'cancelled', None
+            except FailedPrecondition:
+                pass
+                
+            doc = await job_ref.get()
+            if not doc.exists:
+                return 'cancelled', None
+                
+            job = doc.to_dict()
+            if job.get('owner') != self.owner:
+                # The new owner resends this page from the last checkpoint
+                return job['status'], None
+                
+            # A cancellation by the admin keeps the owner, the page still counts
+            status = job['status']
+            update_time = doc.update_time
+    
+    async def _complete(self, job_id):
+        """
+        Mark a job completed unless it was cancelled or taken over since the last page
+        
+        Returns:
+            str: Final status of the job
+        """
+        from google.api_core.exceptions import FailedPrecondition, NotFound
+        
+        job_ref = self._job_ref(job_id)
+        doc = await job_ref.get()
+        if not doc.exists:
+            return 'cancelled'
+            
+        job = doc.to_dict()
+        if job['status'] != 'running' or job.get('owner') != self.owner:
+            return job['status']
+            
+        completion = {'status': 'completed', 'heartbeat_at': datetime.now(timezone.utc)}
+        try:
+            # Fails if the job was cancelled or claimed since it was read
+            await job_ref.update(completion, option=self.db.write_option(last_update_time=doc.update_time))
+        except FailedPrecondition:
+            return await self._complete(job_id)
+        except NotFound:
+            return 'cancelled'
+        return 'completed'
+    
+    async def _users_page(self, cursor):
+        """Read the next page of user IDs after cursor, without loading their documents"""
+        query = self.db.collection('users').select(['__name__']).order_by('__name__')
+        if cursor is not None:
+            query = query.start_after({'__name__': cursor})
+        documents = await query.limit(self.page_size).get()
+        return [doc.id for doc in documents]
+    
+    async def _deliver(self, bot, semaphore, user_id, text):
+        """Send the broadcast to one user and get its result"""
+        async with semaphore:
+            try:
+                await bot.send_message(user_id, text)
+                return 'delivered'
+            except Exception as e:
+                result = classify_delivery_error(e)
+                if result == 'failed':
+                    logger.warning(f"Broadcast to user {user_id} failed: {e}")
+                return result
+    
+    async def run(self, bot, job_id, on_progress=None):
+        """
+        Send a job from its checkpoint until every user was messaged or it is cancelled
+        
+        Users of a page that was interrupted before its checkpoint get the message
+        again when the job resumes.
+        
+        Args:
+            bot: AsyncTeleBot instance
+            job_id (str): Job ID
+            on_progress (callable): Coroutine called with the job data after every page
+            
+        Returns:
+            dict: Final job data, or None if the job could not be claimed
+        """
+        from google.cloud.firestore_v1 import Increment
+        
+        job, update_time = await self._claim(job_id)
+        if job is None:
+            logger.info(f"Broadcast {job_id} is finished or owned by another instance")
+            return None
+            
+        semaphore = asyncio.Semaphore(self.concurrency)
+        logger.info(f"Broadcast {job_id} started from cursor {job['cursor']}")
+        
+        with send_priority(PRIORITY_BULK):
+            while True:
+                user_ids = await self._users_page(job['cursor'])
+                if not user_ids:
+                    job['status'] = await self._complete(job_id)
+                    break
+                    
+                results = await asyncio.gather(*(
+                    self._deliver(bot, semaphore, user_id, job['text']) for user_id in user_ids
+                ))
+                
+                counts = {result: results.count(result) for result in BROADCAST_RESULTS}
+                checkpoint = {'cursor': user_ids[-1], 'heartbeat_at': datetime.now(timezone.utc)}
+                checkpoint.update({result: Increment(count) for result, count in counts.items() if count})
+                job['status'], update_time = await self._checkpoint(job_id, checkpoint, update_time)
+                if update_time is None:
+                    break
+                    
+                job['cursor'] = user_ids[-1]
+                for result, count in counts.items():
+                    job[result] += count
+                    
+                # Stop after recording the page if the admin cancelled the job
+                if job['status'] != 'running':
+                    break
+                    
+                if on_progress is not None:
+                    # Progress edits go to the admin chat ahead of the queued broadcast sends
+                    with send_priority(PRIORITY_ADMIN):
+                        await on_progress(job)
+                    
+        logger.info(
+            f"Broadcast {job_id} {job['status']}: {job['delivered']} delivered, "
+            f"{job['blocked']} blocked, {job['failed']} failed"
+        )
+        return job
+
+# Global broadcast engine instance
+broadcast_engine = None
+
+# Jobs running in this process, keeps their tasks referenced until done
+_running_jobs = {}
+
+# Sending a broadcast and renewing its lease needs an event loop that keeps running
+# between updates. The serverless webhook is frozen once it has answered an update,
+# so broadcasts stay off unless the long-running server enables them.
+_background_runs_enabled = False
+
+def enable_background_runs(enabled=True):
+    """
+    Allow or forbid running broadcasts in the background of this process
+    
+    Args:
+        enabled (bool): True once the process keeps its event loop running between updates
+    """
+    global _background_runs_enabled
+    _background_runs_enabled = enabled
+
+def background_runs_enabled():
+    """Check whether this process can run broadcasts in the background"""
+    return _background_runs_enabled
+
+def get_broadcast_engine():
+    """Get broadcast engine instance"""
+    global broadcast_engine
+    if broadcast_engine is None:
+        broadcast_engine = BroadcastEngine(
+            get_async_firebase_service().db,
+            page_size=BotConfig.BROADCAST_PAGE_SIZE,
+            concurrency=BotConfig.BROADCAST_CONCURRENCY,
+            lease=BotConfig.BROADCAST_LEASE
+        )
+    return broadcast_engine
+
+def start_broadcast(bot, job_id, on_progress=None, on_done=None):
+    """
+    Run a broadcast job in the background of the current event loop
+    
+    Args:
+        bot: AsyncTeleBot instance
+        job_id (str): Job ID
+        on_progress (callable): Coroutine called with the job data after every page
+        on_done (callable): Coroutine called with the final job data, None if not claimed
+        
+    Returns:
+        bool: False if the job is already running in this process
+        
+    Raises:
+        RuntimeError: If background runs are not enabled in this process
+    """
+    if not _background_runs_enabled:
+        raise RuntimeError("Broadcasts only run in the long-running server")
+    
+    task = _running_jobs.get(job_id)
+    if task is not None and not task.done():
+        return False
+    
+    async def run_job():
+        try:
+            job = await get_broadcast_engine().run(bot, job_id, on_progress)
+            if on_done is not None:
+                await on_done(job)
+        except Exception as e:
+            logger.error(f"Broadcast {job_id} stopped by an error: {e}")
+        finally:
+            _running_jobs.pop(job_id, None)
+            
+    _running_jobs[job_id] = asyncio.get_running_loop().create_task(run_job())
+    return True
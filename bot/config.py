@@ -21,6 +21,84 @@ class BotConfig:
     FIREBASE_SERVICE_ACCOUNT = os.getenv('FIREBASE_SERVICE_ACCOUNT')
     FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID')
     
+    # Number of pending transactions shown per page in the admin view
+    PENDING_PAGE_SIZE = int(os.getenv('PENDING_PAGE_SIZE', '5'))
+    
+    # Serve pending views from Firestore snapshot listeners, only for long-running processes
+    PENDING_LISTENERS_ENABLED = os.getenv('PENDING_LISTENERS_ENABLED', 'false').lower() == 'true'
+    
+    # User profile cache
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))
+    
+    # Write-behind buffering of user activity updates. Only used by the long-running
+    # server (server.py), which flushes the buffer in the background. The serverless
+    # webhook is frozen between requests and could lose buffered writes, so it
+    # always writes through whatever this is set to
+    WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+    WRITE_BEHIND_INTERVAL = float(os.getenv('WRITE_BEHIND_INTERVAL', '5'))
+    WRITE_BEHIND_MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', '500'))
+    
+    # Number of counter shards backing the statistics document
+    STATS_SHARD_COUNT = int(os.getenv('STATS_SHARD_COUNT', '10'))
+    
+    # Serve dashboard statistics from the counter shards instead of aggregation queries.
+    # Enable only once the backend build that updates the shards is deployed and the
+    # statistics were rebuilt from the admin dashboard
+    STATS_COUNTERS_ENABLED = os.getenv('STATS_COUNTERS_ENABLED', 'false').lower() == 'true'
+    
+    # Documents approved per transaction in bulk approvals (each needs up to two writes)
+    BULK_APPROVAL_CHUNK_SIZE = int(os.getenv('BULK_APPROVAL_CHUNK_SIZE', '100'))
+    
+    # Reports longer than this many messages are attached as a document instead
+    REPORT_MAX_MESSAGES = int(os.getenv('REPORT_MAX_MESSAGES', '3'))
+    
+    # Outbound Telegram rate limits (messages per second) and 429 retries
+    TELEGRAM_SCHEDULER_ENABLED = os.getenv('TELEGRAM_SCHEDULER_ENABLED', 'true').lower() == 'true'
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+    TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+    TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+    
+    # Connection pool of the Telegram HTTP session
+    TELEGRAM_POOL_LIMIT = int(os.getenv('TELEGRAM_POOL_LIMIT', '50'))
+    TELEGRAM_KEEPALIVE_TIMEOUT = float(os.getenv('TELEGRAM_KEEPALIVE_TIMEOUT', '60'))
+    TELEGRAM_DNS_CACHE_TTL = int(os.getenv('TELEGRAM_DNS_CACHE_TTL', '300'))
+    
+    # Broadcast jobs: users read per checkpoint, sends in flight, seconds before a stalled job can be resumed
+    BROADCAST_PAGE_SIZE = int(os.getenv('BROADCAST_PAGE_SIZE', '200'))
+    BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '25'))
+    BROADCAST_LEASE = float(os.getenv('BROADCAST_LEASE', '120'))
+    
+    # Admin flow sessions: 'memory' per instance, or 'firestore' shared by all instances
+    SESSION_STORE = os.getenv('SESSION_STORE', 'memory').lower()
+    SESSION_TTL = float(os.getenv('SESSION_TTL', '1800'))
+    SESSION_MAX_SIZE = int(os.getenv('SESSION_MAX_SIZE', '1000'))
+    
+    # Ack-first webhook: answer Telegram at once and process updates on background workers.
+    # Only for long-lived processes, a serverless instance may be frozen once it has answered.
+    UPDATE_QUEUE_ENABLED = os.getenv('UPDATE_QUEUE_ENABLED', 'false').lower() == 'true'
+    UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', '1000'))
+    UPDATE_QUEUE_WORKERS = int(os.getenv('UPDATE_QUEUE_WORKERS', '8'))
+    UPDATE_QUEUE_DRAIN_TIMEOUT = float(os.getenv('UPDATE_QUEUE_DRAIN_TIMEOUT', '25'))
+    
+    # Number of recent update_ids remembered to drop updates Telegram redelivers, 0 disables it
+    UPDATE_DEDUP_WINDOW = int(os.getenv('UPDATE_DEDUP_WINDOW', '1000'))
+    
+    # Seconds the serverless webhook waits for an update before answering Telegram anyway
+    WEBHOOK_PROCESS_TIMEOUT = float(os.getenv('WEBHOOK_PROCESS_TIMEOUT', '25'))
+    
+    # Server configuration (long-running aiohttp mode)
+    SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.getenv('SERVER_PORT', '8080'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/')
+    
+    # Prometheus text metrics served on GET METRICS_PATH, counted per process.
+    # When METRICS_TOKEN is set, scrapers must send 'Authorization: Bearer <token>'.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_PATH = os.getenv('METRICS_PATH', '/metrics')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    
     # Logging configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
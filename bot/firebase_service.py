@@ -1,37 +1,591 @@
 """
 Firebase Firestore service for user data management
 """
+import asyncio
+import copy
 import logging
+import random
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore_v1.transforms import Sentinel
 from config import BotConfig
+from pagination import cursor_values
+from pending_index import PendingIndex
+from ttl_cache import TTLCache
+from write_buffer import WriteBehindBuffer
 
 logger = logging.getLogger(__name__)
 
-class FirebaseService:
-    """Firebase Firestore service for managing user data"""
+# Firestore limit on writes per batch commit
+MAX_BATCH_WRITES = 500
+
+def initialize_firebase_app():
+    """
+    Initialize the default Firebase app once per process
+    
+    Returns:
+        firebase_admin.App: The default Firebase app
+    """
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        # Get Firebase credentials
+        cred_dict = BotConfig.get_firebase_credentials()
+        cred = credentials.Certificate(cred_dict)
+        
+        # Initialize Firebase app
+        return firebase_admin.initialize_app(cred, {
+            'projectId': BotConfig.FIREBASE_PROJECT_ID
+        })
+
+def _pending_amount_aggregation(collection_ref):
+    """Build a count and amount-sum aggregation over pending documents"""
+    query = collection_ref.where('status', '==', 'pending')
+    return query.count(alias='count').sum('amount', alias='total')
+
+def _aggregation_values(results):
+    """
+    Convert aggregation query results into a dict keyed by alias
+    
+    Args:
+        results (list): Result of an aggregation query get()
+        
+    Returns:
+        dict: Aggregated values, missing sums default to 0
+    """
+    values = {}
+    for result_group in results:
+        for result in result_group:
+            values[result.alias] = result.value if result.value is not None else 0
+    values.setdefault('count', 0)
+    values.setdefault('total', 0)
+    return values
+
+# Counter fields kept in the sharded statistics document
+STATS_COUNTER_FIELDS = (
+    'pending_deposits_count',
+    'pending_withdrawals_count',
+    'total_deposit_amount',
+    'total_withdrawal_amount'
+)
+
+def _statistics_shards_ref(db):
+    """Get the collection holding the statistics counter shards"""
+    return db.collection('stats').document('transactions').collection('shards')
+
+def _statistics_increment(db, changes):
+    """
+    Build an atomic increment of the statistics counters on a random shard
+    
+    Args:
+        db: Firestore client (sync or async)
+        changes (dict): Counter field to delta
+        
+    Returns:
+        tuple: Shard document reference and merge payload
+    """
+    shard_id = str(random.randrange(BotConfig.STATS_SHARD_COUNT))
+    payload = {field: firestore.Increment(value) for field, value in changes.items()}
+    payload['updated_at'] = firestore.SERVER_TIMESTAMP
+    return _statistics_shards_ref(db).document(shard_id), payload
+
+def _statistics_reset_writes(db, stats):
+    """
+    Build writes that reset every shard so the shards sum up to stats
+    
+    Args:
+        db: Firestore client (sync or async)
+        stats (dict): Statistics computed from the source collections
+        
+    Returns:
+        list: (shard reference, document data) pairs
+    """
+    shards_ref = _statistics_shards_ref(db)
+    writes = []
+    for shard_index in range(BotConfig.STATS_SHARD_COUNT):
+        shard_data = {
+            field: stats[field] if shard_index == 0 else 0
+            for field in STATS_COUNTER_FIELDS
+        }
+        shard_data['initialized'] = shard_index == 0
+        shard_data['updated_at'] = firestore.SERVER_TIMESTAMP
+        writes.append((shards_ref.document(str(shard_index)), shard_data))
+    return writes
+
+def _statistics_from_shards(shards):
+    """
+    Sum the counter shards into a statistics dict
+    
+    Args:
+        shards (list): Shard documents as dicts
+        
+    Returns:
+        dict: Statistics without 'total_users', or None if the shards were
+            never initialized or sum up to a negative counter
+    """
+    if not any(shard.get('initialized') for shard in shards):
+        return None
+    
+    stats = {
+        field: sum(shard.get(field, 0) for shard in shards)
+        for field in STATS_COUNTER_FIELDS
+    }
+    if any(value < 0 for value in stats.values()):
+        # Decrements landed on shards that never counted the creations
+        return None
+    
+    stats['total_pending'] = stats['pending_deposits_count'] + stats['pending_withdrawals_count']
+    return stats
+
+def _without_sentinels(data):
+    """Drop server-side values such as SERVER_TIMESTAMP that are unknown until written"""
+    return {field: value for field, value in data.items() if not isinstance(value, Sentinel)}
+
+def _empty_statistics():
+    """Get statistics with every counter set to zero"""
+    return {
+        'pending_deposits_count': 0,
+        'pending_withdrawals_count': 0,
+        'total_pending': 0,
+        'total_deposit_amount': 0,
+        'total_withdrawal_amount': 0,
+        'total_users': 0
+    }
+
+@firestore.async_transactional
+async def _approve_deposit_async_transaction(transaction, db, deposit_id, admin_amount):
+    """
+    Approve a pending deposit and credit the user inside one async transaction
+    
+    Returns:
+        dict: 'result' is 'approved', 'not_found', 'not_pending' or 'user_not_found', plus details
+    """
+    deposit_ref = db.collection('deposits').document(deposit_id)
+    deposit_doc = await deposit_ref.get(transaction=transaction)
+    if not deposit_doc.exists:
+        return {'result': 'not_found'}
+    
+    deposit_data = deposit_doc.to_dict()
+    if deposit_data['status'] != 'pending':
+        return {'result': 'not_pending', 'status': deposit_data['status']}
+    
+    user_id = deposit_data['user_id']
+    user_ref = db.collection('users').document(user_id)
+    user_doc = await user_ref.get(transaction=transaction)
+    if not user_doc.exists:
+        return {'result': 'user_not_found', 'user_id': user_id}
+    
+    return _write_deposit_approval(transaction, db, deposit_ref, deposit_data, user_ref, user_doc.to_dict(), admin_amount)
+
+def _write_deposit_approval(transaction, db, deposit_ref, deposit_data, user_ref, user_data, admin_amount):
+    """Queue the deposit approval writes on a transaction"""
+    current_balance = user_data.get('balance', 0)
+    new_balance = current_balance + admin_amount
+    
+    transaction.update(deposit_ref, {
+        'status': 'approved',
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+    transaction.update(user_ref, {
+        'balance': new_balance,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+    shard_ref, payload = _statistics_increment(db, {
+        'pending_deposits_count': -1,
+        'total_deposit_amount': -deposit_data['amount']
+    })
+    transaction.set(shard_ref, payload, merge=True)
+    
+    return {
+        'result': 'approved',
+        'user_id': deposit_data['user_id'],
+        'original_amount': deposit_data['amount'],
+        'current_balance': current_balance,
+        'new_balance': new_balance
+    }
+
+@firestore.async_transactional
+async def _approve_withdrawal_async_transaction(transaction, db, withdrawal_id, admin_amount):
+    """
+    Approve a pending withdrawal and debit the user inside one async transaction
+    
+    Returns:
+        dict: 'result' is 'approved', 'not_found', 'not_pending', 'user_not_found'
+            or 'insufficient_balance', plus details
+    """
+    withdrawal_ref = db.collection('withdrawals').document(withdrawal_id)
+    withdrawal_doc = await withdrawal_ref.get(transaction=transaction)
+    if not withdrawal_doc.exists:
+        return {'result': 'not_found'}
+    
+    withdrawal_data = withdrawal_doc.to_dict()
+    if withdrawal_data['status'] != 'pending':
+        return {'result': 'not_pending', 'status': withdrawal_data['status']}
+    
+    user_id = withdrawal_data['user_id']
+    user_ref = db.collection('users').document(user_id)
+    user_doc = await user_ref.get(transaction=transaction)
+    if not user_doc.exists:
+        return {'result': 'user_not_found', 'user_id': user_id}
+    
+    return _write_withdrawal_approval(transaction, db, withdrawal_ref, withdrawal_data, user_ref, user_doc.to_dict(), admin_amount)
+
+def _write_withdrawal_approval(transaction, db, withdrawal_ref, withdrawal_data, user_ref, user_data, admin_amount):
+    """Queue the withdrawal approval writes on a transaction if the balance covers it"""
+    current_balance = user_data.get('balance', 0)
+    if current_balance < admin_amount:
+        return {
+            'result': 'insufficient_balance',
+            'user_id': withdrawal_data['user_id'],
+            'current_balance': current_balance
+        }
+    
+    new_balance = current_balance - admin_amount
+    
+    transaction.update(withdrawal_ref, {
+        'status': 'approved',
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+    transaction.update(user_ref, {
+        'balance': new_balance,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+    shard_ref, payload = _statistics_increment(db, {
+        'pending_withdrawals_count': -1,
+        'total_withdrawal_amount': -withdrawal_data['amount']
+    })
+    transaction.set(shard_ref, payload, merge=True)
+    
+    return {
+        'result': 'approved',
+        'user_id': withdrawal_data['user_id'],
+        'original_amount': withdrawal_data['amount'],
+        'current_balance': current_balance,
+        'new_balance': new_balance
+    }
+
+@firestore.async_transactional
+async def _bulk_approve_async_transaction(transaction, db, collection_name, doc_ids):
+    """
+    Approve a chunk of pending deposits or withdrawals inside one async transaction
+    
+    Returns:
+        list: One outcome per ID, shaped like the single approval results plus 'id'
+    """
+    refs = [db.collection(collection_name).document(doc_id) for doc_id in doc_ids]
+    documents = {}
+    async for doc in db.get_all(refs, transaction=transaction):
+        if doc.exists:
+            documents[doc.id] = doc.to_dict()
+    
+    user_refs = [db.collection('users').document(user_id) for user_id in _bulk_user_ids(documents)]
+    users = {}
+    if user_refs:
+        async for doc in db.get_all(user_refs, transaction=transaction):
+            if doc.exists:
+                users[doc.id] = doc.to_dict()
+    
+    return _write_bulk_approval(transaction, db, collection_name, doc_ids, documents, users)
+
+def _bulk_user_ids(documents):
+    """Get the distinct owners of the pending documents in a bulk approval chunk"""
+    return list(dict.fromkeys(
+        str(document_data['user_id'])
+        for document_data in documents.values()
+        if document_data.get('status') == 'pending' and document_data.get('user_id')
+    ))
+
+def _write_bulk_approval(transaction, db, collection_name, doc_ids, documents, users):
+    """Queue the writes for every approvable document of a chunk, one balance write per user"""
+    is_deposit = collection_name == 'deposits'
+    balances = {user_id: user_data.get('balance', 0) for user_id, user_data in users.items()}
+    touched_users = set()
+    approved_amount = 0
+    outcomes = []
+    
+    for doc_id in doc_ids:
+        document_data = documents.get(doc_id)
+        if document_data is None:
+            outcomes.append({'id': doc_id, 'result': 'not_found'})
+            continue
+        
+        if document_data['status'] != 'pending':
+            outcomes.append({'id': doc_id, 'result': 'not_pending', 'status': document_data['status']})
+            continue
+        
+        user_id = str(document_data.get('user_id'))
+        if user_id not in balances:
+            outcomes.append({'id': doc_id, 'result': 'user_not_found', 'user_id': user_id})
+            continue
+        
+        amount = document_data['amount']
+        current_balance = balances[user_id]
+        if not is_deposit and current_balance < amount:
+            outcomes.append({
+                'id': doc_id,
+                'result': 'insufficient_balance',
+                'user_id': user_id,
+                'current_balance': current_balance
+            })
+            continue
+        
+        new_balance = current_balance + amount if is_deposit else current_balance - amount
+        balances[user_id] = new_balance
+        touched_users.add(user_id)
+        approved_amount += amount
+        
+        transaction.update(db.collection(collection_name).document(doc_id), {
+            'status': 'approved',
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+        outcomes.append({
+            'id': doc_id,
+            'result': 'approved',
+            'user_id': user_id,
+            'original_amount': amount,
+            'current_balance': current_balance,
+            'new_balance': new_balance
+        })
+    
+    for user_id in touched_users:
+        transaction.update(db.collection('users').document(user_id), {
+            'balance': balances[user_id],
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+    
+    approved_count = sum(1 for outcome in outcomes if outcome['result'] == 'approved')
+    if approved_count:
+        prefix = 'deposit' if is_deposit else 'withdrawal'
+        shard_ref, payload = _statistics_increment(db, {
+            f'pending_{prefix}s_count': -approved_count,
+            f'total_{prefix}_amount': -approved_amount
+        })
+        transaction.set(shard_ref, payload, merge=True)
+    
+    return outcomes
+
+class PendingSnapshot:
+    """Pending deposits and withdrawals fetched once, with their counts and sums"""
+    
+    def __init__(self, deposits, withdrawals, total_users=0, statistics=None):
+        """
+        Initialize pending snapshot
+        
+        Args:
+            deposits (list): Pending deposit documents
+            withdrawals (list): Pending withdrawal documents
+            total_users (int): Number of registered users
+            statistics (dict): Collection-wide statistics when the lists are only first pages
+        """
+        self.deposits = deposits
+        self.withdrawals = withdrawals
+        self.total_users = total_users
+        self.statistics = statistics
+    
+    @property
+    def total_deposit_amount(self):
+        """Sum of pending deposit amounts"""
+        return sum(deposit.get('amount', 0) for deposit in self.deposits)
+    
+    @property
+    def total_withdrawal_amount(self):
+        """Sum of pending withdrawal amounts"""
+        return sum(withdrawal.get('amount', 0) for withdrawal in self.withdrawals)
+    
+    def get_statistics(self):
+        """
+        Get statistics in the same shape as get_transaction_statistics
+        
+        Returns:
+            dict: Statistics including counts and totals
+        """
+        if self.statistics is not None:
+            return self.statistics
+        
+        return {
+            'pending_deposits_count': len(self.deposits),
+            'pending_withdrawals_count': len(self.withdrawals),
+            'total_pending': len(self.deposits) + len(self.withdrawals),
+            'total_deposit_amount': self.total_deposit_amount,
+            'total_withdrawal_amount': self.total_withdrawal_amount,
+            'total_users': self.total_users
+        }
+
+class BaseFirebaseService:
+    """Service state and helpers that do not await Firestore"""
+    
+    # Collections whose pending documents can be served from snapshot listeners
+    PENDING_COLLECTIONS = ('deposits', 'withdrawals')
     
     def __init__(self):
-        """Initialize Firebase service"""
-        try:
-            # Get Firebase credentials
-            cred_dict = BotConfig.get_firebase_credentials()
-            cred = credentials.Certificate(cred_dict)
+        """Initialize shared service state"""
+        self._pending_indexes = {}
+        self._user_cache = TTLCache(BotConfig.USER_CACHE_SIZE, BotConfig.USER_CACHE_TTL)
+        self._known_user_ids = TTLCache(BotConfig.USER_CACHE_SIZE, BotConfig.USER_CACHE_TTL)
+        self._user_write_buffer = WriteBehindBuffer(BotConfig.WRITE_BEHIND_MAX_PENDING)
+        self._write_behind_running = False
+    
+    def _listener_client(self):
+        """Get the synchronous Firestore client that hosts snapshot listeners"""
+        return firestore.client()
+    
+    def start_pending_listeners(self, wait_timeout=None):
+        """
+        Keep pending deposits and withdrawals in memory via snapshot listeners
+        
+        Args:
+            wait_timeout (float): Seconds to wait for the initial snapshots, None to not wait
+        """
+        db = self._listener_client()
+        for collection_name in self.PENDING_COLLECTIONS:
+            if collection_name not in self._pending_indexes:
+                index = PendingIndex(collection_name)
+                index.start(db)
+                self._pending_indexes[collection_name] = index
+        
+        if wait_timeout is not None:
+            for index in self._pending_indexes.values():
+                if not index.wait_until_ready(wait_timeout):
+                    logger.warning(f"Pending {index.collection_name} listener not ready after {wait_timeout}s")
+    
+    def stop_pending_listeners(self):
+        """Stop the snapshot listeners and fall back to Firestore queries"""
+        indexes = self._pending_indexes
+        self._pending_indexes = {}
+        for index in indexes.values():
+            index.stop()
+    
+    def _pending_query(self, collection_name, limit=None, start_after=None, end_before=None):
+        """
+        Build the pending query, paged by creation time and document ID when limit is set
+        
+        Returns:
+            tuple: Query and whether its results come back in reverse order
+        """
+        query = self.db.collection(collection_name).where('status', '==', 'pending')
+        if limit is None:
+            return query, False
+        
+        if end_before is not None:
+            # Walk backwards from the cursor, the caller restores ascending order
+            descending = firestore.Query.DESCENDING
+            query = query.order_by('created_at', direction=descending).order_by('__name__', direction=descending)
+            return query.start_after(cursor_values(end_before)).limit(limit), True
+        
+        query = query.order_by('created_at').order_by('__name__')
+        if start_after is not None:
+            query = query.start_after(cursor_values(start_after))
+        return query.limit(limit), False
+    
+    def _get_pending_index(self, collection_name):
+        """
+        Get the in-memory pending index for a collection if it can serve reads
+        
+        Args:
+            collection_name (str): Collection name
             
-            # Initialize Firebase app
-            firebase_admin.initialize_app(cred, {
-                'projectId': BotConfig.FIREBASE_PROJECT_ID
-            })
+        Returns:
+            PendingIndex: Ready index or None
+        """
+        index = self._pending_indexes.get(collection_name)
+        if index is not None and index.is_ready:
+            return index
+        return None
+    
+    def _discard_pending(self, collection_name, doc_id):
+        """Drop a document the service just moved out of pending from the index"""
+        index = self._pending_indexes.get(collection_name)
+        if index is not None:
+            index.discard(doc_id)
+
+    def _get_cached_user(self, user_id):
+        """Get a copy of a cached user document, or None on a miss"""
+        user_data = self._user_cache.get(user_id)
+        return copy.deepcopy(user_data) if user_data is not None else None
+    
+    def _cache_user(self, user_id, user_data):
+        """Store a user document read from Firestore in the cache"""
+        self._user_cache.set(user_id, copy.deepcopy(user_data))
+    
+    def _cache_user_write(self, user_id, fields):
+        """
+        Apply fields the service just wrote to the cached user document
+        
+        Args:
+            user_id (str): User ID
+            fields (dict): Written fields, server-side sentinels are skipped
+        """
+        user_data = self._user_cache.get(user_id)
+        if user_data is None:
+            return
+        
+        user_data = copy.deepcopy(user_data)
+        user_data.update(_without_sentinels(fields))
+        self._user_cache.set(user_id, user_data)
+    
+    def _is_known_user(self, user_id):
+        """Check whether this process recently saw the user document exist"""
+        return self._known_user_ids.get(user_id) or self._user_cache.get(user_id) is not None
+    
+    def _user_write_batches(self, writes):
+        """Split buffered merge writes into batches within the Firestore write limit"""
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            chunk = writes[start:start + MAX_BATCH_WRITES]
+            batch = self.db.batch()
+            for doc_ref, fields in chunk:
+                batch.set(doc_ref, fields, merge=True)
+            yield chunk, batch
+    
+    def _bulk_approval_chunks(self, doc_ids):
+        """Split distinct document IDs into chunks small enough for one transaction each"""
+        unique_ids = list(dict.fromkeys(str(doc_id) for doc_id in doc_ids if doc_id))
+        chunk_size = BotConfig.BULK_APPROVAL_CHUNK_SIZE
+        for start in range(0, len(unique_ids), chunk_size):
+            yield unique_ids[start:start + chunk_size]
+    
+    def _apply_bulk_outcomes(self, collection_name, outcomes):
+        """Update the pending index and user cache after a bulk approval chunk committed"""
+        for outcome in outcomes:
+            if outcome['result'] == 'approved':
+                self._discard_pending(collection_name, outcome['id'])
+                self._cache_user_write(outcome['user_id'], {'balance': outcome['new_balance']})
+    
+    def get_pending_user_writes(self):
+        """Get the number of user documents waiting in the write-behind buffer"""
+        return len(self._user_write_buffer)
+    
+    def _invalidate_user(self, user_id):
+        """Drop a user document from the cache"""
+        self._user_cache.pop(user_id)
+    
+    def get_user_cache_stats(self):
+        """
+        Get user cache hit/miss counters
+        
+        Returns:
+            dict: Hits, misses and current size
+        """
+        return self._user_cache.stats()
+
+class AsyncFirebaseService(BaseFirebaseService):
+    """Firebase Firestore service built on the Firestore AsyncClient"""
+    
+    def __init__(self):
+        """Initialize async Firebase service"""
+        super().__init__()
+        try:
+            initialize_firebase_app()
             
             # Initialize Firestore client
-            self.db = firestore.client()
-            logger.info("Firebase service initialized successfully")
+            self.db = firestore_async.client()
+            logger.info("Async Firebase service initialized successfully")
             
         except Exception as e:
-            logger.error(f"Failed to initialize Firebase service: {e}")
+            logger.error(f"Failed to initialize async Firebase service: {e}")
             raise
     
-    def create_or_update_user(self, user_data):
+    async def create_or_update_user(self, user_data):
         """
         Create or update user in Firestore
         
@@ -45,94 +599,167 @@ class FirebaseService:
             user_id = str(user_data['user_id'])
             user_ref = self.db.collection('users').document(user_id)
             
-            # Prepare user document data
-            doc_data = {
+            # Profile fields are written unconditionally, balance and created_at only on creation
+            profile = {
                 'user_id': user_id,
                 'first_name': user_data.get('first_name', ''),
                 'last_name': user_data.get('last_name', ''),
                 'username': user_data.get('username', ''),
                 'language_code': user_data.get('language_code', 'english'),
                 'is_premium': user_data.get('is_premium', False),
-                'balance': user_data.get('balance', 0),
-                'created_at': firestore.SERVER_TIMESTAMP,
                 'updated_at': firestore.SERVER_TIMESTAMP,
                 'last_activity': firestore.SERVER_TIMESTAMP
             }
             
-            # Check if user exists
-            user_doc = user_ref.get()
+            if not self._is_known_user(user_id):
+                # Try to create the user without reading it first
+                balance = user_data.get('balance', 0)
+                try:
+                    await user_ref.create(dict(
+                        profile,
+                        balance=balance,
+                        created_at=firestore.SERVER_TIMESTAMP
+                    ))
+                    self._cache_user(user_id, _without_sentinels(dict(profile, balance=balance, id=user_id)))
+                    logger.info(f"Created new user {user_id} in database")
+                    return True
+                except AlreadyExists:
+                    pass
             
-            if user_doc.exists:
-                # Update existing user (preserve balance and other fields)
-                existing_data = user_doc.to_dict()
-                doc_data['balance'] = existing_data.get('balance', 0)
-                doc_data['created_at'] = existing_data.get('created_at')
-                doc_data['updated_at'] = firestore.SERVER_TIMESTAMP
-                
-                user_ref.update(doc_data)
-                logger.info(f"Updated user {user_id} in database")
-            else:
-                # Create new user
-                user_ref.set(doc_data)
-                logger.info(f"Created new user {user_id} in database")
+            self._known_user_ids.set(user_id, True)
+            self._cache_user_write(user_id, profile)
             
+            if self._write_behind_running:
+                # Coalesce repeated touches of the same user until the next flush
+                if self._user_write_buffer.add(user_ref, profile):
+                    await self.flush_user_writes()
+                return True
+            
+            # Update existing user (preserve balance and creation time)
+            await user_ref.set(profile, merge=True)
+            logger.info(f"Updated user {user_id} in database")
             return True
             
         except Exception as e:
             logger.error(f"Error creating/updating user {user_data.get('user_id')}: {e}")
             return False
 
-    def get_pending_deposits(self):
+    async def flush_user_writes(self):
         """
-        Get all pending deposits from Firestore
+        Write buffered user updates to Firestore in batches of up to 500 writes
         
         Returns:
-            list: List of pending deposit documents
+            int: Number of user documents written
         """
+        writes = self._user_write_buffer.drain()
+        written = 0
+        
+        for chunk, batch in self._user_write_batches(writes):
+            try:
+                await batch.commit()
+                written += len(chunk)
+            except Exception as e:
+                logger.error(f"Error flushing {len(chunk)} buffered user writes: {e}")
+                self._user_write_buffer.requeue(chunk)
+        
+        if writes:
+            logger.info(f"Flushed {written} of {len(writes)} buffered user writes")
+        return written
+    
+    async def run_write_behind(self, interval=None):
+        """
+        Flush buffered user writes periodically until cancelled
+        
+        User writes are only buffered while this runs, every other process
+        writes them through.
+        
+        Args:
+            interval (float): Seconds between flushes, defaults to WRITE_BEHIND_INTERVAL
+        """
+        interval = interval or BotConfig.WRITE_BEHIND_INTERVAL
+        self._write_behind_running = True
         try:
-            deposits_ref = self.db.collection('deposits')
-            query = deposits_ref.where('status', '==', 'pending')
-            docs = query.stream()
-            
-            deposits = []
-            for doc in docs:
-                deposit_data = doc.to_dict()
-                deposit_data['id'] = doc.id
-                deposits.append(deposit_data)
-            
-            logger.info(f"Retrieved {len(deposits)} pending deposits")
-            return deposits
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush_user_writes()
+        finally:
+            # Do not lose buffered writes on shutdown
+            self._write_behind_running = False
+            await self.flush_user_writes()
+
+    async def get_pending_deposits(self, limit=None, start_after=None, end_before=None):
+        """
+        Get pending deposits, from the listener index when it is running
+        
+        Args:
+            limit (int): Page size ordered by creation time, None for all pending deposits
+            start_after (str): Cursor of the last deposit on the previous page
+            end_before (str): Cursor of the first deposit on the next page
             
-        except Exception as e:
-            logger.error(f"Error fetching pending deposits: {e}")
-            return []
+        Returns:
+            list: List of pending deposit documents
+        """
+        return await self._get_pending('deposits', limit, start_after, end_before)
 
-    def get_pending_withdrawals(self):
+    async def get_pending_withdrawals(self, limit=None, start_after=None, end_before=None):
         """
-        Get all pending withdrawals from Firestore
+        Get pending withdrawals, from the listener index when it is running
         
+        Args:
+            limit (int): Page size ordered by creation time, None for all pending withdrawals
+            start_after (str): Cursor of the last withdrawal on the previous page
+            end_before (str): Cursor of the first withdrawal on the next page
+            
         Returns:
             list: List of pending withdrawal documents
         """
+        return await self._get_pending('withdrawals', limit, start_after, end_before)
+
+    async def _get_pending(self, collection_name, limit=None, start_after=None, end_before=None):
+        """Get pending documents of a collection, optionally one page of them"""
+        index = self._get_pending_index(collection_name)
+        if index is not None:
+            if limit is None:
+                return index.list()
+            return index.page(limit, start_after, end_before)
+        
         try:
-            withdrawals_ref = self.db.collection('withdrawals')
-            query = withdrawals_ref.where('status', '==', 'pending')
-            docs = query.stream()
+            query, reverse = self._pending_query(collection_name, limit, start_after, end_before)
             
-            withdrawals = []
-            for doc in docs:
-                withdrawal_data = doc.to_dict()
-                withdrawal_data['id'] = doc.id
-                withdrawals.append(withdrawal_data)
+            documents = []
+            async for doc in query.stream():
+                document_data = doc.to_dict()
+                document_data['id'] = doc.id
+                documents.append(document_data)
+            
+            if reverse:
+                documents.reverse()
             
-            logger.info(f"Retrieved {len(withdrawals)} pending withdrawals")
-            return withdrawals
+            logger.info(f"Retrieved {len(documents)} pending {collection_name}")
+            return documents
             
         except Exception as e:
-            logger.error(f"Error fetching pending withdrawals: {e}")
+            logger.error(f"Error fetching pending {collection_name}: {e}")
             return []
 
-    def get_deposit_by_id(self, deposit_id):
+    async def get_pending_snapshot(self, page_size=None):
+        """
+        Get pending deposits and withdrawals with their statistics, querying each collection once
+        
+        Args:
+            page_size (int): Only fetch the first page of each list and take counts from the counters
+            
+        Returns:
+            PendingSnapshot: Pending transactions with counts and sums
+        """
+        deposits, withdrawals, stats = await asyncio.gather(
+            self.get_pending_deposits(limit=page_size),
+            self.get_pending_withdrawals(limit=page_size),
+            self.get_transaction_statistics()
+        )
+        return PendingSnapshot(deposits, withdrawals, stats['total_users'], stats if page_size else None)
+
+    async def get_deposit_by_id(self, deposit_id):
         """
         Get a specific deposit by ID
         
@@ -142,9 +769,15 @@ class FirebaseService:
         Returns:
             dict: Deposit data or None if not found
         """
+        index = self._get_pending_index('deposits')
+        if index is not None:
+            deposit_data = index.get(deposit_id)
+            if deposit_data is not None:
+                return deposit_data
+        
         try:
             deposit_ref = self.db.collection('deposits').document(deposit_id)
-            doc = deposit_ref.get()
+            doc = await deposit_ref.get()
             
             if doc.exists:
                 deposit_data = doc.to_dict()
@@ -158,7 +791,7 @@ class FirebaseService:
             logger.error(f"Error fetching deposit {deposit_id}: {e}")
             return None
 
-    def get_withdrawal_by_id(self, withdrawal_id):
+    async def get_withdrawal_by_id(self, withdrawal_id):
         """
         Get a specific withdrawal by ID
         
@@ -168,9 +801,15 @@ class FirebaseService:
         Returns:
             dict: Withdrawal data or None if not found
         """
+        index = self._get_pending_index('withdrawals')
+        if index is not None:
+            withdrawal_data = index.get(withdrawal_id)
+            if withdrawal_data is not None:
+                return withdrawal_data
+        
         try:
             withdrawal_ref = self.db.collection('withdrawals').document(withdrawal_id)
-            doc = withdrawal_ref.get()
+            doc = await withdrawal_ref.get()
             
             if doc.exists:
                 withdrawal_data = doc.to_dict()
@@ -184,7 +823,50 @@ class FirebaseService:
             logger.error(f"Error fetching withdrawal {withdrawal_id}: {e}")
             return None
 
-    def approve_deposit(self, deposit_id, admin_amount):
+    async def get_transactions_by_ids(self, collection_name, doc_ids):
+        """
+        Get several deposits or withdrawals in one multi-document read
+        
+        Args:
+            collection_name (str): 'deposits' or 'withdrawals'
+            doc_ids (iterable): Document IDs, duplicates are ignored
+            
+        Returns:
+            dict: Mapping of document ID to data for documents that exist, or None on error
+        """
+        unique_ids = list(dict.fromkeys(doc_ids))
+        
+        # Documents held by the pending listener are pending, only read the rest
+        documents = {}
+        index = self._get_pending_index(collection_name)
+        if index is not None:
+            for doc_id in unique_ids:
+                document_data = index.get(doc_id)
+                if document_data is not None:
+                    documents[doc_id] = document_data
+        
+        missing_ids = [doc_id for doc_id in unique_ids if doc_id not in documents]
+        if not missing_ids:
+            return documents
+        
+        try:
+            collection_ref = self.db.collection(collection_name)
+            refs = [collection_ref.document(doc_id) for doc_id in missing_ids]
+            
+            async for doc in self.db.get_all(refs):
+                if doc.exists:
+                    document_data = doc.to_dict()
+                    document_data['id'] = doc.id
+                    documents[doc.id] = document_data
+            
+            logger.info(f"Retrieved {len(documents)} of {len(unique_ids)} requested {collection_name}")
+            return documents
+            
+        except Exception as e:
+            logger.error(f"Error fetching {collection_name} {missing_ids}: {e}")
+            return None
+
+    async def approve_deposit(self, deposit_id, admin_amount):
         """
         Accept amount manually from admin and update the deposit status to approved and update the user balance
         
@@ -196,50 +878,33 @@ class FirebaseService:
             bool: True if successful, False otherwise
         """
         try:
-            # Get deposit data
-            deposit_data = self.get_deposit_by_id(deposit_id)
-            if not deposit_data:
+            # Read, validate and write everything in a single atomic commit
+            outcome = await _approve_deposit_async_transaction(self.db.transaction(), self.db, deposit_id, admin_amount)
+            
+            if outcome['result'] == 'not_found':
                 logger.error(f"Deposit {deposit_id} not found for approval")
                 return False
             
-            if deposit_data['status'] != 'pending':
-                logger.warning(f"Deposit {deposit_id} is not pending (status: {deposit_data['status']})")
+            if outcome['result'] == 'not_pending':
+                logger.warning(f"Deposit {deposit_id} is not pending (status: {outcome['status']})")
                 return False
             
-            user_id = deposit_data['user_id']
-            original_amount = deposit_data['amount']
-            
-            # Update deposit status to approved with admin amount
-            deposit_ref = self.db.collection('deposits').document(deposit_id)
-            deposit_ref.update({
-                'status': 'approved',
-                'updated_at': firestore.SERVER_TIMESTAMP
-            })
+            if outcome['result'] == 'user_not_found':
+                logger.error(f"User {outcome['user_id']} not found for balance update")
+                return False
             
-            # Update user balance with admin amount
-            user_ref = self.db.collection('users').document(user_id)
-            user_doc = user_ref.get()
+            user_id = outcome['user_id']
+            self._discard_pending('deposits', deposit_id)
+            self._cache_user_write(user_id, {'balance': outcome['new_balance']})
             
-            if user_doc.exists:
-                current_balance = user_doc.to_dict().get('balance', 0)
-                new_balance = current_balance + admin_amount
-                
-                user_ref.update({
-                    'balance': new_balance,
-                    'updated_at': firestore.SERVER_TIMESTAMP
-                })
-                
-                logger.info(f"Approved deposit {deposit_id}: User {user_id} balance updated from {current_balance} to {new_balance} (admin amount: {admin_amount}, original: {original_amount})")
-                return True
-            else:
-                logger.error(f"User {user_id} not found for balance update")
-                return False
+            logger.info(f"Approved deposit {deposit_id}: User {user_id} balance updated from {outcome['current_balance']} to {outcome['new_balance']} (admin amount: {admin_amount}, original: {outcome['original_amount']})")
+            return True
                 
         except Exception as e:
             logger.error(f"Error approving deposit {deposit_id}: {e}")
             return False
 
-    def approve_withdrawal(self, withdrawal_id, admin_amount):
+    async def approve_withdrawal(self, withdrawal_id, admin_amount):
         """
         Approve withdrawal manually from admin and update the withdrawal status to approved and deduct from user balance
         
@@ -251,99 +916,203 @@ class FirebaseService:
             bool: True if successful, False otherwise
         """
         try:
-            # Get withdrawal data
-            withdrawal_data = self.get_withdrawal_by_id(withdrawal_id)
-            if not withdrawal_data:
+            # Read, validate and write everything in a single atomic commit
+            outcome = await _approve_withdrawal_async_transaction(self.db.transaction(), self.db, withdrawal_id, admin_amount)
+            
+            if outcome['result'] == 'not_found':
                 logger.error(f"Withdrawal {withdrawal_id} not found for approval")
                 return False
             
-            if withdrawal_data['status'] != 'pending':
-                logger.warning(f"Withdrawal {withdrawal_id} is not pending (status: {withdrawal_data['status']})")
+            if outcome['result'] == 'not_pending':
+                logger.warning(f"Withdrawal {withdrawal_id} is not pending (status: {outcome['status']})")
                 return False
             
-            user_id = withdrawal_data['user_id']
-            original_amount = withdrawal_data['amount']
-            
-            # Check if user has sufficient balance
-            user_ref = self.db.collection('users').document(user_id)
-            user_doc = user_ref.get()
-            
-            if not user_doc.exists:
-                logger.error(f"User {user_id} not found for balance check")
+            if outcome['result'] == 'user_not_found':
+                logger.error(f"User {outcome['user_id']} not found for balance check")
                 return False
             
-            current_balance = user_doc.to_dict().get('balance', 0)
-            
-            if current_balance < admin_amount:
-                logger.warning(f"Insufficient balance for withdrawal {withdrawal_id}: User {user_id} has {current_balance}, requested {admin_amount}")
+            if outcome['result'] == 'insufficient_balance':
+                logger.warning(f"Insufficient balance for withdrawal {withdrawal_id}: User {outcome['user_id']} has {outcome['current_balance']}, requested {admin_amount}")
                 return False
             
-            # Update withdrawal status to approved
-            withdrawal_ref = self.db.collection('withdrawals').document(withdrawal_id)
-            withdrawal_ref.update({
-                'status': 'approved',
-                'updated_at': firestore.SERVER_TIMESTAMP
-            })
-            
-            # Deduct from user balance
-            new_balance = current_balance - admin_amount
+            user_id = outcome['user_id']
+            self._discard_pending('withdrawals', withdrawal_id)
+            self._cache_user_write(user_id, {'balance': outcome['new_balance']})
             
-            user_ref.update({
-                'balance': new_balance,
-                'updated_at': firestore.SERVER_TIMESTAMP
-            })
-            
-            logger.info(f"Approved withdrawal {withdrawal_id}: User {user_id} balance updated from {current_balance} to {new_balance} (admin amount: {admin_amount}, original: {original_amount})")
+            logger.info(f"Approved withdrawal {withdrawal_id}: User {user_id} balance updated from {outcome['current_balance']} to {outcome['new_balance']} (admin amount: {admin_amount}, original: {outcome['original_amount']})")
             return True
                 
         except Exception as e:
             logger.error(f"Error approving withdrawal {withdrawal_id}: {e}")
             return False
 
-    def get_transaction_statistics(self):
+    async def bulk_approve_deposits(self, deposit_ids):
+        """
+        Approve many pending deposits at their requested amounts
+        
+        Args:
+            deposit_ids (iterable): Deposit document IDs, duplicates are ignored
+            
+        Returns:
+            list: Per-deposit outcome dicts with 'id' and 'result'
+        """
+        return await self._bulk_approve('deposits', deposit_ids)
+
+    async def bulk_approve_withdrawals(self, withdrawal_ids):
+        """
+        Approve many pending withdrawals at their requested amounts
+        
+        Args:
+            withdrawal_ids (iterable): Withdrawal document IDs, duplicates are ignored
+            
+        Returns:
+            list: Per-withdrawal outcome dicts with 'id' and 'result'
+        """
+        return await self._bulk_approve('withdrawals', withdrawal_ids)
+
+    async def _bulk_approve(self, collection_name, doc_ids):
+        """Approve documents chunk by chunk, each chunk in its own transaction"""
+        outcomes = []
+        for chunk_ids in self._bulk_approval_chunks(doc_ids):
+            try:
+                chunk_outcomes = await _bulk_approve_async_transaction(self.db.transaction(), self.db, collection_name, chunk_ids)
+            except Exception as e:
+                logger.error(f"Error bulk approving {len(chunk_ids)} {collection_name}: {e}")
+                chunk_outcomes = [{'id': doc_id, 'result': 'error', 'error': str(e)} for doc_id in chunk_ids]
+            
+            self._apply_bulk_outcomes(collection_name, chunk_outcomes)
+            outcomes.extend(chunk_outcomes)
+        
+        approved = sum(1 for outcome in outcomes if outcome['result'] == 'approved')
+        logger.info(f"Bulk approved {approved} of {len(outcomes)} {collection_name}")
+        return outcomes
+
+    async def get_transaction_statistics(self):
         """
         Get transaction statistics for admin dashboard
         
+        The pending counts and totals come from the counter shards when
+        STATS_COUNTERS_ENABLED is set and the shards hold a consistent state,
+        otherwise from aggregation queries. Users are always counted with an
+        aggregation because the mini app creates users without touching the shards.
+        
         Returns:
             dict: Statistics including counts and totals
         """
         try:
-            # Get pending deposits
-            pending_deposits = self.get_pending_deposits()
-            pending_withdrawals = self.get_pending_withdrawals()
+            if not BotConfig.STATS_COUNTERS_ENABLED:
+                return await self._aggregate_transaction_statistics()
             
-            # Calculate totals
-            total_deposit_amount = sum(deposit.get('amount', 0) for deposit in pending_deposits)
-            total_withdrawal_amount = sum(withdrawal.get('amount', 0) for withdrawal in pending_withdrawals)
+            shards, user_results = await asyncio.gather(
+                self._get_statistics_shards(),
+                self.db.collection('users').count(alias='count').get()
+            )
+            stats = _statistics_from_shards(shards)
             
-            # Get user count
-            users_ref = self.db.collection('users')
-            total_users = len(list(users_ref.stream()))
-            
-            stats = {
-                'pending_deposits_count': len(pending_deposits),
-                'pending_withdrawals_count': len(pending_withdrawals),
-                'total_pending': len(pending_deposits) + len(pending_withdrawals),
-                'total_deposit_amount': total_deposit_amount,
-                'total_withdrawal_amount': total_withdrawal_amount,
-                'total_users': total_users
-            }
+            if stats is None:
+                logger.warning("Statistics counters not initialized or inconsistent, using aggregation queries")
+                return await self._aggregate_transaction_statistics()
             
+            stats['total_users'] = _aggregation_values(user_results)['count']
             logger.info(f"Retrieved transaction statistics: {stats}")
             return stats
             
         except Exception as e:
             logger.error(f"Error fetching transaction statistics: {e}")
-            return {
-                'pending_deposits_count': 0,
-                'pending_withdrawals_count': 0,
-                'total_pending': 0,
-                'total_deposit_amount': 0,
-                'total_withdrawal_amount': 0,
-                'total_users': 0
-            }
+            return _empty_statistics()
+
+    async def _get_statistics_shards(self):
+        """Read every counter shard as a dict"""
+        return [shard.to_dict() async for shard in _statistics_shards_ref(self.db).stream()]
+
+    async def _aggregate_transaction_statistics(self):
+        """
+        Compute statistics with aggregation queries over the source collections
+        
+        Returns:
+            dict: Statistics including counts and totals
+        """
+        # Count and sum on the server, running the three aggregations concurrently
+        deposit_results, withdrawal_results, user_results = await asyncio.gather(
+            _pending_amount_aggregation(self.db.collection('deposits')).get(),
+            _pending_amount_aggregation(self.db.collection('withdrawals')).get(),
+            self.db.collection('users').count(alias='count').get()
+        )
+        deposits = _aggregation_values(deposit_results)
+        withdrawals = _aggregation_values(withdrawal_results)
+        users = _aggregation_values(user_results)
+        
+        stats = {
+            'pending_deposits_count': deposits['count'],
+            'pending_withdrawals_count': withdrawals['count'],
+            'total_pending': deposits['count'] + withdrawals['count'],
+            'total_deposit_amount': deposits['total'],
+            'total_withdrawal_amount': withdrawals['total'],
+            'total_users': users['count']
+        }
+        logger.info(f"Aggregated transaction statistics: {stats}")
+        return stats
+
+    async def rebuild_transaction_statistics(self):
+        """
+        Recompute statistics with aggregation queries and reset the counter shards
+        
+        Approvals committed while the aggregations run can be lost from the
+        counters, so rebuild when no transactions are being processed.
+        
+        Returns:
+            dict: Statistics including counts and totals
+            
+        Raises:
+            Exception: If the aggregations or the shard reset fail
+        """
+        try:
+            stats = await self._aggregate_transaction_statistics()
+            
+            batch = self.db.batch()
+            for shard_ref, shard_data in _statistics_reset_writes(self.db, stats):
+                batch.set(shard_ref, shard_data)
+            await batch.commit()
+            
+            logger.info(f"Rebuilt transaction statistics: {stats}")
+            return stats
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding transaction statistics: {e}")
+            raise
+
+    async def backfill_pending_created_at(self):
+        """
+        Set created_at on pending deposits and withdrawals that lack it
+        
+        Paged pending views order by created_at, and Firestore leaves documents
+        without the field out of such queries. The document's create time
+        stands in for the missing value.
+        
+        Returns:
+            int: Number of documents updated
+            
+        Raises:
+            Exception: If reading or updating the documents fails
+        """
+        missing = []
+        for collection_name in self.PENDING_COLLECTIONS:
+            query = self.db.collection(collection_name).where('status', '==', 'pending').select(['created_at'])
+            async for doc in query.stream():
+                if 'created_at' not in doc.to_dict():
+                    missing.append(doc)
+        
+        for start in range(0, len(missing), MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for doc in missing[start:start + MAX_BATCH_WRITES]:
+                batch.update(doc.reference, {'created_at': doc.create_time})
+            await batch.commit()
+        
+        if missing:
+            logger.info(f"Backfilled created_at on {len(missing)} pending transactions")
+        return len(missing)
 
-    def get_user_by_id(self, user_id):
+    async def get_user_by_id(self, user_id):
         """
         Get user information by user ID
         
@@ -353,13 +1122,18 @@ class FirebaseService:
         Returns:
             dict: User data or None if not found
         """
+        user_data = self._get_cached_user(user_id)
+        if user_data is not None:
+            return user_data
+        
         try:
             user_ref = self.db.collection('users').document(user_id)
-            doc = user_ref.get()
+            doc = await user_ref.get()
             
             if doc.exists:
                 user_data = doc.to_dict()
                 user_data['id'] = doc.id
+                self._cache_user(user_id, user_data)
                 return user_data
             else:
                 logger.warning(f"User {user_id} not found")
@@ -369,12 +1143,54 @@ class FirebaseService:
             logger.error(f"Error fetching user {user_id}: {e}")
             return None
 
-# Global Firebase service instance
-firebase_service = None
+    async def get_users_by_ids(self, user_ids):
+        """
+        Get several users in one multi-document read
+        
+        Args:
+            user_ids (iterable): User IDs, duplicates and empty values are ignored
+            
+        Returns:
+            dict: Mapping of user ID to user data for users that exist
+        """
+        unique_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids if user_id))
+        if not unique_ids:
+            return {}
+        
+        users = {}
+        for user_id in unique_ids:
+            user_data = self._get_cached_user(user_id)
+            if user_data is not None:
+                users[user_id] = user_data
+        
+        missing_ids = [user_id for user_id in unique_ids if user_id not in users]
+        if not missing_ids:
+            return users
+        
+        try:
+            users_ref = self.db.collection('users')
+            refs = [users_ref.document(user_id) for user_id in missing_ids]
+            
+            async for doc in self.db.get_all(refs):
+                if doc.exists:
+                    user_data = doc.to_dict()
+                    user_data['id'] = doc.id
+                    self._cache_user(doc.id, user_data)
+                    users[doc.id] = user_data
+            
+            logger.info(f"Retrieved {len(users)} of {len(unique_ids)} requested users ({len(missing_ids)} read from Firestore)")
+            return users
+            
+        except Exception as e:
+            logger.error(f"Error fetching users {unique_ids}: {e}")
+            return users
+
+# Global async Firebase service instance
+async_firebase_service = None
 
-def get_firebase_service():
-    """Get Firebase service instance"""
-    global firebase_service
-    if firebase_service is None:
-        firebase_service = FirebaseService()
-    return firebase_service 
\ No newline at end of file
+def get_async_firebase_service():
+    """Get async Firebase service instance"""
+    global async_firebase_service
+    if async_firebase_service is None:
+        async_firebase_service = AsyncFirebaseService()
+    return async_firebase_service 
\ No newline at end of file
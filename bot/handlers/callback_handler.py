@@ -2,152 +2,70 @@
 import logging
 from telebot import types
 from config import BotConfig
-from firebase_service import get_firebase_service
+from handlers.callback_router import CallbackRouter
+from broadcast import background_runs_enabled, get_broadcast_engine, start_broadcast
+from keyboards import build_broadcast_keyboard, keyboard_registry
+from media_cache import send_cached_photo
+from metrics import ERRORS
+from pagination import encode_cursor
+from report_renderer import ReportBuilder, send_report
+from services import get_async_firebase_service
+from session_store import get_session_store
 
 logger = logging.getLogger(__name__)
 
-# Store user states for deposit and withdrawal flows
-user_states = {}
-
 def setup_callback_handlers(bot):
     """Setup callback handlers for inline keyboard buttons"""
+    router = CallbackRouter()
     
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('language_'))
-    async def language_callback_handler(call):
-        """Handle language selection callbacks"""
-        try:
-            # Extract language code from callback data
-            language_code = call.data.split('_')[1]
-            
-            if language_code in BotConfig.LANGUAGES:
-                # Send updated welcome card with new language
-                username = call.from_user.username or "user"
-                await send_welcome_card(bot, call.message.chat.id, username, language_code)
-                
-                # Answer callback query
-                await bot.answer_callback_query(call.id, f"Language changed to {BotConfig.LANGUAGES[language_code]['name']}")
-                
-            else:
-                await bot.answer_callback_query(call.id, "Invalid language selection")
-                
-        except Exception as e:
-            logger.error(f"Error in language callback handler: {e}")
-            await bot.answer_callback_query(call.id, "An error occurred")
+    # Language selection, the language code is the argument
+    router.add('language', None, handle_language_selection)
     
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('admin_'))
-    async def admin_callback_handler(call):
-        """Handle admin dashboard callbacks"""
-        try:
-            user_id = str(call.from_user.id)
-            
-            # Check if user is admin
-            if not BotConfig.is_admin(user_id):
-                logger.warning(f"Unauthorized admin action attempt by user {user_id}: {call.data}")
-                await bot.answer_callback_query(call.id, "❌ Access Denied - Admin Only")
-                return
-            
-            action = call.data.split('_')[1]
-            
-            if action == 'deposit':
-                # Start deposit flow
-                await handle_deposit_start(bot, call)
-                
-            elif action == 'withdraw':
-                # Start withdrawal flow
-                await handle_withdrawal_start(bot, call)
-                
-            elif action == 'pending':
-                # Show pending transactions
-                await handle_pending_transactions(bot, call)
-                
-            elif action == 'back':
-                # Return to admin dashboard
-                await handle_admin_dashboard(bot, call)
-                
-            else:
-                response = "❌ Unknown admin action"
-                await bot.edit_message_text(
-                    chat_id=call.message.chat.id,
-                    message_id=call.message.message_id,
-                    text=response,
-                    parse_mode='Markdown'
-                )
-            
-            # Answer callback query
-            await bot.answer_callback_query(call.id)
-            
-        except Exception as e:
-            logger.error(f"Error in admin callback handler: {e}")
-            await bot.answer_callback_query(call.id, "An error occurred")
+    # Admin dashboard
+    router.add('admin', 'deposit', handle_deposit_start, admin_only=True, answer=True)
+    router.add('admin', 'withdraw', handle_withdrawal_start, admin_only=True, answer=True)
+    router.add('admin', 'pending', handle_pending_transactions, admin_only=True, answer=True)
+    router.add('admin', 'bulkdeposit', handle_bulk_start, 'deposits', admin_only=True, answer=True)
+    router.add('admin', 'bulkwithdraw', handle_bulk_start, 'withdrawals', admin_only=True, answer=True)
+    router.add('admin', 'broadcast', handle_broadcast_start, admin_only=True, answer=True)
+    router.add('admin', 'rebuildstats', handle_rebuild_statistics, admin_only=True, answer=True)
+    router.add('admin', 'back', handle_admin_dashboard, admin_only=True, answer=True)
     
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('deposit_'))
-    async def deposit_callback_handler(call):
-        """Handle deposit-specific callbacks"""
-        try:
-            user_id = str(call.from_user.id)
-            
-            # Check if user is admin
-            if not BotConfig.is_admin(user_id):
-                logger.warning(f"Unauthorized deposit action attempt by user {user_id}: {call.data}")
-                await bot.answer_callback_query(call.id, "❌ Access Denied - Admin Only")
-                return
-            
-            action = call.data.split('_')[1]
-            
-            if action == 'back':
-                # Return to admin dashboard
-                await handle_admin_dashboard(bot, call)
-                
-            elif action == 'complete':
-                # Complete the deposit process
-                await handle_deposit_complete(bot, call)
-                
-            else:
-                await bot.answer_callback_query(call.id, "Unknown deposit action")
-                
-        except Exception as e:
-            logger.error(f"Error in deposit callback handler: {e}")
-            await bot.answer_callback_query(call.id, "An error occurred")
+    # Deposit, withdrawal and bulk approval flows
+    router.add('deposit', 'back', handle_admin_dashboard, admin_only=True)
+    router.add('deposit', 'complete', handle_deposit_complete, admin_only=True)
+    router.add('withdrawal', 'back', handle_admin_dashboard, admin_only=True)
+    router.add('withdrawal', 'complete', handle_withdrawal_complete, admin_only=True)
+    router.add('bulk', 'back', handle_admin_dashboard, admin_only=True)
+    router.add('bulk', 'confirm', handle_bulk_complete, admin_only=True)
     
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('withdrawal_'))
-    async def withdrawal_callback_handler(call):
-        """Handle withdrawal-specific callbacks"""
-        try:
-            user_id = str(call.from_user.id)
-            
-            # Check if user is admin
-            if not BotConfig.is_admin(user_id):
-                logger.warning(f"Unauthorized withdrawal action attempt by user {user_id}: {call.data}")
-                await bot.answer_callback_query(call.id, "❌ Access Denied - Admin Only")
-                return
-            
-            action = call.data.split('_')[1]
-            
-            if action == 'back':
-                # Return to admin dashboard
-                await handle_admin_dashboard(bot, call)
-                
-            elif action == 'complete':
-                # Complete the withdrawal process
-                await handle_withdrawal_complete(bot, call)
-                
-            else:
-                await bot.answer_callback_query(call.id, "Unknown withdrawal action")
-                
-        except Exception as e:
-            logger.error(f"Error in withdrawal callback handler: {e}")
-            await bot.answer_callback_query(call.id, "An error occurred")
+    # Broadcasts: broadcast_<action>[_<job id>]
+    router.add('broadcast', 'back', handle_admin_dashboard, admin_only=True)
+    router.add('broadcast', 'confirm', handle_broadcast_confirm, admin_only=True)
+    router.add('broadcast', 'cancel', handle_broadcast_cancel, arg_count=1, admin_only=True)
+    router.add('broadcast', 'resume', handle_broadcast_resume, arg_count=1, admin_only=True)
+    
+    # Pending pages: pending_<kind>_<direction>_<cursor>
+    for kind in PENDING_PAGE_KINDS:
+        router.add('pending', kind, handle_pending_page, kind, arg_count=3, admin_only=True, answer=True)
     
     @bot.callback_query_handler(func=lambda call: True)
-    async def general_callback_handler(call):
-        """Handle any other callbacks"""
-        try:
-            logger.info(f"Unhandled callback: {call.data} from user {call.from_user.id}")
-            await bot.answer_callback_query(call.id, "This feature is not available yet")
-            
-        except Exception as e:
-            logger.error(f"Error in general callback handler: {e}")
-            await bot.answer_callback_query(call.id, "An error occurred")
+    async def callback_query_handler(call):
+        """Route every callback through the dispatch table"""
+        await router.dispatch(bot, call)
+
+async def handle_language_selection(bot, call, language_code):
+    """Handle language selection callbacks"""
+    if language_code in BotConfig.LANGUAGES:
+        # Send updated welcome card with new language
+        username = call.from_user.username or "user"
+        await send_welcome_card(bot, call.message.chat.id, username, language_code)
+        
+        # Answer callback query
+        await bot.answer_callback_query(call.id, f"Language changed to {BotConfig.LANGUAGES[language_code]['name']}")
+        
+    else:
+        await bot.answer_callback_query(call.id, "Invalid language selection")
 
 async def handle_deposit_start(bot, call):
     """Handle the start of deposit flow"""
@@ -155,11 +73,11 @@ async def handle_deposit_start(bot, call):
         user_id = str(call.from_user.id)
         
         # Set user state to waiting for deposit ID
-        user_states[user_id] = {
+        await get_session_store().set(user_id, {
             'state': 'waiting_deposit_id',
             'message_id': call.message.message_id,
             'chat_id': call.message.chat.id
-        }
+        })
         
         # Show deposit ID input prompt
         response = """
@@ -172,10 +90,7 @@ Please enter the **Deposit ID** you want to process:
 ⚠️ **Note:** Make sure the deposit ID exists and is in pending status.
         """
         
-        keyboard = types.InlineKeyboardMarkup()
-        keyboard.add(
-            types.InlineKeyboardButton("🔙 Back to Admin", callback_data="deposit_back")
-        )
+        keyboard = keyboard_registry.back('deposit')
         
         await bot.edit_message_text(
             chat_id=call.message.chat.id,
@@ -189,6 +104,7 @@ Please enter the **Deposit ID** you want to process:
         
     except Exception as e:
         logger.error(f"Error in handle_deposit_start: {e}")
+        ERRORS.inc('handle_deposit_start')
         await bot.answer_callback_query(call.id, "An error occurred")
 
 async def handle_withdrawal_start(bot, call):
@@ -197,11 +113,11 @@ async def handle_withdrawal_start(bot, call):
         user_id = str(call.from_user.id)
         
         # Set user state to waiting for withdrawal ID
-        user_states[user_id] = {
+        await get_session_store().set(user_id, {
             'state': 'waiting_withdrawal_id',
             'message_id': call.message.message_id,
             'chat_id': call.message.chat.id
-        }
+        })
         
         # Show withdrawal ID input prompt
         response = """
@@ -214,10 +130,7 @@ Please enter the **Withdrawal ID** you want to process:
 ⚠️ **Note:** Make sure the withdrawal ID exists and is in pending status.
         """
         
-        keyboard = types.InlineKeyboardMarkup()
-        keyboard.add(
-            types.InlineKeyboardButton("🔙 Back to Admin", callback_data="withdrawal_back")
-        )
+        keyboard = keyboard_registry.back('withdrawal')
         
         await bot.edit_message_text(
             chat_id=call.message.chat.id,
@@ -231,6 +144,7 @@ Please enter the **Withdrawal ID** you want to process:
         
     except Exception as e:
         logger.error(f"Error in handle_withdrawal_start: {e}")
+        ERRORS.inc('handle_withdrawal_start')
         await bot.answer_callback_query(call.id, "An error occurred")
 
 async def handle_deposit_complete(bot, call):
@@ -238,19 +152,20 @@ async def handle_deposit_complete(bot, call):
     try:
         user_id = str(call.from_user.id)
         
-        if user_id not in user_states:
+        session_store = get_session_store()
+        state = await session_store.get(user_id)
+        
+        if state is None:
             await bot.answer_callback_query(call.id, "No active deposit session")
             return
         
-        state = user_states[user_id]
-        
         if 'deposit_id' not in state or 'amount' not in state:
             await bot.answer_callback_query(call.id, "Missing deposit information")
             return
         
         # Process the deposit
-        firebase_service = get_firebase_service()
-        success = firebase_service.approve_deposit(state['deposit_id'], state['amount'])
+        firebase_service = get_async_firebase_service()
+        success = await firebase_service.approve_deposit(state['deposit_id'], state['amount'])
         
         if success:
             response = f"""
@@ -280,12 +195,9 @@ Please verify the deposit ID and try again.
             """
         
         # Clear user state
-        del user_states[user_id]
+        await session_store.delete(user_id)
         
-        keyboard = types.InlineKeyboardMarkup()
-        keyboard.add(
-            types.InlineKeyboardButton("🔙 Back to Admin", callback_data="deposit_back")
-        )
+        keyboard = keyboard_registry.back('deposit')
         
         await bot.edit_message_text(
             chat_id=call.message.chat.id,
@@ -299,6 +211,7 @@ Please verify the deposit ID and try again.
         
     except Exception as e:
         logger.error(f"Error in handle_deposit_complete: {e}")
+        ERRORS.inc('handle_deposit_complete')
         await bot.answer_callback_query(call.id, "An error occurred")
 
 async def handle_withdrawal_complete(bot, call):
@@ -306,19 +219,20 @@ async def handle_withdrawal_complete(bot, call):
     try:
         user_id = str(call.from_user.id)
         
-        if user_id not in user_states:
+        session_store = get_session_store()
+        state = await session_store.get(user_id)
+        
+        if state is None:
             await bot.answer_callback_query(call.id, "No active withdrawal session")
             return
         
-        state = user_states[user_id]
-        
         if 'withdrawal_id' not in state or 'amount' not in state:
             await bot.answer_callback_query(call.id, "Missing withdrawal information")
             return
         
         # Process the withdrawal
-        firebase_service = get_firebase_service()
-        success = firebase_service.approve_withdrawal(state['withdrawal_id'], state['amount'])
+        firebase_service = get_async_firebase_service()
+        success = await firebase_service.approve_withdrawal(state['withdrawal_id'], state['amount'])
         
         if success:
             response = f"""
@@ -349,12 +263,9 @@ Please verify the withdrawal ID and try again.
             """
         
         # Clear user state
-        del user_states[user_id]
+        await session_store.delete(user_id)
         
-        keyboard = types.InlineKeyboardMarkup()
-        keyboard.add(
-            types.InlineKeyboardButton("🔙 Back to Admin", callback_data="withdrawal_back")
-        )
+        keyboard = keyboard_registry.back('withdrawal')
         
         await bot.edit_message_text(
             chat_id=call.message.chat.id,
@@ -368,6 +279,331 @@ Please verify the withdrawal ID and try again.
         
     except Exception as e:
         logger.error(f"Error in handle_withdrawal_complete: {e}")
+        ERRORS.inc('handle_withdrawal_complete')
+        await bot.answer_callback_query(call.id, "An error occurred")
+
+async def handle_bulk_start(bot, call, collection_name):
+    """Handle the start of bulk approval flow"""
+    try:
+        user_id = str(call.from_user.id)
+        
+        # Set user state to waiting for the IDs to approve
+        await get_session_store().set(user_id, {
+            'state': 'waiting_bulk_ids',
+            'bulk_collection': collection_name,
+            'message_id': call.message.message_id,
+            'chat_id': call.message.chat.id
+        })
+        
+        title = "💰 **Bulk Deposit Approval**" if collection_name == 'deposits' else "💸 **Bulk Withdrawal Approval**"
+        response = f"""
+{title}
+
+Send the {collection_name} to approve at their requested amounts:
+
+📝 **Format:**
+• A list of IDs separated by spaces, commas or new lines
+• Or `under 100` to select every pending one below $100
+
+⚠️ **Note:** You will be asked to confirm before anything is approved.
+        """
+        
+        keyboard = keyboard_registry.back('bulk')
+        
+        await bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=response,
+            parse_mode='Markdown',
+            reply_markup=keyboard
+        )
+        
+        logger.info(f"Bulk {collection_name} flow started for user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Error in handle_bulk_start: {e}")
+        ERRORS.inc('handle_bulk_start')
+        await bot.answer_callback_query(call.id, "An error occurred")
+
+# Report labels for bulk approval outcomes other than 'approved'
+BULK_FAILURE_REASONS = {
+    'not_found': 'Not found',
+    'not_pending': 'Already processed',
+    'user_not_found': 'User not found',
+    'insufficient_balance': 'Insufficient balance',
+    'error': 'Database error'
+}
+
+def build_bulk_report(collection_name, outcomes):
+    """
+    Build the per-item result of a bulk approval
+    
+    Args:
+        collection_name (str): 'deposits' or 'withdrawals'
+        outcomes (list): Outcome dicts returned by the bulk approval
+        
+    Returns:
+        ReportBuilder: Report with a summary block and one block per item
+    """
+    approved = [outcome for outcome in outcomes if outcome['result'] == 'approved']
+    failed = [outcome for outcome in outcomes if outcome['result'] != 'approved']
+    approved_amount = sum(outcome['original_amount'] for outcome in approved)
+    
+    report = ReportBuilder()
+    report.add(
+        f"📋 **Bulk {collection_name.title()} Report**\n\n",
+        f"✅ Approved: **{len(approved)}** (${approved_amount:.2f})\n",
+        f"❌ Failed: **{len(failed)}**\n\n"
+    )
+    
+    for outcome in failed:
+        report.add(f"❌ `{outcome['id']}` - {BULK_FAILURE_REASONS.get(outcome['result'], outcome['result'])}\n")
+    for outcome in approved:
+        report.add(f"✅ `{outcome['id']}` - ${outcome['original_amount']:.2f}\n")
+    return report
+
+async def handle_bulk_complete(bot, call):
+    """Handle bulk approval confirmation"""
+    try:
+        user_id = str(call.from_user.id)
+        
+        session_store = get_session_store()
+        state = await session_store.get(user_id)
+        if not state or state['state'] != 'bulk_confirming':
+            await bot.answer_callback_query(call.id, "No active bulk session")
+            return
+        
+        # Clear user state before approving so a second tap cannot run it again
+        await session_store.delete(user_id)
+        collection_name = state['bulk_collection']
+        
+        firebase_service = get_async_firebase_service()
+        if collection_name == 'deposits':
+            outcomes = await firebase_service.bulk_approve_deposits(state['bulk_ids'])
+        else:
+            outcomes = await firebase_service.bulk_approve_withdrawals(state['bulk_ids'])
+        
+        keyboard = keyboard_registry.back('bulk')
+        
+        await send_report(
+            bot,
+            call.message.chat.id,
+            build_bulk_report(collection_name, outcomes),
+            message_id=call.message.message_id,
+            reply_markup=keyboard,
+            file_name=f"bulk_{collection_name}_report.txt"
+        )
+        
+        logger.info(f"Bulk {collection_name} approval completed for user {user_id}: {len(outcomes)} items")
+        
+    except Exception as e:
+        logger.error(f"Error in handle_bulk_complete: {e}")
+        ERRORS.inc('handle_bulk_complete')
+        await bot.answer_callback_query(call.id, "An error occurred")
+
+# Shown instead of the broadcast flow when this process cannot run broadcasts
+BROADCAST_UNAVAILABLE_TEXT = """
+📢 **Broadcast**
+
+⚠️ Broadcasts are not available on this deployment.
+
+Sending to every user takes longer than answering one update, and the serverless webhook stops running as soon as it has answered. Run the bot with `server.py` to send broadcasts.
+"""
+
+# Callback alert for broadcast buttons pressed where broadcasts cannot run
+BROADCAST_UNAVAILABLE_ALERT = "⚠️ Broadcasts only run on the long-running server (server.py)"
+
+async def handle_broadcast_start(bot, call):
+    """Handle the start of broadcast flow"""
+    try:
+        user_id = str(call.from_user.id)
+        
+        if not background_runs_enabled():
+            await bot.edit_message_text(
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+                text=BROADCAST_UNAVAILABLE_TEXT,
+                parse_mode='Markdown',
+                reply_markup=keyboard_registry.back('broadcast')
+            )
+            return
+        
+        # Set user state to waiting for the message to broadcast
+        await get_session_store().set(user_id, {
+            'state': 'waiting_broadcast_message',
+            'message_id': call.message.message_id,
+            'chat_id': call.message.chat.id
+        })
+        
+        response = """
+📢 **Broadcast**
+
+Send the message to deliver to every user.
+
+📝 **Format:** Plain text, it is sent exactly as written
+
+⚠️ **Note:** You will see a preview and be asked to confirm before anything is sent.
+        """
+        
+        keyboard = keyboard_registry.back('broadcast')
+        
+        await bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=response,
+            parse_mode='Markdown',
+            reply_markup=keyboard
+        )
+        
+        logger.info(f"Broadcast flow started for user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Error in handle_broadcast_start: {e}")
+        ERRORS.inc('handle_broadcast_start')
+        await bot.answer_callback_query(call.id, "An error occurred")
+
+# Headline of a broadcast progress message by job status
+BROADCAST_STATUS_TITLES = {
+    'queued': "⏳ **Broadcast Queued**",
+    'running': "📢 **Broadcast in Progress**",
+    'completed': "✅ **Broadcast Completed**",
+    'cancelled': "⏹ **Broadcast Cancelled**"
+}
+
+def format_broadcast_status(job):
+    """Format the progress of a broadcast job"""
+    return ''.join((
+        f"{BROADCAST_STATUS_TITLES.get(job['status'], job['status'])}\n\n",
+        f"🆔 **Job:** `{job['id']}`\n",
+        f"✅ Delivered: **{job['delivered']}**\n",
+        f"🚫 Blocked: **{job['blocked']}**\n",
+        f"❌ Failed: **{job['failed']}**\n"
+    ))
+
+async def show_broadcast_status(bot, job):
+    """Edit the admin's broadcast message with the current progress"""
+    running = job['status'] in ('queued', 'running')
+    await bot.edit_message_text(
+        chat_id=job['chat_id'],
+        message_id=job['message_id'],
+        text=format_broadcast_status(job),
+        parse_mode='Markdown',
+        reply_markup=build_broadcast_keyboard(job['id'], running=running)
+    )
+
+def run_broadcast(bot, job_id):
+    """
+    Start sending a broadcast in the background, reporting progress to the admin
+    
+    Returns:
+        bool: False if the job is already running in this process
+    """
+    async def on_progress(job):
+        try:
+            await show_broadcast_status(bot, job)
+        except Exception as e:
+            # Progress is informational, never stop the broadcast over it
+            logger.warning(f"Error showing broadcast {job_id} progress: {e}")
+    
+    async def on_done(job):
+        if job is not None:
+            await on_progress(job)
+    
+    return start_broadcast(bot, job_id, on_progress=on_progress, on_done=on_done)
+
+async def handle_broadcast_confirm(bot, call):
+    """Handle broadcast confirmation"""
+    try:
+        user_id = str(call.from_user.id)
+        
+        session_store = get_session_store()
+        state = await session_store.get(user_id)
+        if not state or state['state'] != 'broadcast_confirming':
+            await bot.answer_callback_query(call.id, "No active broadcast session")
+            return
+        
+        if not background_runs_enabled():
+            await bot.answer_callback_query(call.id, BROADCAST_UNAVAILABLE_ALERT, show_alert=True)
+            return
+        
+        # Clear user state before creating the job so a second tap cannot send it twice
+        await session_store.delete(user_id)
+        
+        engine = get_broadcast_engine()
+        job_id = await engine.create(state['broadcast_text'], call.message.chat.id, call.message.message_id)
+        await show_broadcast_status(bot, await engine.get(job_id))
+        run_broadcast(bot, job_id)
+        
+        await bot.answer_callback_query(call.id, "📢 Broadcast started")
+        logger.info(f"Broadcast {job_id} started by user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Error in handle_broadcast_confirm: {e}")
+        ERRORS.inc('handle_broadcast_confirm')
+        await bot.answer_callback_query(call.id, "An error occurred")
+
+async def handle_broadcast_cancel(bot, call, job_id):
+    """Cancel a broadcast after the page being sent"""
+    cancelled = await get_broadcast_engine().cancel(job_id)
+    if cancelled:
+        await bot.answer_callback_query(call.id, "⏹ Broadcast will stop after the current batch")
+    else:
+        await bot.answer_callback_query(call.id, "Broadcast is not running")
+    logger.info(f"Broadcast {job_id} cancel requested by user {call.from_user.id}: {cancelled}")
+
+async def handle_broadcast_resume(bot, call, job_id):
+    """Resume a broadcast whose instance stopped before it finished"""
+    if not background_runs_enabled():
+        await bot.answer_callback_query(call.id, BROADCAST_UNAVAILABLE_ALERT, show_alert=True)
+        return
+    
+    engine = get_broadcast_engine()
+    job = await engine.get(job_id)
+    if job is None or job['status'] not in ('queued', 'running'):
+        await bot.answer_callback_query(call.id, "Broadcast is not running")
+        return
+    
+    # The engine only claims the job once its owner stopped checkpointing
+    if not run_broadcast(bot, job_id):
+        await bot.answer_callback_query(call.id, "Broadcast is already running")
+        return
+    await bot.answer_callback_query(call.id, "▶️ Resuming if the broadcast has stalled")
+    logger.info(f"Broadcast {job_id} resume requested by user {call.from_user.id}")
+
+async def handle_rebuild_statistics(bot, call):
+    """Recount the transaction statistics, reset the counter shards and repair pending timestamps"""
+    try:
+        user_id = str(call.from_user.id)
+        
+        firebase_service = get_async_firebase_service()
+        backfilled = await firebase_service.backfill_pending_created_at()
+        stats = await firebase_service.rebuild_transaction_statistics()
+        
+        stats_text = f"""
+🔄 **Statistics Rebuilt**
+
+📊 **Overview:**
+• Total Pending: **{stats['total_pending']}**
+• Pending Deposits: **{stats['pending_deposits_count']}** (${stats['total_deposit_amount']:.2f})
+• Pending Withdrawals: **{stats['pending_withdrawals_count']}** (${stats['total_withdrawal_amount']:.2f})
+• Total Users: **{stats['total_users']}**
+        """
+        if backfilled:
+            stats_text += f"\n🕒 Added missing creation times to **{backfilled}** pending transactions\n"
+        
+        await bot.edit_message_text(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            text=stats_text,
+            parse_mode='Markdown',
+            reply_markup=keyboard_registry.back('admin')
+        )
+        
+        logger.info(f"Transaction statistics rebuilt by user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Error in handle_rebuild_statistics: {e}")
+        ERRORS.inc('handle_rebuild_statistics')
         await bot.answer_callback_query(call.id, "An error occurred")
 
 async def handle_admin_dashboard(bot, call):
@@ -376,8 +612,7 @@ async def handle_admin_dashboard(bot, call):
         user_id = str(call.from_user.id)
         
         # Clear user state if exists
-        if user_id in user_states:
-            del user_states[user_id]
+        await get_session_store().delete(user_id)
         
         # Show admin dashboard
         dashboard_text = """
@@ -390,9 +625,12 @@ Select an option below to manage transactions.
 • 💰 Deposit - Process pending deposits
 • 💸 Withdraw - Process pending withdrawals
 • 🟡 Pending Transactions - View all pending transactions
+• ⚡ Bulk Approve - Approve many deposits or withdrawals at once
+• 📢 Broadcast - Send a message to every user
+• 🔄 Rebuild Statistics - Recount pending totals and users
         """
         
-        keyboard = generate_admin_keyboard()
+        keyboard = keyboard_registry.admin()
         
         await bot.edit_message_text(
             chat_id=call.message.chat.id,
@@ -406,52 +644,9 @@ Select an option below to manage transactions.
         
     except Exception as e:
         logger.error(f"Error in handle_admin_dashboard: {e}")
+        ERRORS.inc('handle_admin_dashboard')
         await bot.answer_callback_query(call.id, "An error occurred")
 
-def generate_keyboard(selected_language='english'):
-    """Generate inline keyboard with language selection and action buttons"""
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
-    
-    # Language buttons
-    language_buttons = []
-    for lang_code, lang_data in BotConfig.LANGUAGES.items():
-        label = lang_data['name']
-        if selected_language == lang_code:
-            label += " ✅"
-        language_buttons.append(
-            types.InlineKeyboardButton(label, callback_data=f"language_{lang_code}")
-        )
-    
-    # Add language buttons in rows
-    for i in range(0, len(language_buttons), 2):
-        row = language_buttons[i:i+2]
-        keyboard.add(*row)
-    
-    # Action buttons
-    keyboard.add(
-        types.InlineKeyboardButton(BotConfig.BUTTONS['launch_app'], web_app=types.WebAppInfo(url=BotConfig.WEBAPP_URL)),
-        types.InlineKeyboardButton(BotConfig.BUTTONS['contact'], url=BotConfig.CONTACT_URL)
-    )
-    
-    return keyboard
-
-def generate_admin_keyboard():
-    """Generate simple admin dashboard keyboard with 3 buttons"""
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    
-    # Three main admin buttons
-    keyboard.add(
-        types.InlineKeyboardButton("💰 Deposit", callback_data="admin_deposit")
-    )
-    keyboard.add(
-        types.InlineKeyboardButton("💸 Withdraw", callback_data="admin_withdraw")
-    )
-    keyboard.add(
-        types.InlineKeyboardButton("🟡 Pending Transactions", callback_data="admin_pending")
-    )
-    
-    return keyboard
-
 def get_welcome_message(username, language='english'):
     """Get welcome message for specified language"""
     lang_data = BotConfig.LANGUAGES.get(language, BotConfig.LANGUAGES['english'])
@@ -461,11 +656,12 @@ async def send_welcome_card(bot_instance, chat_id, username, language='english')
     """Send welcome card with photo and keyboard"""
     try:
         message = get_welcome_message(username, language)
-        keyboard = generate_keyboard(language)
+        keyboard = keyboard_registry.language(language)
         
-        await bot_instance.send_photo(
-            chat_id=chat_id,
-            photo=BotConfig.PHOTO_URL,
+        await send_cached_photo(
+            bot_instance,
+            chat_id,
+            BotConfig.PHOTO_URL,
             caption=message,
             reply_markup=keyboard
         )
@@ -473,6 +669,7 @@ async def send_welcome_card(bot_instance, chat_id, username, language='english')
         
     except Exception as e:
         logger.error(f"Error sending welcome card: {e}")
+        ERRORS.inc('send_welcome_card')
         await bot_instance.send_message(chat_id, get_error_message(language))
 
 def get_error_message(language='english'):
@@ -480,100 +677,154 @@ def get_error_message(language='english'):
     lang_data = BotConfig.LANGUAGES.get(language, BotConfig.LANGUAGES['english'])
     return lang_data['error']
 
+def get_user_label(user_id, users):
+    """Get a display label for a transaction's user"""
+    user_data = users.get(str(user_id))
+    if user_data:
+        return f"@{user_data.get('username', 'Unknown')}" if user_data.get('username') else f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip() or f"User {user_id or 'Unknown'}"
+    return f"User {user_id or 'Unknown'}"
+
+def format_created_at(created_at):
+    """Format a transaction timestamp for display"""
+    if hasattr(created_at, 'strftime'):
+        return created_at.strftime('%Y-%m-%d %H:%M')
+    return str(created_at)[:19] if created_at else 'Unknown'
+
+def format_deposit_entry(index, deposit, users):
+    """Format one pending deposit line"""
+    amount = deposit.get('amount', 0)
+    network = deposit.get('network_name', deposit.get('network', 'Unknown'))
+    
+    return ''.join((
+        f"{index}. **ID:** `{deposit['id']}`\n",
+        f"   👤 **User:** {get_user_label(deposit.get('user_id'), users)}\n",
+        f"   💵 **Amount:** ${amount:.2f} {network}\n",
+        f"   ⏰ **Time:** {format_created_at(deposit.get('created_at', 'Unknown'))}\n\n"
+    ))
+
+def format_withdrawal_entry(index, withdrawal, users):
+    """Format one pending withdrawal line"""
+    amount = withdrawal.get('amount', 0)
+    network = withdrawal.get('network_name', withdrawal.get('network', 'Unknown'))
+    address = withdrawal.get('withdrawal_address', 'Unknown')
+    
+    return ''.join((
+        f"{index}. **ID:** `{withdrawal['id']}`\n",
+        f"   👤 **User:** {get_user_label(withdrawal.get('user_id'), users)}\n",
+        f"   💵 **Amount:** ${amount:.2f} {network}\n",
+        f"   📍 **Address:** `{address[:20]}...`\n",
+        f"   ⏰ **Time:** {format_created_at(withdrawal.get('created_at', 'Unknown'))}\n\n"
+    ))
+
+# Paged pending views: callback kind code -> (collection, title, entry formatter)
+PENDING_PAGE_KINDS = {
+    'd': ('deposits', '💰 **Pending Deposits**', format_deposit_entry),
+    'w': ('withdrawals', '💸 **Pending Withdrawals**', format_withdrawal_entry)
+}
+
+def pending_page_callback(kind, direction, page, cursor):
+    """Build callback data for a pending page button, e.g. pending_d_n_1_<cursor>"""
+    return f"pending_{kind}_{direction}_{page}_{cursor}"
+
+def pending_page_navigation(kind, direction, page, cursor, transactions, has_more):
+    """
+    Get the navigation buttons of a page of pending transactions
+    
+    Args:
+        kind (str): 'd' for deposits, 'w' for withdrawals
+        direction (str): 'n' if the page was read forwards from the cursor, 'p' if backwards
+        page (int): Index of the page, 0 for the first
+        cursor (str): Cursor the page was read from
+        transactions (list): Documents on the page
+        has_more (bool): Whether more documents lie beyond the page in its direction
+        
+    Returns:
+        list: (label, callback data) pairs
+    """
+    if not transactions:
+        # Everything past the cursor was processed meanwhile, lead back the way the admin came
+        if direction == 'n':
+            return [("⬅️ Prev", pending_page_callback(kind, 'p', max(page - 1, 0), cursor))]
+        # Nothing is left before the cursor, so the page after it is the second one
+        return [("Next ➡️", pending_page_callback(kind, 'n', 1, cursor))]
+    
+    has_previous = has_more if direction == 'p' else page > 0
+    has_next = has_more if direction == 'n' else True
+    
+    buttons = []
+    if has_previous:
+        buttons.append(("⬅️ Prev", pending_page_callback(kind, 'p', page - 1, encode_cursor(transactions[0]))))
+    if has_next:
+        buttons.append(("Next ➡️", pending_page_callback(kind, 'n', page + 1, encode_cursor(transactions[-1]))))
+    return buttons
+
 async def handle_pending_transactions(bot, call):
     """Handle pending transactions display"""
     try:
         user_id = str(call.from_user.id)
+        page_size = BotConfig.PENDING_PAGE_SIZE
+        
+        # Fetch the first page of each list, counts and sums come from the counters
+        firebase_service = get_async_firebase_service()
+        snapshot = await firebase_service.get_pending_snapshot(page_size=page_size)
+        pending_deposits = snapshot.deposits
+        pending_withdrawals = snapshot.withdrawals
+        stats = snapshot.get_statistics()
+        
+        # Resolve every displayed user in a single round trip
+        displayed_user_ids = [
+            transaction.get('user_id')
+            for transaction in pending_deposits + pending_withdrawals
+        ]
+        users = await firebase_service.get_users_by_ids(displayed_user_ids)
+        
+        # Build response message with the statistics header
+        report = ReportBuilder()
+        report.add(
+            "🟡 **Pending Transactions**\n\n",
+            "📊 **Overview:**\n",
+            f"• Total Pending: **{stats['total_pending']}**\n",
+            f"• Pending Deposits: **{stats['pending_deposits_count']}** (${stats['total_deposit_amount']:.2f})\n",
+            f"• Pending Withdrawals: **{stats['pending_withdrawals_count']}** (${stats['total_withdrawal_amount']:.2f})\n",
+            f"• Total Users: **{stats['total_users']}**\n\n"
+        )
         
-        # Fetch pending transactions and statistics from Firebase
-        firebase_service = get_firebase_service()
-        pending_deposits = firebase_service.get_pending_deposits()
-        pending_withdrawals = firebase_service.get_pending_withdrawals()
-        stats = firebase_service.get_transaction_statistics()
-        
-        # Build response message
-        response = "🟡 **Pending Transactions**\n\n"
-        
-        # Add statistics header
-        response += f"📊 **Overview:**\n"
-        response += f"• Total Pending: **{stats['total_pending']}**\n"
-        response += f"• Pending Deposits: **{stats['pending_deposits_count']}** (${stats['total_deposit_amount']:.2f})\n"
-        response += f"• Pending Withdrawals: **{stats['pending_withdrawals_count']}** (${stats['total_withdrawal_amount']:.2f})\n"
-        response += f"• Total Users: **{stats['total_users']}**\n\n"
+        keyboard = types.InlineKeyboardMarkup(row_width=2)
         
         if not pending_deposits and not pending_withdrawals:
-            response += "✅ **No pending transactions found!**\n\nAll transactions have been processed."
+            report.add("✅ **No pending transactions found!**\n\nAll transactions have been processed.")
         else:
             # Display pending deposits
             if pending_deposits:
-                response += f"💰 **Pending Deposits ({len(pending_deposits)})**\n"
-                response += "─" * 40 + "\n"
+                report.add(f"💰 **Pending Deposits ({stats['pending_deposits_count']})**\n", "─" * 40, "\n")
                 
-                for i, deposit in enumerate(pending_deposits[:5], 1):  # Show first 5
-                    # Get user information
-                    user_data = firebase_service.get_user_by_id(deposit.get('user_id'))
-                    if user_data:
-                        user_info = f"@{user_data.get('username', 'Unknown')}" if user_data.get('username') else f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip() or f"User {deposit.get('user_id', 'Unknown')}"
-                    else:
-                        user_info = f"User {deposit.get('user_id', 'Unknown')}"
-                    
-                    amount = deposit.get('amount', 0)
-                    network = deposit.get('network_name', deposit.get('network', 'Unknown'))
-                    created_at = deposit.get('created_at', 'Unknown')
-                    
-                    # Format timestamp if available
-                    if hasattr(created_at, 'strftime'):
-                        time_str = created_at.strftime('%Y-%m-%d %H:%M')
-                    else:
-                        time_str = str(created_at)[:19] if created_at else 'Unknown'
-                    
-                    response += f"{i}. **ID:** `{deposit['id']}`\n"
-                    response += f"   👤 **User:** {user_info}\n"
-                    response += f"   💵 **Amount:** ${amount:.2f} {network}\n"
-                    response += f"   ⏰ **Time:** {time_str}\n\n"
+                for i, deposit in enumerate(pending_deposits, 1):
+                    report.add(format_deposit_entry(i, deposit, users))
                 
-                if len(pending_deposits) > 5:
-                    response += f"*... and {len(pending_deposits) - 5} more deposits*\n\n"
+                if len(pending_deposits) == page_size:
+                    keyboard.add(
+                        types.InlineKeyboardButton("💰 More Deposits ➡️", callback_data=pending_page_callback('d', 'n', 1, encode_cursor(pending_deposits[-1])))
+                    )
             
             # Display pending withdrawals
             if pending_withdrawals:
-                response += f"💸 **Pending Withdrawals ({len(pending_withdrawals)})**\n"
-                response += "─" * 40 + "\n"
+                report.add(f"💸 **Pending Withdrawals ({stats['pending_withdrawals_count']})**\n", "─" * 40, "\n")
                 
-                for i, withdrawal in enumerate(pending_withdrawals[:5], 1):  # Show first 5
-                    # Get user information
-                    user_data = firebase_service.get_user_by_id(withdrawal.get('user_id'))
-                    if user_data:
-                        user_info = f"@{user_data.get('username', 'Unknown')}" if user_data.get('username') else f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip() or f"User {withdrawal.get('user_id', 'Unknown')}"
-                    else:
-                        user_info = f"User {withdrawal.get('user_id', 'Unknown')}"
-                    
-                    amount = withdrawal.get('amount', 0)
-                    network = withdrawal.get('network_name', withdrawal.get('network', 'Unknown'))
-                    address = withdrawal.get('withdrawal_address', 'Unknown')
-                    created_at = withdrawal.get('created_at', 'Unknown')
-                    
-                    # Format timestamp if available
-                    if hasattr(created_at, 'strftime'):
-                        time_str = created_at.strftime('%Y-%m-%d %H:%M')
-                    else:
-                        time_str = str(created_at)[:19] if created_at else 'Unknown'
-                    
-                    response += f"{i}. **ID:** `{withdrawal['id']}`\n"
-                    response += f"   👤 **User:** {user_info}\n"
-                    response += f"   💵 **Amount:** ${amount:.2f} {network}\n"
-                    response += f"   📍 **Address:** `{address[:20]}...`\n"
-                    response += f"   ⏰ **Time:** {time_str}\n\n"
+                for i, withdrawal in enumerate(pending_withdrawals, 1):
+                    report.add(format_withdrawal_entry(i, withdrawal, users))
                 
-                if len(pending_withdrawals) > 5:
-                    response += f"*... and {len(pending_withdrawals) - 5} more withdrawals*\n\n"
+                if len(pending_withdrawals) == page_size:
+                    keyboard.add(
+                        types.InlineKeyboardButton("💸 More Withdrawals ➡️", callback_data=pending_page_callback('w', 'n', 1, encode_cursor(pending_withdrawals[-1])))
+                    )
             
-            response += "💡 **Quick Actions:**\n"
-            response += "• Use 💰 **Process Deposits** to approve deposits\n"
-            response += "• Use 💸 **Process Withdrawals** to approve withdrawals\n"
+            report.add(
+                "💡 **Quick Actions:**\n",
+                "• Use 💰 **Process Deposits** to approve deposits\n",
+                "• Use 💸 **Process Withdrawals** to approve withdrawals\n"
+            )
         
-        # Create keyboard with action buttons
-        keyboard = types.InlineKeyboardMarkup(row_width=2)
+        # Add action buttons
         keyboard.add(
             types.InlineKeyboardButton("💰 Process Deposits", callback_data="admin_deposit"),
             types.InlineKeyboardButton("💸 Process Withdrawals", callback_data="admin_withdraw")
@@ -582,22 +833,100 @@ async def handle_pending_transactions(bot, call):
             types.InlineKeyboardButton("🔙 Back to Admin", callback_data="admin_back")
         )
         
-        await bot.edit_message_text(
-            chat_id=call.message.chat.id,
+        await send_report(
+            bot,
+            call.message.chat.id,
+            report,
             message_id=call.message.message_id,
-            text=response,
-            parse_mode='Markdown',
-            reply_markup=keyboard
+            reply_markup=keyboard,
+            file_name="pending_transactions.txt"
         )
         
         logger.info(f"Pending transactions displayed for user {user_id}: {len(pending_deposits)} deposits, {len(pending_withdrawals)} withdrawals")
         
     except Exception as e:
         logger.error(f"Error in handle_pending_transactions: {e}")
+        ERRORS.inc('handle_pending_transactions')
         await bot.answer_callback_query(call.id, "An error occurred")
         await bot.edit_message_text(
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
             text="❌ **Error Loading Pending Transactions**\n\nAn error occurred while fetching pending transactions. Please try again.",
             parse_mode='Markdown'
-        ) 
\ No newline at end of file
+        )
+
+async def handle_pending_page(bot, call, kind, direction, page, cursor):
+    """
+    Handle one page of pending deposits or withdrawals
+    
+    Args:
+        kind (str): 'd' for deposits, 'w' for withdrawals
+        direction (str): 'n' for the page after the cursor, 'p' for the page before it
+        page (str): Index of the requested page, 0 for the first
+        cursor (str): Position of the first or last item of the current page
+    """
+    try:
+        user_id = str(call.from_user.id)
+        page_size = BotConfig.PENDING_PAGE_SIZE
+        collection_name, title, format_entry = PENDING_PAGE_KINDS[kind]
+        page = max(int(page), 0)
+        
+        # Fetch one page plus one document that tells whether another page follows
+        firebase_service = get_async_firebase_service()
+        if direction == 'p':
+            page_args = {'limit': page_size + 1, 'end_before': cursor}
+        else:
+            page_args = {'limit': page_size + 1, 'start_after': cursor}
+        
+        if collection_name == 'deposits':
+            transactions = await firebase_service.get_pending_deposits(**page_args)
+        else:
+            transactions = await firebase_service.get_pending_withdrawals(**page_args)
+        
+        has_more = len(transactions) > page_size
+        if direction == 'p':
+            transactions = transactions[-page_size:]
+            if not has_more:
+                # Walked back to the start, whatever the page index said
+                page = 0
+        else:
+            transactions = transactions[:page_size]
+        
+        users = await firebase_service.get_users_by_ids(
+            transaction.get('user_id') for transaction in transactions
+        )
+        
+        report = ReportBuilder()
+        report.add(f"{title}\n", "─" * 40, "\n")
+        
+        if not transactions:
+            report.add(f"✅ **No more pending {collection_name}.**\n")
+        for i, transaction in enumerate(transactions, page * page_size + 1):
+            report.add(format_entry(i, transaction, users))
+        
+        keyboard = types.InlineKeyboardMarkup(row_width=2)
+        navigation = pending_page_navigation(kind, direction, page, cursor, transactions, has_more)
+        if navigation:
+            keyboard.add(*(
+                types.InlineKeyboardButton(label, callback_data=callback_data)
+                for label, callback_data in navigation
+            ))
+        keyboard.add(
+            types.InlineKeyboardButton("🔙 Back to Pending", callback_data="admin_pending")
+        )
+        
+        await send_report(
+            bot,
+            call.message.chat.id,
+            report,
+            message_id=call.message.message_id,
+            reply_markup=keyboard,
+            file_name=f"pending_{collection_name}.txt"
+        )
+        
+        logger.info(f"Pending {collection_name} page displayed for user {user_id}: {len(transactions)} items")
+        
+    except Exception as e:
+        logger.error(f"Error in handle_pending_page: {e}")
+        ERRORS.inc('handle_pending_page')
+        await bot.answer_callback_query(call.id, "An error occurred")
@@ -0,0 +1,118 @@
+"""
+Table-driven routing of inline keyboard callbacks
+"""
+import logging
+from config import BotConfig
+from metrics import ERRORS, timed_handler
+
+logger = logging.getLogger(__name__)
+
+class CallbackData:
+    """callback_data split into prefix, action and positional arguments"""
+    
+    __slots__ = ('prefix', 'action', 'args')
+    
+    def __init__(self, prefix, action=None, args=()):
+        self.prefix = prefix
+        self.action = action
+        self.args = args
+    
+    def __repr__(self):
+        return f"CallbackData(prefix={self.prefix!r}, action={self.action!r}, args={self.args!r})"
+
+class CallbackRoute:
+    """Handler registered for one prefix/action pair"""
+    
+    __slots__ = ('handler', 'bound_args', 'arg_count', 'admin_only', 'answer')
+    
+    def __init__(self, handler, bound_args, arg_count, admin_only, answer):
+        self.handler = handler
+        self.bound_args = bound_args
+        self.arg_count = arg_count
+        self.admin_only = admin_only
+        self.answer = answer
+
+class CallbackRouter:
+    """Dispatches callbacks by (prefix, action) with a single dict lookup"""
+    
+    def __init__(self):
+        self._routes = {}
+    
+    def add(self, prefix, action, handler, *bound_args, arg_count=0, admin_only=False, answer=False):
+        """
+        Register a callback handler
+        
+        Args:
+            prefix (str): Text before the first underscore, e.g. 'admin'
+            action (str): Text after it, or None to pass it to the handler as the first argument
+            handler (callable): Coroutine called as handler(bot, call, *bound_args, *args)
+            *bound_args: Fixed arguments passed before the parsed ones
+            arg_count (int): Number of underscore-separated arguments after the action,
+                the last one keeps any further underscores
+            admin_only (bool): Reject callbacks from non-admin users
+            answer (bool): Answer the callback query after the handler returns
+        """
+        if action is None:
+            arg_count += 1
+        # Each route reports its own latency, e.g. handle_pending_transactions,
+        # dispatch() counts its errors together with those of answering the query
+        handler = timed_handler(handler, count_errors=False)
+        self._routes[(prefix, action)] = CallbackRoute(handler, bound_args, arg_count, admin_only, answer)
+    
+    def parse(self, data):
+        """
+        Parse callback_data and find its route
+        
+        Args:
+            data (str): Raw callback_data
+            
+        Returns:
+            tuple: (CallbackRoute or None, CallbackData)
+        """
+        prefix, _, rest = data.partition('_')
+        action, _, arguments = rest.partition('_')
+        
+        route = self._routes.get((prefix, action))
+        if route is None:
+            route = self._routes.get((prefix, None))
+            if route is None:
+                return None, CallbackData(prefix, action)
+            action, arguments = None, rest
+            
+        args = tuple(arguments.split('_', route.arg_count - 1)) if route.arg_count else ()
+        # Every expected argument must be present and non-empty, e.g. not 'broadcast_cancel_'
+        if len(args) != route.arg_count or not all(args) or (not route.arg_count and arguments):
+            return None, CallbackData(prefix, action, args)
+        return route, CallbackData(prefix, action, args)
+    
+    async def dispatch(self, bot, call):
+        """
+        Route one callback query to its handler
+        
+        Args:
+            bot: AsyncTeleBot instance
+            call: Telegram callback query
+        """
+        route, data = self.parse(call.data or '')
+        try:
+            if route is None:
+                logger.info(f"Unhandled callback: {call.data} from user {call.from_user.id}")
+                await bot.answer_callback_query(call.id, "This feature is not available yet")
+                return
+                
+            user_id = str(call.from_user.id)
+            if route.admin_only and not BotConfig.is_admin(user_id):
+                logger.warning(f"Unauthorized {data.prefix} action attempt by user {user_id}: {call.data}")
+                await bot.answer_callback_query(call.id, "❌ Access Denied - Admin Only")
+                return
+                
+            await route.handler(bot, call, *route.bound_args, *data.args)
+            
+            if route.answer:
+                await bot.answer_callback_query(call.id)
+                
+        except Exception as e:
+            logger.error(f"Error in {data.prefix} callback handler: {e}")
+            if route is not None:
+                ERRORS.inc(route.handler.__name__)
+            await bot.answer_callback_query(call.id, "An error occurred")
@@ -1,8 +1,9 @@
 import logging
-from telebot import types
 from config import BotConfig
-from firebase_service import get_firebase_service
-from handlers.callback_handler import generate_admin_keyboard
+from handlers.callback_handler import send_welcome_card
+from keyboards import keyboard_registry
+from metrics import ERRORS
+from services import get_async_firebase_service
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +30,8 @@ def setup_command_handlers(bot):
             
             # Store user data in Firebase (optional)
             try:
-                firebase_service = get_firebase_service()
-                success = firebase_service.create_or_update_user(user_data)
+                firebase_service = get_async_firebase_service()
+                success = await firebase_service.create_or_update_user(user_data)
                 
                 if success:
                     logger.info(f"User data stored successfully for user {user_id}")
@@ -38,6 +39,7 @@ def setup_command_handlers(bot):
                     logger.warning(f"Failed to store user data for user {user_id}")
             except Exception as firebase_error:
                 logger.warning(f"Firebase service not available: {firebase_error}")
+                ERRORS.inc('start_handler')
                 # Continue without Firebase - bot should still work
             
             # Send welcome card with default language
@@ -45,6 +47,7 @@ def setup_command_handlers(bot):
             
         except Exception as e:
             logger.error(f"Error in start handler: {e}")
+            ERRORS.inc('start_handler')
             await bot.send_message(message.chat.id, get_error_message())
     
     @bot.message_handler(commands=['help'])
@@ -74,6 +77,7 @@ def setup_command_handlers(bot):
 • View all pending transactions
 • Manage user balances
 • Transaction approval system
+• Broadcast announcements
 """
             else:
                 help_text += """
@@ -88,6 +92,7 @@ def setup_command_handlers(bot):
             
         except Exception as e:
             logger.error(f"Error in help handler: {e}")
+            ERRORS.inc('help_handler')
             await bot.send_message(message.chat.id, get_error_message())
     
     @bot.message_handler(commands=['adminDashboard'])
@@ -113,10 +118,13 @@ Select an option below to manage transactions.
 • 💰 Deposit - Process pending deposits
 • 💸 Withdraw - Process pending withdrawals
 • 🟡 Pending Transactions - View all pending transactions
+• ⚡ Bulk Approve - Approve many deposits or withdrawals at once
+• 📢 Broadcast - Send a message to every user
+• 🔄 Rebuild Statistics - Recount pending totals and users
             """
             
-            # Create simple admin keyboard with 3 buttons
-            keyboard = generate_admin_keyboard()
+            # Create admin keyboard
+            keyboard = keyboard_registry.admin()
             
             await bot.send_message(
                 message.chat.id,
@@ -129,40 +137,9 @@ Select an option below to manage transactions.
             
         except Exception as e:
             logger.error(f"Error in admin dashboard handler: {e}")
+            ERRORS.inc('admin_dashboard_handler')
             await bot.send_message(message.chat.id, get_error_message())
 
-def generate_keyboard(selected_language='english'):
-    """Generate inline keyboard with language selection and action buttons"""
-    keyboard = types.InlineKeyboardMarkup(row_width=2)
-    
-    # Language buttons
-    language_buttons = []
-    for lang_code, lang_data in BotConfig.LANGUAGES.items():
-        label = lang_data['name']
-        if selected_language == lang_code:
-            label += " ✅"
-        language_buttons.append(
-            types.InlineKeyboardButton(label, callback_data=f"language_{lang_code}")
-        )
-    
-    # Add language buttons in rows
-    for i in range(0, len(language_buttons), 2):
-        row = language_buttons[i:i+2]
-        keyboard.add(*row)
-    
-    # Action buttons
-    keyboard.add(
-        types.InlineKeyboardButton(BotConfig.BUTTONS['launch_app'], web_app=types.WebAppInfo(url=BotConfig.WEBAPP_URL)),
-        types.InlineKeyboardButton(BotConfig.BUTTONS['contact'], url=BotConfig.CONTACT_URL)
-    )
-    
-    return keyboard
-
-def get_welcome_message(username, language='english'):
-    """Get welcome message for specified language"""
-    lang_data = BotConfig.LANGUAGES.get(language, BotConfig.LANGUAGES['english'])
-    return lang_data['welcome'].format(username=username)
-
 def get_error_message(language='english'):
     """Get error message for specified language"""
     lang_data = BotConfig.LANGUAGES.get(language, BotConfig.LANGUAGES['english'])
@@ -172,21 +149,3 @@ def get_start_prompt(language='english'):
     """Get start prompt for specified language"""
     lang_data = BotConfig.LANGUAGES.get(language, BotConfig.LANGUAGES['english'])
     return lang_data['start_prompt']
-
-async def send_welcome_card(bot_instance, chat_id, username, language='english'):
-    """Send welcome card with photo and keyboard"""
-    try:
-        message = get_welcome_message(username, language)
-        keyboard = generate_keyboard(language)
-        
-        await bot_instance.send_photo(
-            chat_id=chat_id,
-            photo=BotConfig.PHOTO_URL,
-            caption=message,
-            reply_markup=keyboard
-        )
-        logger.info(f"Welcome card sent to chat {chat_id} in {language}")
-        
-    except Exception as e:
-        logger.error(f"Error sending welcome card: {e}")
-        await bot_instance.send_message(chat_id, get_error_message(language)) 
\ No newline at end of file
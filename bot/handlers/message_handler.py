@@ -5,13 +5,13 @@ Handles regular text messages and other message types
 import logging
 import re
 from config import BotConfig
-from firebase_service import get_firebase_service
+from keyboards import keyboard_registry
+from metrics import ERRORS
+from services import get_async_firebase_service
+from session_store import get_session_store
 
 logger = logging.getLogger(__name__)
 
-# Import user_states from callback_handler
-from handlers.callback_handler import user_states
-
 def setup_message_handlers(bot):
     """Setup all message handlers for the bot"""
     
@@ -22,32 +22,29 @@ def setup_message_handlers(bot):
             user_id = str(message.from_user.id)
             text = message.text.strip()
             
-            # Check if user is in deposit or withdrawal flow
-            if user_id in user_states:
-                state = user_states[user_id]
+            # Check if user is in deposit or withdrawal flow, only admins can start one
+            session_store = get_session_store()
+            state = await session_store.get(user_id) if BotConfig.is_admin(user_id) else None
+            if state is not None:
                 logger.info(f"Main handler - User {user_id}, State: {state['state']}, Text: {text}")
                 
-                # Check if user is admin for admin flows
+                # Route to the admin flow the state belongs to
                 if state['state'] in ['waiting_deposit_id', 'waiting_amount'] or (state['state'] == 'confirming' and 'deposit_id' in state):
-                    if not BotConfig.is_admin(user_id):
-                        logger.warning(f"Unauthorized deposit flow access attempt by user {user_id}")
-                        del user_states[user_id]
-                        await bot.reply_to(message, "❌ **Access Denied**\n\nYou don't have permission to access admin features.\n\nThis feature is restricted to authorized administrators only.")
-                        return
                     logger.info(f"Routing to deposit flow for user {user_id}")
-                    await handle_deposit_flow(bot, message, user_id, text)
+                    await handle_deposit_flow(bot, message, user_id, text, state)
                 elif state['state'] in ['waiting_withdrawal_id', 'waiting_withdrawal_amount'] or (state['state'] == 'confirming' and 'withdrawal_id' in state):
-                    if not BotConfig.is_admin(user_id):
-                        logger.warning(f"Unauthorized withdrawal flow access attempt by user {user_id}")
-                        del user_states[user_id]
-                        await bot.reply_to(message, "❌ **Access Denied**\n\nYou don't have permission to access admin features.\n\nThis feature is restricted to authorized administrators only.")
-                        return
                     logger.info(f"Routing to withdrawal flow for user {user_id}")
-                    await handle_withdrawal_flow(bot, message, user_id, text)
+                    await handle_withdrawal_flow(bot, message, user_id, text, state)
+                elif state['state'] in ['waiting_bulk_ids', 'bulk_confirming']:
+                    logger.info(f"Routing to bulk flow for user {user_id}")
+                    await handle_bulk_flow(bot, message, user_id, text, state)
+                elif state['state'] in ['waiting_broadcast_message', 'broadcast_confirming']:
+                    logger.info(f"Routing to broadcast flow for user {user_id}")
+                    await handle_broadcast_flow(bot, message, user_id, text, state)
                 else:
                     # Invalid state, clear and send error
                     logger.warning(f"Invalid state in main handler for user {user_id}: {state['state']}")
-                    del user_states[user_id]
+                    await session_store.delete(user_id)
                     await bot.reply_to(message, "❌ Invalid state. Please start over with /adminDashboard")
             else:
                 # Get start prompt based on user's language preference
@@ -56,21 +53,21 @@ def setup_message_handlers(bot):
             
         except Exception as e:
             logger.error(f"Error in echo handler: {e}")
+            ERRORS.inc('echo_handler')
             await bot.send_message(message.chat.id, get_error_message())
     
-async def handle_deposit_flow(bot, message, user_id, text):
+async def handle_deposit_flow(bot, message, user_id, text, state):
     """Handle deposit flow based on user state"""
     try:
-        state = user_states[user_id]
         logger.info(f"Deposit flow - User {user_id}, State: {state['state']}, Text: '{text}', Full state: {state}")
         
         if state['state'] == 'waiting_deposit_id':
             logger.info(f"Processing deposit ID input for user {user_id}")
-            await handle_deposit_id_input(bot, message, user_id, text)
+            await handle_deposit_id_input(bot, message, user_id, text, state)
             
         elif state['state'] == 'waiting_amount':
             logger.info(f"Processing amount input for user {user_id}")
-            await handle_amount_input(bot, message, user_id, text)
+            await handle_amount_input(bot, message, user_id, text, state)
             
         elif state['state'] == 'confirming':
             logger.info(f"User {user_id} is in confirming state, ignoring text input")
@@ -80,24 +77,24 @@ async def handle_deposit_flow(bot, message, user_id, text):
         else:
             # Invalid state, clear and send error
             logger.warning(f"Invalid deposit state for user {user_id}: {state['state']}, Full state: {state}")
-            del user_states[user_id]
+            await get_session_store().delete(user_id)
             await bot.reply_to(message, "❌ Invalid state. Please start over with /adminDashboard")
             
     except Exception as e:
         logger.error(f"Error in handle_deposit_flow: {e}")
+        ERRORS.inc('handle_deposit_flow')
         await bot.reply_to(message, "❌ An error occurred. Please try again.")
 
-async def handle_withdrawal_flow(bot, message, user_id, text):
+async def handle_withdrawal_flow(bot, message, user_id, text, state):
     """Handle withdrawal flow based on user state"""
     try:
-        state = user_states[user_id]
         logger.info(f"Withdrawal flow - User {user_id}, State: {state['state']}, Text: {text}")
         
         if state['state'] == 'waiting_withdrawal_id':
-            await handle_withdrawal_id_input(bot, message, user_id, text)
+            await handle_withdrawal_id_input(bot, message, user_id, text, state)
             
         elif state['state'] == 'waiting_withdrawal_amount':
-            await handle_withdrawal_amount_input(bot, message, user_id, text)
+            await handle_withdrawal_amount_input(bot, message, user_id, text, state)
             
         elif state['state'] == 'confirming':
             # User is in confirmation state, ignore text input
@@ -106,14 +103,159 @@ async def handle_withdrawal_flow(bot, message, user_id, text):
         else:
             # Invalid state, clear and send error
             logger.warning(f"Invalid withdrawal state for user {user_id}: {state['state']}")
-            del user_states[user_id]
+            await get_session_store().delete(user_id)
             await bot.reply_to(message, "❌ Invalid state. Please start over with /adminDashboard")
             
     except Exception as e:
         logger.error(f"Error in handle_withdrawal_flow: {e}")
+        ERRORS.inc('handle_withdrawal_flow')
+        await bot.reply_to(message, "❌ An error occurred. Please try again.")
+
+async def handle_bulk_flow(bot, message, user_id, text, state):
+    """Handle bulk approval flow based on user state"""
+    try:
+        if state['state'] == 'waiting_bulk_ids':
+            await handle_bulk_ids_input(bot, message, user_id, text, state)
+            
+        else:
+            # User is in confirmation state, ignore text input
+            await bot.reply_to(message, "⏳ **Bulk Approval Ready for Confirmation**\n\n🎯 **Please use the buttons in the previous message:**\n• ✅ **Approve All** - to approve the selected transactions\n• 🔙 **Back to Admin** - to cancel and return to dashboard")
+            
+    except Exception as e:
+        logger.error(f"Error in handle_bulk_flow: {e}")
+        ERRORS.inc('handle_bulk_flow')
         await bot.reply_to(message, "❌ An error occurred. Please try again.")
 
-async def handle_deposit_id_input(bot, message, user_id, text):
+async def handle_bulk_ids_input(bot, message, user_id, text, state):
+    """Handle the ID list or amount threshold for a bulk approval"""
+    try:
+        collection_name = state['bulk_collection']
+        
+        threshold = re.match(r'^(?:under|<)\s*\$?(\d+(?:\.\d+)?)$', text, re.IGNORECASE)
+        if threshold:
+            # Select every pending transaction below the threshold
+            max_amount = float(threshold.group(1))
+            firebase_service = get_async_firebase_service()
+            if collection_name == 'deposits':
+                pending = await firebase_service.get_pending_deposits()
+            else:
+                pending = await firebase_service.get_pending_withdrawals()
+            
+            selected = [transaction for transaction in pending if transaction.get('amount', 0) < max_amount]
+            ids = [transaction['id'] for transaction in selected]
+            total = sum(transaction['amount'] for transaction in selected)
+            summary = f"• Selected: **{len(ids)}** pending {collection_name} under ${max_amount:.2f}\n• Total Amount: ${total:.2f}"
+        else:
+            # Validate each ID with the same format as the single-item flow
+            tokens = [token for token in re.split(r'[\s,]+', text) if token]
+            invalid = [token for token in tokens if not re.match(r'^[A-Za-z0-9]{3,20}$', token)]
+            if invalid:
+                await bot.reply_to(message, f"❌ **Invalid ID Format**\n\nThese IDs are not 3-20 alphanumeric characters: {', '.join(invalid[:10])}\n\nPlease send the list again.")
+                return
+            
+            # Resolve every ID in one read so the admin confirms what will actually be approved
+            requested = list(dict.fromkeys(tokens))
+            documents = await get_async_firebase_service().get_transactions_by_ids(collection_name, requested)
+            if documents is None:
+                await bot.reply_to(message, "❌ Could not look up these IDs. Please send the list again.")
+                return
+            
+            selected = [documents[doc_id] for doc_id in requested if documents.get(doc_id, {}).get('status') == 'pending']
+            ids = [transaction['id'] for transaction in selected]
+            total = sum(transaction['amount'] for transaction in selected)
+            not_found = sum(1 for doc_id in requested if doc_id not in documents)
+            not_pending = len(requested) - len(ids) - not_found
+            summary = f"• Approvable: **{len(ids)}** pending {collection_name}\n• Total Amount: ${total:.2f}"
+            if not_found or not_pending:
+                summary += f"\n• Skipped: **{not_found + not_pending}** ({not_found} not found, {not_pending} no longer pending)"
+        
+        if not ids:
+            await bot.reply_to(message, f"ℹ️ **Nothing to Approve**\n\nNo pending {collection_name} matched. Send another list or threshold.")
+            return
+        
+        state['bulk_ids'] = ids
+        state['state'] = 'bulk_confirming'
+        await get_session_store().set(user_id, state)
+        
+        response = f"""
+⚡ **Confirm Bulk Approval**
+
+📋 **Selection:**
+{summary}
+
+⚠️ **This action will:**
+• Approve each selected transaction at its requested amount
+• Update the user balances accordingly
+• Skip anything that is no longer pending
+
+🎯 **Next Step:** Use the buttons below to approve or cancel.
+        """
+        
+        keyboard = keyboard_registry.confirm('bulk')
+        
+        await bot.reply_to(message, response, parse_mode='Markdown', reply_markup=keyboard)
+        
+        logger.info(f"Bulk {collection_name} selection of {len(ids)} items for user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Error in handle_bulk_ids_input: {e}")
+        ERRORS.inc('handle_bulk_ids_input')
+        await bot.reply_to(message, "❌ An error occurred while processing the bulk selection.")
+
+async def handle_broadcast_flow(bot, message, user_id, text, state):
+    """Handle broadcast flow based on user state"""
+    try:
+        if state['state'] == 'waiting_broadcast_message':
+            await handle_broadcast_message_input(bot, message, user_id, text, state)
+            
+        else:
+            # User is in confirmation state, ignore text input
+            await bot.reply_to(message, "⏳ **Broadcast Ready for Confirmation**\n\n🎯 **Please use the buttons in the previous message:**\n• 📢 **Send to All** - to start the broadcast\n• 🔙 **Back to Admin** - to cancel and return to dashboard")
+            
+    except Exception as e:
+        logger.error(f"Error in handle_broadcast_flow: {e}")
+        ERRORS.inc('handle_broadcast_flow')
+        await bot.reply_to(message, "❌ An error occurred. Please try again.")
+
+async def handle_broadcast_message_input(bot, message, user_id, text, state):
+    """Handle the message text for a broadcast"""
+    try:
+        if not text:
+            await bot.reply_to(message, "❌ **Empty Message**\n\nPlease send the text to broadcast.")
+            return
+        
+        state['broadcast_text'] = text
+        state['state'] = 'broadcast_confirming'
+        await get_session_store().set(user_id, state)
+        
+        # The preview is sent as plain text, exactly as users will receive it
+        await bot.send_message(message.chat.id, text)
+        
+        response = """
+📢 **Confirm Broadcast**
+
+👆 The message above will be sent to **every user**.
+
+⚠️ **This action will:**
+• Deliver the message to all users, respecting Telegram rate limits
+• Report delivered, blocked and failed counts as it goes
+• Keep its progress, so a stopped broadcast can be resumed
+
+🎯 **Next Step:** Use the buttons below to send or cancel.
+        """
+        
+        keyboard = keyboard_registry.confirm('broadcast')
+        
+        await bot.send_message(message.chat.id, response, parse_mode='Markdown', reply_markup=keyboard)
+        
+        logger.info(f"Broadcast message of {len(text)} characters prepared by user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Error in handle_broadcast_message_input: {e}")
+        ERRORS.inc('handle_broadcast_message_input')
+        await bot.reply_to(message, "❌ An error occurred while preparing the broadcast.")
+
+async def handle_deposit_id_input(bot, message, user_id, text, state):
     """Handle deposit ID input"""
     try:
         # Validate deposit ID format (alphanumeric, 3-20 characters)
@@ -122,8 +264,8 @@ async def handle_deposit_id_input(bot, message, user_id, text):
             return
         
         # Check if deposit exists and is pending
-        firebase_service = get_firebase_service()
-        deposit_data = firebase_service.get_deposit_by_id(text)
+        firebase_service = get_async_firebase_service()
+        deposit_data = await firebase_service.get_deposit_by_id(text)
         
         if not deposit_data:
             await bot.reply_to(message, f"❌ **Deposit Not Found**\n\nDeposit ID `{text}` was not found in the database.\n\nPlease verify the deposit ID and try again.")
@@ -134,9 +276,10 @@ async def handle_deposit_id_input(bot, message, user_id, text):
             return
         
         # Store deposit ID and update state
-        user_states[user_id]['deposit_id'] = text
-        user_states[user_id]['state'] = 'waiting_amount'
-        user_states[user_id]['original_amount'] = deposit_data['amount']
+        state['deposit_id'] = text
+        state['state'] = 'waiting_amount'
+        state['original_amount'] = deposit_data['amount']
+        await get_session_store().set(user_id, state)
         
         # Show amount input prompt
         response = f"""
@@ -150,11 +293,7 @@ async def handle_deposit_id_input(bot, message, user_id, text):
 **Enter the amount to approve:
         """
         
-        from telebot import types
-        keyboard = types.InlineKeyboardMarkup()
-        keyboard.add(
-            types.InlineKeyboardButton("🔙 Back to Admin", callback_data="deposit_back")
-        )
+        keyboard = keyboard_registry.back('deposit')
         
         await bot.reply_to(message, response, parse_mode='Markdown', reply_markup=keyboard)
         
@@ -162,9 +301,10 @@ async def handle_deposit_id_input(bot, message, user_id, text):
         
     except Exception as e:
         logger.error(f"Error in handle_deposit_id_input: {e}")
+        ERRORS.inc('handle_deposit_id_input')
         await bot.reply_to(message, "❌ An error occurred while processing the deposit ID.")
 
-async def handle_withdrawal_id_input(bot, message, user_id, text):
+async def handle_withdrawal_id_input(bot, message, user_id, text, state):
     """Handle withdrawal ID input"""
     try:
         # Validate withdrawal ID format (alphanumeric, 3-20 characters)
@@ -173,8 +313,8 @@ async def handle_withdrawal_id_input(bot, message, user_id, text):
             return
         
         # Check if withdrawal exists and is pending
-        firebase_service = get_firebase_service()
-        withdrawal_data = firebase_service.get_withdrawal_by_id(text)
+        firebase_service = get_async_firebase_service()
+        withdrawal_data = await firebase_service.get_withdrawal_by_id(text)
         
         if not withdrawal_data:
             await bot.reply_to(message, f"❌ **Withdrawal Not Found**\n\nWithdrawal ID `{text}` was not found in the database.\n\nPlease verify the withdrawal ID and try again.")
@@ -185,10 +325,11 @@ async def handle_withdrawal_id_input(bot, message, user_id, text):
             return
         
         # Store withdrawal ID and update state
-        user_states[user_id]['withdrawal_id'] = text
-        user_states[user_id]['state'] = 'waiting_withdrawal_amount'
-        user_states[user_id]['original_amount'] = withdrawal_data['amount']
-        user_states[user_id]['user_id'] = withdrawal_data['user_id']
+        state['withdrawal_id'] = text
+        state['state'] = 'waiting_withdrawal_amount'
+        state['original_amount'] = withdrawal_data['amount']
+        state['user_id'] = withdrawal_data['user_id']
+        await get_session_store().set(user_id, state)
         
         # Show amount input prompt
         response = f"""
@@ -202,11 +343,7 @@ async def handle_withdrawal_id_input(bot, message, user_id, text):
 **Enter the amount to approve:
         """
         
-        from telebot import types
-        keyboard = types.InlineKeyboardMarkup()
-        keyboard.add(
-            types.InlineKeyboardButton("🔙 Back to Admin", callback_data="withdrawal_back")
-        )
+        keyboard = keyboard_registry.back('withdrawal')
         
         await bot.reply_to(message, response, parse_mode='Markdown', reply_markup=keyboard)
         
@@ -214,9 +351,10 @@ async def handle_withdrawal_id_input(bot, message, user_id, text):
         
     except Exception as e:
         logger.error(f"Error in handle_withdrawal_id_input: {e}")
+        ERRORS.inc('handle_withdrawal_id_input')
         await bot.reply_to(message, "❌ An error occurred while processing the withdrawal ID.")
 
-async def handle_amount_input(bot, message, user_id, text):
+async def handle_amount_input(bot, message, user_id, text, state):
     """Handle amount input for deposits"""
     try:
         logger.info(f"Processing amount input for user {user_id}: {text}")
@@ -231,11 +369,11 @@ async def handle_amount_input(bot, message, user_id, text):
             return
         
         # Store amount and show confirmation
-        state = user_states[user_id]
         logger.info(f"Current state before update: {state}")
         
         state['amount'] = amount
         state['state'] = 'confirming'
+        await get_session_store().set(user_id, state)
         
         logger.info(f"State after update: {state}")
         
@@ -257,12 +395,7 @@ async def handle_amount_input(bot, message, user_id, text):
 🎯 **Next Step:** Use the buttons below to complete or cancel.
         """
         
-        from telebot import types
-        keyboard = types.InlineKeyboardMarkup(row_width=2)
-        keyboard.add(
-            types.InlineKeyboardButton("✅ Complete", callback_data="deposit_complete"),
-            types.InlineKeyboardButton("🔙 Back to Admin", callback_data="deposit_back")
-        )
+        keyboard = keyboard_registry.confirm('deposit')
         
         await bot.reply_to(message, response, parse_mode='Markdown', reply_markup=keyboard)
         
@@ -270,9 +403,10 @@ async def handle_amount_input(bot, message, user_id, text):
         
     except Exception as e:
         logger.error(f"Error in handle_amount_input: {e}")
+        ERRORS.inc('handle_amount_input')
         await bot.reply_to(message, "❌ An error occurred while processing the amount.")
 
-async def handle_withdrawal_amount_input(bot, message, user_id, text):
+async def handle_withdrawal_amount_input(bot, message, user_id, text, state):
     """Handle amount input for withdrawals"""
     try:
         # Validate amount format
@@ -285,9 +419,9 @@ async def handle_withdrawal_amount_input(bot, message, user_id, text):
             return
         
         # Store amount and show confirmation
-        state = user_states[user_id]
         state['amount'] = amount
         state['state'] = 'confirming'
+        await get_session_store().set(user_id, state)
         
         original_amount = state.get('original_amount', 0)
         
@@ -307,12 +441,7 @@ async def handle_withdrawal_amount_input(bot, message, user_id, text):
 🎯 **Next Step:** Use the buttons below to complete or cancel.
         """
         
-        from telebot import types
-        keyboard = types.InlineKeyboardMarkup(row_width=2)
-        keyboard.add(
-            types.InlineKeyboardButton("✅ Complete", callback_data="withdrawal_complete"),
-            types.InlineKeyboardButton("🔙 Back to Admin", callback_data="withdrawal_back")
-        )
+        keyboard = keyboard_registry.confirm('withdrawal')
         
         await bot.reply_to(message, response, parse_mode='Markdown', reply_markup=keyboard)
         
@@ -320,6 +449,7 @@ async def handle_withdrawal_amount_input(bot, message, user_id, text):
         
     except Exception as e:
         logger.error(f"Error in handle_withdrawal_amount_input: {e}")
+        ERRORS.inc('handle_withdrawal_amount_input')
         await bot.reply_to(message, "❌ An error occurred while processing the amount.")
 
 def get_start_prompt(language='english'):
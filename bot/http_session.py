@@ -0,0 +1,121 @@
+"""
+Pooled keep-alive HTTP sessions and request hooks for outgoing Telegram Bot API calls
+"""
+import asyncio
+import logging
+import aiohttp
+from telebot import asyncio_helper
+
+logger = logging.getLogger(__name__)
+
+class TelegramSessionManager(asyncio_helper.SessionManager):
+    """Keeps one aiohttp session per event loop with a tuned, keep-alive connection pool"""
+    
+    def __init__(self, limit=50, keepalive_timeout=60, dns_cache_ttl=300):
+        """
+        Initialize session manager
+        
+        Args:
+            limit (int): Maximum open connections per session, all of them to api.telegram.org
+            keepalive_timeout (float): Seconds an idle connection stays open for reuse
+            dns_cache_ttl (int): Seconds a resolved address is reused
+        """
+        # Reuse the TLS context telebot built at import instead of loading the CA bundle again
+        self.ssl_context = asyncio_helper.session_manager.ssl_context
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._sessions = {}
+    
+    @property
+    def session(self):
+        """Session of the running event loop, None outside of one"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        return self._sessions.get(loop)
+    
+    @session.setter
+    def session(self, value):
+        self._sessions[asyncio.get_running_loop()] = value
+    
+    async def create_session(self):
+        """Create a session whose connections are kept alive and reused"""
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            ssl=self.ssl_context
+        )
+        return aiohttp.ClientSession(connector=connector)
+    
+    async def get_session(self):
+        """
+        Get the session of the running event loop, creating it on first use
+        
+        Returns:
+            aiohttp.ClientSession: Open session bound to the running loop
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            # Sessions of loops that were closed can never be used again
+            for stale_loop in [stale_loop for stale_loop in self._sessions if stale_loop.is_closed()]:
+                del self._sessions[stale_loop]
+            session = await self.create_session()
+            self._sessions[loop] = session
+            logger.info("Telegram HTTP session created")
+        return session
+    
+    async def close(self):
+        """Close the session of the running event loop and its pooled connections"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("Telegram HTTP session closed")
+
+# Layers wrapped around asyncio_helper._process_request, innermost first
+REQUEST_LAYERS = ('timer', 'scheduler')
+
+def install_request_layer(name, wrap):
+    """
+    Wrap every Bot API request of this process in a named layer, at most once
+    
+    Layers nest in REQUEST_LAYERS order whatever order they are installed in,
+    so the request timer always sits inside the scheduler and never times the
+    waits for rate limits.
+    
+    Args:
+        name (str): Layer name from REQUEST_LAYERS
+        wrap (callable): Builds the layer around the request function it is given
+        
+    Returns:
+        bool: False if the layer was already installed
+        
+    Raises:
+        ValueError: If the layer name is unknown
+    """
+    if name not in REQUEST_LAYERS:
+        raise ValueError(f"Unknown request layer: {name}")
+    
+    # Peel off the installed layers down to the original request function
+    layers = {}
+    process_request = asyncio_helper._process_request
+    while hasattr(process_request, 'request_layer'):
+        layers[process_request.request_layer] = process_request.wrap_request
+        process_request = process_request.__wrapped__
+    if name in layers:
+        return False
+    
+    layers[name] = wrap
+    for layer in REQUEST_LAYERS:
+        if layer in layers:
+            wrapped = process_request
+            process_request = layers[layer](wrapped)
+            process_request.request_layer = layer
+            process_request.wrap_request = layers[layer]
+            process_request.__wrapped__ = wrapped
+    asyncio_helper._process_request = process_request
+    return True
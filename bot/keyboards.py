@@ -0,0 +1,131 @@
+"""
+Registry of static inline keyboards, built and serialised once
+"""
+from telebot import types
+from config import BotConfig
+
+def build_language_keyboard(selected_language='english'):
+    """Build inline keyboard with language selection and action buttons"""
+    keyboard = types.InlineKeyboardMarkup(row_width=2)
+    
+    # Language buttons
+    language_buttons = []
+    for lang_code, lang_data in BotConfig.LANGUAGES.items():
+        label = lang_data['name']
+        if selected_language == lang_code:
+            label += " ✅"
+        language_buttons.append(
+            types.InlineKeyboardButton(label, callback_data=f"language_{lang_code}")
+        )
+    
+    # Add language buttons in rows
+    for i in range(0, len(language_buttons), 2):
+        row = language_buttons[i:i+2]
+        keyboard.add(*row)
+    
+    # Action buttons
+    keyboard.add(
+        types.InlineKeyboardButton(BotConfig.BUTTONS['launch_app'], web_app=types.WebAppInfo(url=BotConfig.WEBAPP_URL)),
+        types.InlineKeyboardButton(BotConfig.BUTTONS['contact'], url=BotConfig.CONTACT_URL)
+    )
+    
+    return keyboard
+
+def build_admin_keyboard():
+    """Build admin dashboard keyboard"""
+    keyboard = types.InlineKeyboardMarkup(row_width=1)
+    
+    # Main admin buttons
+    keyboard.add(
+        types.InlineKeyboardButton("💰 Deposit", callback_data="admin_deposit")
+    )
+    keyboard.add(
+        types.InlineKeyboardButton("💸 Withdraw", callback_data="admin_withdraw")
+    )
+    keyboard.add(
+        types.InlineKeyboardButton("🟡 Pending Transactions", callback_data="admin_pending")
+    )
+    keyboard.add(
+        types.InlineKeyboardButton("⚡ Bulk Deposits", callback_data="admin_bulkdeposit")
+    )
+    keyboard.add(
+        types.InlineKeyboardButton("⚡ Bulk Withdrawals", callback_data="admin_bulkwithdraw")
+    )
+    keyboard.add(
+        types.InlineKeyboardButton("📢 Broadcast", callback_data="admin_broadcast")
+    )
+    keyboard.add(
+        types.InlineKeyboardButton("🔄 Rebuild Statistics", callback_data="admin_rebuildstats")
+    )
+    
+    return keyboard
+
+def build_back_keyboard(flow):
+    """Build a single 'Back to Admin' keyboard for an admin flow ('admin', 'deposit', 'withdrawal', 'bulk' or 'broadcast')"""
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.add(
+        types.InlineKeyboardButton("🔙 Back to Admin", callback_data=f"{flow}_back")
+    )
+    return keyboard
+
+def build_confirm_keyboard(flow, label, action):
+    """Build the confirm/cancel keyboard shown before an admin flow commits"""
+    keyboard = types.InlineKeyboardMarkup(row_width=2)
+    keyboard.add(
+        types.InlineKeyboardButton(label, callback_data=f"{flow}_{action}"),
+        types.InlineKeyboardButton("🔙 Back to Admin", callback_data=f"{flow}_back")
+    )
+    return keyboard
+
+def build_broadcast_keyboard(job_id, running=True):
+    """Build the keyboard under a broadcast progress message"""
+    keyboard = types.InlineKeyboardMarkup(row_width=2)
+    if running:
+        keyboard.add(
+            types.InlineKeyboardButton("⏹ Cancel", callback_data=f"broadcast_cancel_{job_id}"),
+            types.InlineKeyboardButton("▶️ Resume", callback_data=f"broadcast_resume_{job_id}")
+        )
+    keyboard.add(
+        types.InlineKeyboardButton("🔙 Back to Admin", callback_data="broadcast_back")
+    )
+    return keyboard
+
+class KeyboardRegistry:
+    """Serialised reply_markup payloads for every static keyboard"""
+    
+    def __init__(self):
+        """Build every keyboard variant and serialise it once"""
+        self._language = {
+            lang_code: build_language_keyboard(lang_code).to_json()
+            for lang_code in BotConfig.LANGUAGES
+        }
+        self._admin = build_admin_keyboard().to_json()
+        self._back = {
+            flow: build_back_keyboard(flow).to_json()
+            for flow in ('admin', 'deposit', 'withdrawal', 'bulk', 'broadcast')
+        }
+        self._confirm = {
+            'deposit': build_confirm_keyboard('deposit', "✅ Complete", 'complete').to_json(),
+            'withdrawal': build_confirm_keyboard('withdrawal', "✅ Complete", 'complete').to_json(),
+            'bulk': build_confirm_keyboard('bulk', "✅ Approve All", 'confirm').to_json(),
+            'broadcast': build_confirm_keyboard('broadcast', "📢 Send to All", 'confirm').to_json()
+        }
+    
+    def language(self, selected_language='english'):
+        """Get the welcome keyboard with the selected language ticked"""
+        return self._language.get(selected_language, self._language['english'])
+    
+    def admin(self):
+        """Get the admin dashboard keyboard"""
+        return self._admin
+    
+    def back(self, flow):
+        """Get the 'Back to Admin' keyboard of an admin flow"""
+        return self._back[flow]
+    
+    def confirm(self, flow):
+        """Get the confirm/cancel keyboard of an admin flow"""
+        return self._confirm[flow]
+
+# Built at import so request handlers only look payloads up
+keyboard_registry = KeyboardRegistry()
@@ -0,0 +1,135 @@
+"""
+Cache of Telegram file_ids for media the bot sends by URL
+"""
+import hashlib
+import logging
+from telebot.asyncio_helper import ApiTelegramException
+from services import get_async_firebase_service
+
+logger = logging.getLogger(__name__)
+
+class MediaCache:
+    """Maps media URLs to the file_id Telegram assigned on first upload, persisted in Firestore"""
+    
+    def __init__(self, db, collection_name='media'):
+        """
+        Initialize media cache
+        
+        Args:
+            db: Async Firestore client
+            collection_name (str): Collection holding one document per media URL
+        """
+        self.db = db
+        self.collection_name = collection_name
+        self._file_ids = {}
+    
+    def _media_ref(self, url):
+        # URLs are not valid document IDs, key documents by their hash instead
+        doc_id = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return self.db.collection(self.collection_name).document(doc_id)
+    
+    async def get(self, url):
+        """
+        Get the file_id recorded for a URL
+        
+        Args:
+            url (str): Media URL
+            
+        Returns:
+            str: file_id or None if the media was never uploaded
+        """
+        file_id = self._file_ids.get(url)
+        if file_id is not None:
+            return file_id
+            
+        try:
+            doc = await self._media_ref(url).get()
+            if doc.exists:
+                file_id = doc.to_dict().get('file_id')
+                if file_id:
+                    self._file_ids[url] = file_id
+                    return file_id
+        except Exception as e:
+            logger.warning(f"Error reading cached file_id for {url}: {e}")
+        return None
+    
+    async def set(self, url, file_id):
+        """
+        Record the file_id Telegram returned for a URL
+        
+        Args:
+            url (str): Media URL
+            file_id (str): Telegram file_id
+        """
+        self._file_ids[url] = file_id
+        try:
+            await self._media_ref(url).set({'url': url, 'file_id': file_id})
+        except Exception as e:
+            logger.warning(f"Error storing file_id for {url}: {e}")
+    
+    async def invalidate(self, url):
+        """
+        Forget the file_id of a URL so the next send uploads it again
+        
+        Args:
+            url (str): Media URL
+        """
+        self._file_ids.pop(url, None)
+        try:
+            await self._media_ref(url).delete()
+        except Exception as e:
+            logger.warning(f"Error deleting file_id for {url}: {e}")
+
+# Global media cache instance
+media_cache = None
+
+def get_media_cache():
+    """Get media cache instance"""
+    global media_cache
+    if media_cache is None:
+        media_cache = MediaCache(get_async_firebase_service().db)
+    return media_cache
+
+async def send_cached_photo(bot_instance, chat_id, photo_url, **kwargs):
+    """
+    Send a photo by its cached file_id, uploading from the URL only the first time
+    
+    Args:
+        bot_instance: AsyncTeleBot instance
+        chat_id (int): Target chat
+        photo_url (str): Photo URL
+        **kwargs: Extra send_photo arguments (caption, reply_markup, ...)
+        
+    Returns:
+        Message: Sent message
+    """
+    # The cache only saves uploads, a failing cache or Firestore must not stop the photo
+    try:
+        cache = get_media_cache()
+        file_id = await cache.get(photo_url)
+    except Exception as e:
+        logger.warning(f"Media cache unavailable, sending {photo_url} by URL: {e}")
+        cache = None
+        file_id = None
+        
+    if file_id is not None:
+        try:
+            return await bot_instance.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+        except ApiTelegramException as e:
+            # Only a rejected file_id falls back to the URL, other errors are real failures
+            if e.error_code != 400 or 'file' not in e.description.lower():
+                raise
+            logger.warning(f"Cached file_id for {photo_url} rejected ({e.description}), uploading again")
+            try:
+                await cache.invalidate(photo_url)
+            except Exception as e:
+                logger.warning(f"Error invalidating cached file_id for {photo_url}: {e}")
+                
+    message = await bot_instance.send_photo(chat_id=chat_id, photo=photo_url, **kwargs)
+    if cache is not None and message.photo:
+        try:
+            # The last size is the largest, reusing it keeps the original quality
+            await cache.set(photo_url, message.photo[-1].file_id)
+        except Exception as e:
+            logger.warning(f"Error caching file_id for {photo_url}: {e}")
+    return message
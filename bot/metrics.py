@@ -0,0 +1,288 @@
+"""
+Prometheus text-format metrics for handlers, updates, Telegram API calls and queues
+"""
+import functools
+import hmac
+import logging
+import threading
+import time
+from telebot import asyncio_helper
+from http_session import install_request_layer
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast cache hits to slow Firestore transactions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value):
+    """Escape a label value for the text exposition format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    """Format a label set, e.g. {handler="start_handler",le="0.1"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    """Format a sample value, integers without a decimal point"""
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    """Base of all metrics: a name, help text and values per label set"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Initialize metric
+        
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (tuple): Label names, values are passed positionally
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def render(self):
+        """
+        Render the metric in the Prometheus text format
+        
+        Returns:
+            list: Output lines
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = sorted(self._values.items())
+        for labelvalues, value in samples:
+            lines.extend(self._render_sample(labelvalues, value))
+        return lines
+    
+    def _render_sample(self, labelvalues, value):
+        return [f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"]
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    
+    kind = 'counter'
+    
+    def inc(self, *labelvalues, amount=1):
+        """Increase the count of a label set"""
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+class Gauge(Metric):
+    """Value read from callbacks at scrape time"""
+    
+    kind = 'gauge'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks = {}
+    
+    def set_function(self, function, *labelvalues):
+        """
+        Read a label set's value from a callable whenever metrics are rendered
+        
+        Args:
+            function (callable): Returns the current value, or None to omit the sample
+            *labelvalues: Label values
+        """
+        with self._lock:
+            self._callbacks[labelvalues] = function
+    
+    def render(self):
+        with self._lock:
+            callbacks = list(self._callbacks.items())
+        values = {}
+        for labelvalues, function in callbacks:
+            try:
+                value = function()
+            except Exception as e:
+                logger.warning(f"Error reading gauge {self.name}: {e}")
+                continue
+            if value is not None:
+                values[labelvalues] = value
+        with self._lock:
+            self._values = values
+        return super().render()
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+    
+    def observe(self, value, *labelvalues):
+        """Record one observation for a label set"""
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+    
+    def _render_sample(self, labelvalues, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _labels(self.labelnames, labelvalues, ('le', _number(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _labels(self.labelnames, labelvalues)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together"""
+    
+    def __init__(self):
+        self._metrics = []
+    
+    def register(self, metric):
+        """Add a metric and return it"""
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self):
+        """
+        Render every metric
+        
+        Returns:
+            str: Prometheus text exposition
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+HANDLER_DURATION = registry.register(Histogram(
+    'bot_handler_duration_seconds', 'Time spent in a bot handler', ('handler',)
+))
+UPDATES = registry.register(Counter(
+    'bot_updates_total', 'Updates received by type and outcome', ('type', 'outcome')
+))
+UPDATE_DURATION = registry.register(Histogram(
+    'bot_update_duration_seconds', 'Time to parse and dispatch one update', ('type',)
+))
+ERRORS = registry.register(Counter(
+    'bot_errors_total', 'Errors in a bot handler, whether caught or raised', ('handler',)
+))
+TELEGRAM_DURATION = registry.register(Histogram(
+    'bot_telegram_request_duration_seconds', 'Latency of Telegram Bot API requests', ('method',)
+))
+TELEGRAM_ERRORS = registry.register(Counter(
+    'bot_telegram_request_errors_total', 'Failed Telegram Bot API requests', ('method', 'error')
+))
+QUEUE_DEPTH = registry.register(Gauge(
+    'bot_queue_depth', 'Items waiting in an in-process queue', ('queue',)
+))
+
+def update_type(update_dict):
+    """Get the type of a raw update, e.g. 'message' or 'callback_query'"""
+    for key in update_dict:
+        if key != 'update_id':
+            return key
+    return 'unknown'
+
+def timed_handler(function, name=None, count_errors=True):
+    """
+    Wrap a handler coroutine to record its latency and the exceptions it raises
+    
+    The wrapper keeps the signature of the handler, which telebot inspects.
+    
+    Args:
+        function (callable): Handler coroutine
+        name (str): Label, the function name by default
+        count_errors (bool): Count exceptions, False if the caller counts them itself
+        
+    Returns:
+        callable: Wrapped handler
+    """
+    label = name or function.__name__
+    
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await function(*args, **kwargs)
+        except Exception:
+            if count_errors:
+                ERRORS.inc(label)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, label)
+            
+    return wrapper
+
+def instrument_bot(bot):
+    """Record the latency of every handler registered on an AsyncTeleBot"""
+    for handlers in (bot.message_handlers, bot.callback_query_handlers):
+        for handler in handlers:
+            if not hasattr(handler['function'], '__wrapped__'):
+                handler['function'] = timed_handler(handler['function'])
+
+def install_request_timer():
+    """Time every Telegram Bot API request, excluding any wait for rate limits"""
+    def wrap(process_request):
+        async def timed_request(token, url, method='get', params=None, files=None, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await process_request(token, url, method, params, files, **kwargs)
+            except asyncio_helper.ApiTelegramException as e:
+                TELEGRAM_ERRORS.inc(url, str(e.error_code))
+                raise
+            except Exception as e:
+                TELEGRAM_ERRORS.inc(url, type(e).__name__)
+                raise
+            finally:
+                TELEGRAM_DURATION.observe(time.perf_counter() - started, url)
+        return timed_request
+        
+    install_request_layer('timer', wrap)
+
+def is_authorized(authorization, token):
+    """
+    Check the Authorization header of a metrics request
+    
+    Args:
+        authorization (str): Authorization header, None if missing
+        token (str): Required bearer token, None or empty to allow every request
+        
+    Returns:
+        bool: True if the request may read the metrics
+    """
+    if not token:
+        return True
+    scheme, _, credentials = (authorization or '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode('utf-8'), token.encode('utf-8'))
+
+def render_metrics():
+    """
+    Render all metrics
+    
+    Returns:
+        str: Prometheus text exposition
+    """
+    return registry.render()
@@ -0,0 +1,73 @@
+"""
+Cursor helpers for paging through pending transactions ordered by creation time
+"""
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _created_at_micros(created_at):
+    """Convert a Firestore timestamp to integer microseconds since the epoch"""
+    if not isinstance(created_at, datetime):
+        return 0
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (created_at - EPOCH) // timedelta(microseconds=1)
+
+def cursor_key(document_data):
+    """
+    Get the sort position of a document: creation time, then document ID
+    
+    Args:
+        document_data (dict): Document data including 'id' and 'created_at'
+        
+    Returns:
+        tuple: (microseconds, document ID)
+    """
+    return _created_at_micros(document_data.get('created_at')), document_data['id']
+
+def encode_cursor(document_data):
+    """
+    Encode the position of a document into a compact callback-safe string
+    
+    Args:
+        document_data (dict): Document data including 'id' and 'created_at'
+        
+    Returns:
+        str: Cursor in the form '<microseconds>-<document id>'
+    """
+    micros, doc_id = cursor_key(document_data)
+    return f"{micros}-{doc_id}"
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor created by encode_cursor
+    
+    Args:
+        cursor (str): Encoded cursor
+        
+    Returns:
+        tuple: (microseconds, document ID)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    micros, separator, doc_id = cursor.partition('-')
+    if not separator or not doc_id:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int(micros), doc_id
+
+def cursor_values(cursor):
+    """
+    Convert a cursor into Firestore start_after/end_before values
+    
+    Args:
+        cursor (str): Encoded cursor
+        
+    Returns:
+        dict: Values for the created_at and document ID orderings
+    """
+    micros, doc_id = decode_cursor(cursor)
+    return {
+        'created_at': EPOCH + timedelta(microseconds=micros),
+        '__name__': doc_id
+    }
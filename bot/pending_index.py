@@ -0,0 +1,142 @@
+"""
+In-memory index of pending transactions kept current by Firestore snapshot listeners
+"""
+import copy
+import logging
+import threading
+from google.cloud.firestore_v1.watch import ChangeType
+from pagination import cursor_key, decode_cursor
+
+logger = logging.getLogger(__name__)
+
+class PendingIndex:
+    """Pending documents of one collection, keyed by document ID"""
+    
+    def __init__(self, collection_name):
+        """
+        Initialize pending index
+        
+        Args:
+            collection_name (str): Collection to watch ('deposits' or 'withdrawals')
+        """
+        self.collection_name = collection_name
+        self._documents = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+    
+    def start(self, db):
+        """
+        Subscribe to pending documents of the collection
+        
+        Args:
+            db: Synchronous Firestore client used to host the listener
+        """
+        if self._watch is not None:
+            return
+            
+        query = db.collection(self.collection_name).where('status', '==', 'pending')
+        self._watch = query.on_snapshot(self._on_snapshot)
+        logger.info(f"Started pending {self.collection_name} listener")
+    
+    def stop(self):
+        """Unsubscribe the listener and drop the cached documents"""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+            
+        self._ready.clear()
+        with self._lock:
+            self._documents.clear()
+        logger.info(f"Stopped pending {self.collection_name} listener")
+    
+    @property
+    def is_ready(self):
+        """True once the initial snapshot arrived and the listener is still streaming"""
+        return self._ready.is_set() and self._watch is not None and self._watch.is_active
+    
+    def wait_until_ready(self, timeout=None):
+        """
+        Block until the initial snapshot has been applied
+        
+        Args:
+            timeout (float): Seconds to wait, None to wait forever
+            
+        Returns:
+            bool: True if the index is ready
+        """
+        return self._ready.wait(timeout)
+    
+    def _on_snapshot(self, docs, changes, read_time):
+        """Apply incremental changes delivered by the listener thread"""
+        with self._lock:
+            for change in changes:
+                doc_id = change.document.id
+                if change.type == ChangeType.REMOVED:
+                    self._documents.pop(doc_id, None)
+                else:
+                    document_data = change.document.to_dict()
+                    document_data['id'] = doc_id
+                    self._documents[doc_id] = document_data
+            count = len(self._documents)
+            
+        self._ready.set()
+        logger.debug(f"Pending {self.collection_name} index updated: {len(changes)} changes, {count} pending")
+    
+    def list(self):
+        """
+        Get all pending documents ordered by document ID
+        
+        Returns:
+            list: Copies of the pending documents
+        """
+        with self._lock:
+            return [copy.deepcopy(self._documents[doc_id]) for doc_id in sorted(self._documents)]
+    
+    def get(self, doc_id):
+        """
+        Get a pending document by ID
+        
+        Args:
+            doc_id (str): Document ID
+            
+        Returns:
+            dict: Copy of the document or None if it is not pending
+        """
+        with self._lock:
+            document_data = self._documents.get(doc_id)
+            return copy.deepcopy(document_data) if document_data is not None else None
+    
+    def discard(self, doc_id):
+        """
+        Remove a document after the service itself moved it out of pending
+        
+        Args:
+            doc_id (str): Document ID
+        """
+        with self._lock:
+            self._documents.pop(doc_id, None)
+    
+    def page(self, limit, start_after=None, end_before=None):
+        """
+        Get one page of pending documents ordered by creation time
+        
+        Args:
+            limit (int): Page size
+            start_after (str): Cursor of the last document of the previous page
+            end_before (str): Cursor of the first document of the next page
+            
+        Returns:
+            list: Copies of the documents on the page
+        """
+        with self._lock:
+            documents = sorted(self._documents.values(), key=cursor_key)
+            if start_after is not None:
+                position = decode_cursor(start_after)
+                documents = [doc for doc in documents if cursor_key(doc) > position][:limit]
+            elif end_before is not None:
+                position = decode_cursor(end_before)
+                documents = [doc for doc in documents if cursor_key(doc) < position][-limit:]
+            else:
+                documents = documents[:limit]
+            return copy.deepcopy(documents)
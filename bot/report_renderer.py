@@ -0,0 +1,200 @@
+"""
+Admin report rendering that always fits Telegram's message size limit
+"""
+import io
+import logging
+from telebot import types
+from config import BotConfig
+
+logger = logging.getLogger(__name__)
+
+# Telegram limit on message text, counted in UTF-16 code units
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Markdown markers the reports use; inside a code span only the closing backtick counts
+BOLD_MARKER = '**'
+CODE_MARKER = '`'
+
+# Sent instead of an empty report, Telegram rejects messages without text
+EMPTY_REPORT_TEXT = "ℹ️ Nothing to report."
+
+def telegram_length(text):
+    """Get the length of text the way Telegram counts it (UTF-16 code units)"""
+    return len(text.encode('utf-16-le')) // 2
+
+class ReportBuilder:
+    """Collects report blocks and packs them into messages below the size limit"""
+    
+    def __init__(self, limit=TELEGRAM_MESSAGE_LIMIT):
+        """
+        Initialize report builder
+        
+        Args:
+            limit (int): Maximum length of one message
+        """
+        self.limit = limit
+        self._blocks = []
+        self._length = 0
+    
+    def add(self, *parts):
+        """
+        Add a block that is kept in one message whenever it fits
+        
+        Args:
+            *parts (str): Pieces of the block, joined without separators
+        """
+        block = ''.join(parts)
+        if block:
+            length = telegram_length(block)
+            self._blocks.append((block, length))
+            self._length += length
+    
+    def __len__(self):
+        return self._length
+    
+    def render(self):
+        """
+        Get the whole report as one text
+        
+        Returns:
+            str: Report text
+        """
+        return ''.join(block for block, _ in self._blocks)
+    
+    def pages(self):
+        """
+        Split the report into messages, breaking only between blocks where possible
+        
+        Returns:
+            list: Message texts, each within the limit
+        """
+        pages = []
+        current = []
+        current_length = 0
+        for block, length in self._blocks:
+            pieces = [(block, length)] if length <= self.limit else self._split_block(block)
+            for piece, piece_length in pieces:
+                if current and current_length + piece_length > self.limit:
+                    pages.append(''.join(current))
+                    current = []
+                    current_length = 0
+                current.append(piece)
+                current_length += piece_length
+                
+        if current:
+            pages.append(''.join(current))
+        return pages
+    
+    def _split_block(self, block):
+        """Split an oversized block at line breaks, cutting single long lines as a last resort"""
+        pieces = []
+        for line in block.splitlines(keepends=True):
+            while telegram_length(line) > self.limit:
+                head, line = self._cut_line(line)
+                pieces.append((head, telegram_length(head)))
+            pieces.append((line, telegram_length(line)))
+        return pieces
+    
+    def _cut_line(self, line):
+        """
+        Cut the longest head off a line that fits the limit without breaking Markdown
+        
+        The cut goes after the last whitespace outside bold and code spans. A line
+        without such whitespace is cut inside its spans instead, closing them at
+        the end of the head and reopening them at the start of the rest.
+        
+        Args:
+            line (str): Line longer than the limit
+            
+        Returns:
+            tuple: Head within the limit and the rest of the line
+        """
+        open_markers = []
+        length = 0
+        position = 0
+        last_space = None
+        last_fit = None
+        while position < len(line):
+            marker = _marker_at(line, position, open_markers)
+            if marker:
+                if open_markers and open_markers[-1] == marker:
+                    open_markers.pop()
+                else:
+                    open_markers.append(marker)
+                step = marker
+            else:
+                step = line[position]
+            length += telegram_length(step)
+            position += len(step)
+            
+            if length + sum(len(open_marker) for open_marker in open_markers) > self.limit:
+                break
+            if marker:
+                # Never end a head right after a marker, that leaves an empty span
+                continue
+            if not open_markers and step.isspace():
+                last_space = position
+            last_fit = (position, list(open_markers))
+        
+        if last_space is not None:
+            return line[:last_space], line[last_space:]
+        if last_fit is not None:
+            cut, markers = last_fit
+            return line[:cut] + ''.join(reversed(markers)), ''.join(markers) + line[cut:]
+        
+        # Limit too small to hold any span, cut by code points, assuming two UTF-16 units each
+        cut = max(self.limit // 2, 1)
+        return line[:cut], line[cut:]
+
+def _marker_at(line, position, open_markers):
+    """Get the Markdown marker starting at position, or None"""
+    if CODE_MARKER in open_markers:
+        return CODE_MARKER if line.startswith(CODE_MARKER, position) else None
+    for marker in (BOLD_MARKER, CODE_MARKER):
+        if line.startswith(marker, position):
+            return marker
+    return None
+
+def _plain_text(text):
+    """Drop Markdown markers for the attached document"""
+    return text.replace('**', '').replace('`', '')
+
+async def send_report(bot, chat_id, report, message_id=None, reply_markup=None,
+                      parse_mode='Markdown', file_name='report.txt'):
+    """
+    Deliver a report as one or more messages, or as a document when it is too long
+    
+    The first message replaces message_id when given. The keyboard goes on the
+    last message so it stays below the report.
+    
+    Args:
+        bot: AsyncTeleBot instance
+        chat_id (int): Target chat
+        report (ReportBuilder): Report to send
+        message_id (int): Message to edit with the first page, None to send a new one
+        reply_markup: Keyboard for the last message
+        parse_mode (str): Parse mode of the report text
+        file_name (str): Name of the attached document
+    """
+    pages = report.pages() or [EMPTY_REPORT_TEXT]
+    attach = len(pages) > BotConfig.REPORT_MAX_MESSAGES
+    if attach:
+        pages = pages[:1]
+        
+    for index, page in enumerate(pages):
+        markup = reply_markup if index == len(pages) - 1 else None
+        if index == 0 and message_id is not None:
+            await bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=page,
+                parse_mode=parse_mode,
+                reply_markup=markup
+            )
+        else:
+            await bot.send_message(chat_id, page, parse_mode=parse_mode, reply_markup=markup)
+            
+    if attach:
+        document = types.InputFile(io.BytesIO(_plain_text(report.render()).encode('utf-8')), file_name=file_name)
+        await bot.send_document(chat_id, document, caption="📎 Full report attached")
+        logger.info(f"Report of {len(report)} characters sent as document {file_name}")
@@ -0,0 +1,122 @@
+"""
+Long-running aiohttp server for the Telegram webhook
+Keeps a single event loop alive and handles updates concurrently
+"""
+import asyncio
+import contextlib
+import json
+import logging
+from aiohttp import web
+from broadcast import enable_background_runs
+from config import BotConfig
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, is_authorized, render_metrics
+from update_dedup import is_valid_update
+from webhook import InvestmentBot, get_investment_bot, STATUS_TEXT
+
+logger = logging.getLogger(__name__)
+
+INVESTMENT_BOT_KEY = web.AppKey('investment_bot', InvestmentBot)
+WRITE_BEHIND_TASK_KEY = web.AppKey('write_behind_task', asyncio.Task)
+
+async def handle_update(request):
+    """Handle an incoming Telegram update"""
+    try:
+        update_dict = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        logger.warning(f"Rejected malformed update: {e}")
+        return web.Response(status=400)
+    if not is_valid_update(update_dict):
+        logger.warning(f"Rejected update that is not a Telegram update object: {type(update_dict).__name__}")
+        return web.Response(status=400)
+        
+    investment_bot = request.app[INVESTMENT_BOT_KEY]
+    if BotConfig.UPDATE_QUEUE_ENABLED:
+        # Answer Telegram as soon as the update is queued
+        await investment_bot.enqueue_update(update_dict)
+    else:
+        await investment_bot.process_update(update_dict)
+    return web.Response(status=200)
+
+async def handle_status(request):
+    """Handle health-check requests"""
+    return web.Response(text=STATUS_TEXT)
+
+async def handle_metrics(request):
+    """Serve Prometheus text-format metrics"""
+    if not is_authorized(request.headers.get('Authorization'), BotConfig.METRICS_TOKEN):
+        return web.Response(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return web.Response(body=render_metrics().encode('utf-8'), headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+async def _start_pending_listeners(app):
+    """Serve pending transactions from snapshot listeners while the server runs"""
+    if BotConfig.PENDING_LISTENERS_ENABLED:
+        app[INVESTMENT_BOT_KEY].firebase_service.start_pending_listeners()
+
+async def _stop_pending_listeners(app):
+    """Stop the snapshot listeners when the server stops"""
+    if BotConfig.PENDING_LISTENERS_ENABLED:
+        app[INVESTMENT_BOT_KEY].firebase_service.stop_pending_listeners()
+
+async def _enable_broadcasts(app):
+    """Run broadcasts in the background, this process keeps its event loop alive"""
+    enable_background_runs()
+
+async def _disable_broadcasts(app):
+    """Stop starting broadcasts when the server stops, another instance resumes them"""
+    enable_background_runs(False)
+
+async def _start_write_behind(app):
+    """Flush buffered user writes periodically while the server runs"""
+    if BotConfig.WRITE_BEHIND_ENABLED:
+        firebase_service = app[INVESTMENT_BOT_KEY].firebase_service
+        app[WRITE_BEHIND_TASK_KEY] = asyncio.create_task(firebase_service.run_write_behind())
+
+async def _stop_write_behind(app):
+    """Cancel the flusher, which writes out what is still buffered"""
+    task = app.get(WRITE_BEHIND_TASK_KEY)
+    if task is not None:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+async def _close_bot(app):
+    """Close the bot session when the server stops"""
+    await app[INVESTMENT_BOT_KEY].close()
+
+def create_app(bot_app=None):
+    """
+    Create the aiohttp application serving the webhook
+    
+    Args:
+        bot_app (InvestmentBot): Bot application, defaults to the global instance
+        
+    Returns:
+        web.Application: Configured application
+    """
+    app = web.Application()
+    app[INVESTMENT_BOT_KEY] = bot_app or get_investment_bot()
+    app.router.add_post(BotConfig.WEBHOOK_PATH, handle_update)
+    app.router.add_get(BotConfig.WEBHOOK_PATH, handle_status)
+    if BotConfig.METRICS_ENABLED:
+        app.router.add_get(BotConfig.METRICS_PATH, handle_metrics)
+    app.on_startup.append(_start_pending_listeners)
+    app.on_startup.append(_start_write_behind)
+    app.on_startup.append(_enable_broadcasts)
+    app.on_cleanup.append(_disable_broadcasts)
+    app.on_cleanup.append(_stop_write_behind)
+    app.on_cleanup.append(_stop_pending_listeners)
+    app.on_cleanup.append(_close_bot)
+    return app
+
+def run_server():
+    """Run the webhook server until interrupted"""
+    logger.info(f"Starting webhook server on {BotConfig.SERVER_HOST}:{BotConfig.SERVER_PORT}")
+    web.run_app(
+        create_app(),
+        host=BotConfig.SERVER_HOST,
+        port=BotConfig.SERVER_PORT,
+        print=None
+    )
+
+if __name__ == '__main__':
+    run_server()
@@ -0,0 +1,13 @@
+"""
+Lazy accessors for services whose client libraries are slow to import
+"""
+
+def get_async_firebase_service():
+    """
+    Get the async Firebase service, importing firebase_admin and the Firestore client on first use
+    
+    Returns:
+        AsyncFirebaseService: Process-wide async Firebase service
+    """
+    from firebase_service import get_async_firebase_service as get_service
+    return get_service()
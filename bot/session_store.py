@@ -0,0 +1,174 @@
+"""
+Session stores for multi-step admin flows (deposit, withdrawal, bulk approval and broadcast)
+"""
+import abc
+import logging
+from datetime import datetime, timedelta, timezone
+from config import BotConfig
+from services import get_async_firebase_service
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class SessionRecord:
+    """Compact, fixed-layout record of one admin flow session"""
+    
+    __slots__ = (
+        'state',
+        'chat_id',
+        'message_id',
+        'deposit_id',
+        'withdrawal_id',
+        'user_id',
+        'amount',
+        'original_amount',
+        'bulk_collection',
+        'bulk_ids',
+        'broadcast_text'
+    )
+    
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        for name, value in fields.items():
+            setattr(self, name, value)
+    
+    @classmethod
+    def from_dict(cls, session):
+        """
+        Build a record from a session dict
+        
+        Args:
+            session (dict): Session fields
+            
+        Returns:
+            SessionRecord: Record holding the fields
+            
+        Raises:
+            AttributeError: If the session has a field without a slot
+        """
+        return cls(**session)
+    
+    def to_dict(self):
+        """
+        Convert the record back into a session dict
+        
+        Returns:
+            dict: Fields that are set
+        """
+        session = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None:
+                session[name] = list(value) if isinstance(value, list) else value
+        return session
+
+class SessionStore(abc.ABC):
+    """Interface for storing admin flow sessions keyed by Telegram user ID"""
+    
+    @abc.abstractmethod
+    async def get(self, user_id):
+        """
+        Get the session of a user
+        
+        Args:
+            user_id (str): Telegram user ID
+            
+        Returns:
+            dict: Copy of the session, or None if there is none or it expired
+        """
+    
+    @abc.abstractmethod
+    async def set(self, user_id, session):
+        """
+        Store the session of a user, restarting its time to live
+        
+        Args:
+            user_id (str): Telegram user ID
+            session (dict): Session fields
+        """
+    
+    @abc.abstractmethod
+    async def delete(self, user_id):
+        """
+        Remove the session of a user if there is one
+        
+        Args:
+            user_id (str): Telegram user ID
+        """
+
+class MemorySessionStore(SessionStore):
+    """Sessions kept in process memory, bounded in size and time"""
+    
+    def __init__(self, maxsize, ttl):
+        """
+        Initialize memory session store
+        
+        Args:
+            maxsize (int): Maximum number of sessions, least recently used ones are dropped
+            ttl (float): Seconds a session stays valid after it was last stored
+        """
+        self._sessions = TTLCache(maxsize, ttl)
+    
+    async def get(self, user_id):
+        record = self._sessions.get(user_id)
+        return record.to_dict() if record is not None else None
+    
+    async def set(self, user_id, session):
+        self._sessions.set(user_id, SessionRecord.from_dict(session))
+    
+    async def delete(self, user_id):
+        self._sessions.pop(user_id)
+
+class FirestoreSessionStore(SessionStore):
+    """Sessions stored in Firestore so every bot instance sees the same flow state"""
+    
+    def __init__(self, db, ttl, collection_name='sessions'):
+        """
+        Initialize Firestore session store
+        
+        Args:
+            db: Async Firestore client
+            ttl (float): Seconds a session stays valid after it was last stored
+            collection_name (str): Collection holding one document per user
+        """
+        self.db = db
+        self.ttl = ttl
+        self.collection_name = collection_name
+    
+    def _session_ref(self, user_id):
+        return self.db.collection(self.collection_name).document(str(user_id))
+    
+    async def get(self, user_id):
+        doc = await self._session_ref(user_id).get()
+        if not doc.exists:
+            return None
+            
+        session = doc.to_dict()
+        expires_at = session.pop('expires_at', None)
+        if expires_at is not None and expires_at <= datetime.now(timezone.utc):
+            return None
+        return SessionRecord.from_dict(session).to_dict()
+    
+    async def set(self, user_id, session):
+        # expires_at also drives the Firestore TTL policy that deletes stale documents
+        document_data = SessionRecord.from_dict(session).to_dict()
+        document_data['expires_at'] = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        await self._session_ref(user_id).set(document_data)
+    
+    async def delete(self, user_id):
+        await self._session_ref(user_id).delete()
+
+# Global session store instance
+session_store = None
+
+def get_session_store():
+    """Get the session store selected by SESSION_STORE ('memory' or 'firestore')"""
+    global session_store
+    if session_store is None:
+        if BotConfig.SESSION_STORE == 'firestore':
+            session_store = FirestoreSessionStore(get_async_firebase_service().db, BotConfig.SESSION_TTL)
+        else:
+            session_store = MemorySessionStore(BotConfig.SESSION_MAX_SIZE, BotConfig.SESSION_TTL)
+        logger.info(f"Using {type(session_store).__name__} for admin sessions")
+    return session_store
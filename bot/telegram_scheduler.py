@@ -0,0 +1,278 @@
+"""
+Outbound Telegram request scheduler: global and per-chat rate limits with priorities
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from telebot.asyncio_helper import ApiTelegramException
+from config import BotConfig
+from http_session import install_request_layer
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower values are sent first
+PRIORITY_ADMIN = 0
+PRIORITY_USER = 1
+PRIORITY_BULK = 2
+
+# API methods that are not sends or edits but still count against the chat limits
+CHAT_METHODS = frozenset(('copyMessage', 'copyMessages', 'forwardMessage', 'forwardMessages'))
+
+_priority = contextvars.ContextVar('telegram_priority', default=None)
+
+@contextlib.contextmanager
+def send_priority(priority):
+    """
+    Send every request made inside the block with the given priority class
+    
+    Args:
+        priority (int): PRIORITY_ADMIN, PRIORITY_USER or PRIORITY_BULK
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate"""
+    
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        """
+        Initialize token bucket
+        
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum tokens held, i.e. the allowed burst
+            clock (callable): Clock returning seconds, monotonic by default
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+    
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def try_take(self):
+        """
+        Take a token if one is available
+        
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+    
+    def reserve(self):
+        """
+        Take a token now, going into debt if the bucket is empty
+        
+        Returns:
+            float: Seconds to wait before using the reserved token
+        """
+        self._refill()
+        self._tokens -= 1
+        return max(0.0, -self._tokens / self.rate)
+    
+    def pause(self, seconds):
+        """
+        Hand out no tokens for the given time, e.g. after a retry_after from Telegram
+        
+        Args:
+            seconds (float): Pause length
+        """
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+    
+    def is_full(self):
+        """Check whether the bucket has refilled completely, i.e. was idle"""
+        self._refill()
+        return self._tokens >= self.capacity
+
+class PriorityGate:
+    """Hands out tokens of one bucket to waiters in priority order, FIFO within a priority"""
+    
+    def __init__(self, bucket):
+        """
+        Initialize gate
+        
+        Args:
+            bucket (TokenBucket): Bucket shared by all waiters
+        """
+        self.bucket = bucket
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._loop = None
+        self._pump_task = None
+    
+    def __len__(self):
+        return len(self._waiters)
+    
+    async def acquire(self, priority):
+        """
+        Wait for a token
+        
+        Args:
+            priority (int): Priority class of the request
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Waiters of a previous event loop can never be woken, start over
+            self._loop = loop
+            self._waiters = []
+            self._pump_task = None
+            
+        if not self._waiters and self.bucket.try_take() == 0:
+            return
+            
+        waiter = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = loop.create_task(self._pump())
+        await waiter
+    
+    async def _pump(self):
+        """Release waiters one token at a time until none are left"""
+        while self._waiters:
+            waiter = self._waiters[0][2]
+            if waiter.done():
+                # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+                
+            delay = self.bucket.try_take()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+                
+            heapq.heappop(self._waiters)
+            waiter.set_result(None)
+
+class OutboundScheduler:
+    """Rate limits every message sent or edited through the Telegram Bot API"""
+    
+    def __init__(self, global_rate, chat_rate, chat_burst, max_retries=3, max_chat_buckets=10000):
+        """
+        Initialize scheduler
+        
+        Args:
+            global_rate (float): Messages per second across all chats
+            chat_rate (float): Messages per second to one chat
+            chat_burst (float): Messages one chat may receive back to back
+            max_retries (int): Times a request is repeated after a 429 response
+            max_chat_buckets (int): Chat buckets kept before idle ones are dropped
+        """
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chat_buckets = max_chat_buckets
+        self._gate = PriorityGate(TokenBucket(global_rate, global_rate))
+        self._chats = {}
+        self.throttled = 0
+        self.retried = 0
+    
+    @property
+    def queue_depth(self):
+        """Number of requests waiting for the global limit"""
+        return len(self._gate)
+    
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chat_buckets:
+                # A full bucket behaves exactly like a new one, so idle chats are safe to drop
+                self._chats = {key: value for key, value in self._chats.items() if not value.is_full()}
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+    
+    async def _acquire(self, chat_id, priority):
+        """Wait until both the chat and the global limit allow one more message"""
+        delay = self._chat_bucket(chat_id).reserve()
+        if delay:
+            self.throttled += 1
+            await asyncio.sleep(delay)
+        await self._gate.acquire(priority)
+    
+    async def request(self, process_request, token, url, method='get', params=None, files=None, **kwargs):
+        """
+        Send one Bot API request, waiting for the rate limits first
+        
+        Requests that neither send nor edit a chat message pass straight through.
+        
+        Args:
+            process_request (callable): Unscheduled asyncio_helper._process_request
+            token (str): Bot token
+            url (str): API method name
+            method (str): HTTP method
+            params (dict): Request parameters
+            files (dict): Files to upload
+            **kwargs: Extra request options
+            
+        Returns:
+            Result of the API call
+        """
+        chat_id = params.get('chat_id') if params else None
+        if chat_id is None or not (url.startswith(('send', 'edit')) or url in CHAT_METHODS):
+            return await process_request(token, url, method, params, files, **kwargs)
+            
+        priority = _priority.get()
+        if priority is None:
+            priority = PRIORITY_ADMIN if BotConfig.is_admin(chat_id) else PRIORITY_USER
+            
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority)
+            try:
+                # _process_request pops keys from params, keep the original for retries
+                return await process_request(token, url, method, dict(params), files, **kwargs)
+            except ApiTelegramException as e:
+                if e.error_code != 429:
+                    raise
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                self._chat_bucket(chat_id).pause(retry_after)
+                if retry_after > 1 / self.chat_rate:
+                    # Longer than the chat limit explains, the bot as a whole is over the limit
+                    self._gate.bucket.pause(retry_after)
+                # Uploaded file objects are consumed by the first attempt and cannot be resent
+                if files or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retried += 1
+                logger.warning(f"Telegram rate limit hit on {url} for chat {chat_id}, retrying in {retry_after}s")
+    
+    def install(self):
+        """Route every Bot API request of this process through the scheduler"""
+        def wrap(process_request):
+            async def scheduled_request(token, url, method='get', params=None, files=None, **kwargs):
+                return await self.request(process_request, token, url, method, params, files, **kwargs)
+            return scheduled_request
+            
+        if install_request_layer('scheduler', wrap):
+            logger.info("Outbound Telegram scheduler installed")
+
+# Global scheduler instance
+outbound_scheduler = None
+
+def get_outbound_scheduler():
+    """Get outbound scheduler instance"""
+    global outbound_scheduler
+    if outbound_scheduler is None:
+        outbound_scheduler = OutboundScheduler(
+            BotConfig.TELEGRAM_GLOBAL_RATE,
+            BotConfig.TELEGRAM_CHAT_RATE,
+            BotConfig.TELEGRAM_CHAT_BURST,
+            BotConfig.TELEGRAM_MAX_RETRIES
+        )
+    return outbound_scheduler
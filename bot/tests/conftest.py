@@ -0,0 +1,7 @@
+"""
+Make the bot modules importable as top-level names, as they are when deployed
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,347 @@
+"""
+In-memory stand-in for the Firestore AsyncClient
+
+Only the calls the bot makes are implemented. Every write gives the document a
+new update time that write options are checked against, and transactions abort
+at commit when a document they read was written in the meantime, so the real
+async_transactional decorator retries them.
+"""
+import copy
+import itertools
+import uuid
+from datetime import datetime, timedelta, timezone
+from google.api_core.exceptions import Aborted, AlreadyExists, FailedPrecondition, NotFound
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.base_aggregation import AggregationResult
+
+class FakeWriteOption:
+    def __init__(self, last_update_time):
+        self.last_update_time = last_update_time
+
+class FakeWriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+class FakeSnapshot:
+    def __init__(self, reference, data, update_time, create_time):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self.update_time = update_time
+        self.create_time = create_time
+        self._data = data
+    
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+    
+    def get(self, field):
+        return self._data.get(field)
+
+class FakeDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+    
+    def collection(self, name):
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+    
+    async def get(self, transaction=None):
+        snapshot = self._client._snapshot(self)
+        if transaction is not None:
+            transaction._record_read(snapshot)
+        return snapshot
+    
+    async def set(self, data, merge=False):
+        return self._client._commit([('set', self, data, merge)])[0]
+    
+    async def create(self, data):
+        return self._client._commit([('create', self, data, None)])[0]
+    
+    async def update(self, data, option=None):
+        return self._client._commit([('update', self, data, option)])[0]
+    
+    async def delete(self):
+        return self._client._commit([('delete', self, None, None)])[0]
+
+class FakeQuery:
+    def __init__(self, client, path, filters=(), orders=(), cursor=None, limit=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._cursor = cursor
+        self._limit = limit
+    
+    def _copy(self, **changes):
+        fields = dict(filters=self._filters, orders=self._orders, cursor=self._cursor, limit=self._limit)
+        fields.update(changes)
+        return FakeQuery(self._client, self._path, **fields)
+    
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+    
+    def order_by(self, field_path, direction='ASCENDING'):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+    
+    def select(self, field_paths):
+        return self
+    
+    def start_after(self, document_fields):
+        return self._copy(cursor=document_fields)
+    
+    def limit(self, count):
+        return self._copy(limit=count)
+    
+    def count(self, alias=None):
+        return FakeAggregationQuery(self).count(alias)
+    
+    def sum(self, field_path, alias=None):
+        return FakeAggregationQuery(self).sum(field_path, alias)
+    
+    def _matches(self, data):
+        for field_path, op_string, value in self._filters:
+            field_value = data.get(field_path)
+            if op_string == '==' and field_value != value:
+                return False
+            if op_string == 'in' and field_value not in value:
+                return False
+            if op_string == '<' and not (field_value is not None and field_value < value):
+                return False
+        return True
+    
+    def _sort_key(self, snapshot):
+        return tuple(
+            snapshot.id if field_path == '__name__' else snapshot.get(field_path)
+            for field_path, _ in self._orders
+        )
+    
+    def _documents(self):
+        prefix = self._path + '/'
+        snapshots = [
+            self._client._snapshot(FakeDocumentReference(self._client, path))
+            for path in sorted(self._client.documents)
+            if path.startswith(prefix) and '/' not in path[len(prefix):]
+        ]
+        snapshots = [snapshot for snapshot in snapshots if self._matches(snapshot._data)]
+        
+        if self._orders:
+            # Like Firestore, documents without an ordered field are left out
+            ordered_fields = [field_path for field_path, _ in self._orders if field_path != '__name__']
+            snapshots = [
+                snapshot for snapshot in snapshots
+                if all(field_path in snapshot._data for field_path in ordered_fields)
+            ]
+            descending = self._orders[0][1] == 'DESCENDING'
+            snapshots.sort(key=self._sort_key, reverse=descending)
+            if self._cursor is not None:
+                cursor_key = tuple(self._cursor[field_path] for field_path, _ in self._orders)
+                snapshots = [
+                    snapshot for snapshot in snapshots
+                    if (self._sort_key(snapshot) < cursor_key if descending else self._sort_key(snapshot) > cursor_key)
+                ]
+        
+        if self._limit is not None:
+            snapshots = snapshots[:self._limit]
+        return snapshots
+    
+    async def get(self, transaction=None):
+        return self._documents()
+    
+    async def stream(self, transaction=None):
+        for snapshot in self._documents():
+            yield snapshot
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.id = path.rsplit('/', 1)[-1]
+    
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._client, f"{self._path}/{document_id or uuid.uuid4().hex[:20]}")
+
+class FakeAggregationQuery:
+    def __init__(self, query):
+        self._query = query
+        self._aggregations = []
+    
+    def count(self, alias=None):
+        self._aggregations.append(('count', None, alias))
+        return self
+    
+    def sum(self, field_path, alias=None):
+        self._aggregations.append(('sum', field_path, alias))
+        return self
+    
+    async def get(self, transaction=None):
+        snapshots = self._query._documents()
+        results = []
+        for kind, field_path, alias in self._aggregations:
+            if kind == 'count':
+                value = len(snapshots)
+            else:
+                value = sum(snapshot._data.get(field_path, 0) for snapshot in snapshots)
+            results.append(AggregationResult(alias=alias, value=value))
+        return [results]
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+    
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference, data, merge))
+    
+    def create(self, reference, data):
+        self._writes.append(('create', reference, data, None))
+    
+    def update(self, reference, data, option=None):
+        self._writes.append(('update', reference, data, option))
+    
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, None))
+    
+    def __len__(self):
+        return len(self._writes)
+    
+    async def commit(self):
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes)
+
+class FakeTransaction(FakeWriteBatch):
+    """Transaction driven by firestore.async_transactional through its private hooks"""
+    
+    _read_only = False
+    _max_attempts = 5
+    
+    def __init__(self, client):
+        super().__init__(client)
+        self._id = None
+        self._read_times = {}
+        self.attempts = 0
+    
+    def _record_read(self, snapshot):
+        self._read_times.setdefault(snapshot.reference.path, snapshot.update_time)
+    
+    def _clean_up(self):
+        self._writes = []
+        self._read_times = {}
+        self._id = None
+    
+    async def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+        self.attempts += 1
+    
+    async def _commit(self):
+        if self._client.before_transaction_commit is not None:
+            self._client.before_transaction_commit(self)
+        for path, update_time in self._read_times.items():
+            if self._client.update_times.get(path) != update_time:
+                self._clean_up()
+                raise Aborted(f"{path} changed during the transaction")
+        writes = self._writes
+        self._clean_up()
+        return self._client._commit(writes)
+    
+    async def _rollback(self):
+        self._clean_up()
+
+class FakeAsyncClient:
+    """
+    Async Firestore client over a dict of document path to data
+    
+    Attributes:
+        documents (dict): Document path to stored data
+        update_times (dict): Document path to the time of its last write
+        create_times (dict): Document path to the time it was created
+        before_commit (callable): Called with the writes of every commit before
+            they are applied, to simulate a concurrent writer
+        before_transaction_commit (callable): Called with a transaction before its
+            reads are checked, to simulate a writer racing the transaction
+    """
+    
+    def __init__(self):
+        self.documents = {}
+        self.update_times = {}
+        self.create_times = {}
+        self.before_commit = None
+        self.before_transaction_commit = None
+        self._ticks = itertools.count(1)
+        self._epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+    
+    def document(self, path):
+        return FakeDocumentReference(self, path)
+    
+    def batch(self):
+        return FakeWriteBatch(self)
+    
+    def transaction(self):
+        return FakeTransaction(self)
+    
+    @staticmethod
+    def write_option(last_update_time):
+        return FakeWriteOption(last_update_time)
+    
+    async def get_all(self, references, transaction=None):
+        for reference in references:
+            yield await reference.get(transaction=transaction)
+    
+    def put(self, path, data):
+        """Store a document as if another client wrote it"""
+        self._commit([('set', FakeDocumentReference(self, path), data, False)])
+    
+    def data(self, path):
+        """Get the stored data of a document, None if it does not exist"""
+        return copy.deepcopy(self.documents.get(path))
+    
+    def _snapshot(self, reference):
+        path = reference.path
+        return FakeSnapshot(reference, copy.deepcopy(self.documents.get(path)), self.update_times.get(path), self.create_times.get(path))
+    
+    def _now(self):
+        return self._epoch + timedelta(seconds=next(self._ticks))
+    
+    def _resolve(self, current, data):
+        resolved = dict(current)
+        for field, value in data.items():
+            if value is transforms.SERVER_TIMESTAMP:
+                value = self._now()
+            elif isinstance(value, transforms.Increment):
+                value = resolved.get(field, 0) + value.value
+            elif value is transforms.DELETE_FIELD:
+                resolved.pop(field, None)
+                continue
+            resolved[field] = value
+        return resolved
+    
+    def _commit(self, writes):
+        """Check every precondition, then apply all writes at one update time"""
+        if self.before_commit is not None:
+            self.before_commit(writes)
+        
+        for kind, reference, data, option in writes:
+            exists = reference.path in self.documents
+            if kind == 'create' and exists:
+                raise AlreadyExists(f"Document already exists: {reference.path}")
+            if kind == 'update' and not exists:
+                raise NotFound(f"No document to update: {reference.path}")
+            if isinstance(option, FakeWriteOption) and self.update_times.get(reference.path) != option.last_update_time:
+                raise FailedPrecondition(f"{reference.path} was updated since {option.last_update_time}")
+        
+        update_time = self._now()
+        for kind, reference, data, option in writes:
+            if kind == 'delete':
+                self.documents.pop(reference.path, None)
+                self.update_times.pop(reference.path, None)
+                self.create_times.pop(reference.path, None)
+                continue
+            current = self.documents.get(reference.path, {}) if kind == 'update' or option is True else {}
+            self.documents[reference.path] = self._resolve(current, data)
+            self.update_times[reference.path] = update_time
+            self.create_times.setdefault(reference.path, update_time)
+        return [FakeWriteResult(update_time) for _ in writes]
@@ -0,0 +1,85 @@
+"""Tests for approving single deposits and withdrawals in one transaction"""
+import asyncio
+from unittest import mock
+from fake_firestore import FakeAsyncClient
+from firebase_service import AsyncFirebaseService
+
+def make_service(db):
+    with mock.patch('firebase_service.initialize_firebase_app'), \
+            mock.patch('firebase_service.firestore_async.client', return_value=db):
+        return AsyncFirebaseService()
+
+def seed(db):
+    db.put('users/1', {'balance': 100})
+    db.put('deposits/D1', {'status': 'pending', 'amount': 50, 'user_id': '1'})
+    db.put('withdrawals/W1', {'status': 'pending', 'amount': 30, 'user_id': '1'})
+
+def race_once(db, path, data):
+    """Write a document once, between the transaction's reads and its commit"""
+    def write(transaction):
+        db.before_transaction_commit = None
+        db.put(path, data)
+    db.before_transaction_commit = write
+
+def test_deposit_approval_credits_the_user_once():
+    db = FakeAsyncClient()
+    seed(db)
+    service = make_service(db)
+    
+    assert asyncio.run(service.approve_deposit('D1', 40))
+    # A second admin or a retried callback finds the deposit approved already
+    assert not asyncio.run(service.approve_deposit('D1', 40))
+    
+    assert db.data('deposits/D1')['status'] == 'approved'
+    assert db.data('users/1')['balance'] == 140
+
+def test_deposit_approval_retries_on_a_concurrent_balance_change():
+    db = FakeAsyncClient()
+    seed(db)
+    service = make_service(db)
+    race_once(db, 'users/1', {'balance': 500})
+    
+    assert asyncio.run(service.approve_deposit('D1', 50))
+    
+    # The retry read the new balance instead of overwriting it
+    assert db.data('users/1')['balance'] == 550
+
+def test_deposit_approved_concurrently_is_not_credited_twice():
+    db = FakeAsyncClient()
+    seed(db)
+    service = make_service(db)
+    race_once(db, 'deposits/D1', {'status': 'approved', 'amount': 50, 'user_id': '1'})
+    
+    assert not asyncio.run(service.approve_deposit('D1', 50))
+    assert db.data('users/1')['balance'] == 100
+
+def test_missing_documents_are_not_approved():
+    db = FakeAsyncClient()
+    db.put('deposits/D2', {'status': 'pending', 'amount': 5, 'user_id': '9'})
+    service = make_service(db)
+    
+    assert not asyncio.run(service.approve_deposit('missing', 5))
+    assert not asyncio.run(service.approve_deposit('D2', 5))
+    assert db.data('deposits/D2')['status'] == 'pending'
+
+def test_withdrawal_approval_debits_the_user():
+    db = FakeAsyncClient()
+    seed(db)
+    service = make_service(db)
+    
+    assert asyncio.run(service.approve_withdrawal('W1', 30))
+    
+    assert db.data('withdrawals/W1')['status'] == 'approved'
+    assert db.data('users/1')['balance'] == 70
+
+def test_withdrawal_above_the_balance_writes_nothing():
+    db = FakeAsyncClient()
+    seed(db)
+    service = make_service(db)
+    race_once(db, 'users/1', {'balance': 10})
+    
+    # The balance dropped after the first read, the retry sees it and refuses
+    assert not asyncio.run(service.approve_withdrawal('W1', 30))
+    
+    assert db.data('withdrawals/W1')['status'] == 'pending'
+    assert db.data('users/1')['balance'] == 10
@@ -0,0 +1,147 @@
+"""Tests for claiming, checkpointing and finishing broadcast jobs"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from google.cloud.firestore_v1 import Increment
+from telebot.asyncio_helper import ApiTelegramException
+import broadcast
+import telegram_scheduler
+from broadcast import BroadcastEngine, classify_delivery_error
+from fake_firestore import FakeAsyncClient
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+    
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, telegram_scheduler._priority.get()))
+
+def make_engine(db, page_size=2):
+    return BroadcastEngine(db, page_size=page_size, lease=60)
+
+def create_job(engine):
+    return asyncio.run(engine.create('Hello', chat_id=7, message_id=8))
+
+def add_users(db, count):
+    for index in range(count):
+        db.put(f"users/{index + 10}", {'balance': 0})
+
+def page_checkpoint(cursor, delivered):
+    return {'cursor': cursor, 'heartbeat_at': datetime.now(timezone.utc), 'delivered': Increment(delivered)}
+
+def test_only_one_engine_claims_a_queued_job():
+    db = FakeAsyncClient()
+    first, second = make_engine(db), make_engine(db)
+    job_id = create_job(first)
+    
+    job, update_time = asyncio.run(first._claim(job_id))
+    
+    assert job['owner'] == first.owner
+    assert update_time == db.update_times[f"broadcasts/{job_id}"]
+    assert asyncio.run(second._claim(job_id)) == (None, None)
+
+def test_claim_loses_to_a_concurrent_claim():
+    db = FakeAsyncClient()
+    first, second = make_engine(db), make_engine(db)
+    job_id = create_job(first)
+    
+    def claim_first(writes):
+        # The other engine claims between this engine's read and write
+        db.before_commit = None
+        db.put(f"broadcasts/{job_id}", dict(db.data(f"broadcasts/{job_id}"), status='running', owner=second.owner))
+    db.before_commit = claim_first
+    
+    assert asyncio.run(first._claim(job_id)) == (None, None)
+    assert db.data(f"broadcasts/{job_id}")['owner'] == second.owner
+
+def test_stalled_job_is_taken_over():
+    db = FakeAsyncClient()
+    first, second = make_engine(db), make_engine(db)
+    job_id = create_job(first)
+    asyncio.run(first._claim(job_id))
+    db.put(f"broadcasts/{job_id}", dict(db.data(f"broadcasts/{job_id}"), heartbeat_at=datetime.now(timezone.utc) - timedelta(seconds=61)))
+    
+    job, _ = asyncio.run(second._claim(job_id))
+    
+    assert job['owner'] == second.owner
+
+def test_checkpoint_after_a_takeover_is_dropped():
+    db = FakeAsyncClient()
+    first, second = make_engine(db), make_engine(db)
+    job_id = create_job(first)
+    _, update_time = asyncio.run(first._claim(job_id))
+    db.put(f"broadcasts/{job_id}", dict(db.data(f"broadcasts/{job_id}"), owner=second.owner))
+    
+    status, new_update_time = asyncio.run(first._checkpoint(job_id, page_checkpoint('11', 2), update_time))
+    
+    assert (status, new_update_time) == ('running', None)
+    job = db.data(f"broadcasts/{job_id}")
+    assert job['delivered'] == 0
+    assert job['cursor'] is None
+
+def test_checkpoint_after_a_cancellation_still_counts_the_page():
+    db = FakeAsyncClient()
+    engine = make_engine(db)
+    job_id = create_job(engine)
+    _, update_time = asyncio.run(engine._claim(job_id))
+    asyncio.run(engine.cancel(job_id))
+    
+    status, new_update_time = asyncio.run(engine._checkpoint(job_id, page_checkpoint('11', 2), update_time))
+    
+    assert status == 'cancelled'
+    assert new_update_time == db.update_times[f"broadcasts/{job_id}"]
+    job = db.data(f"broadcasts/{job_id}")
+    assert (job['status'], job['delivered'], job['cursor']) == ('cancelled', 2, '11')
+
+def test_run_sends_every_page_and_completes():
+    db = FakeAsyncClient()
+    add_users(db, 5)
+    engine = make_engine(db)
+    job_id = create_job(engine)
+    bot = FakeBot()
+    progress = []
+    
+    async def on_progress(job):
+        progress.append((job['delivered'], telegram_scheduler._priority.get()))
+    
+    job = asyncio.run(engine.run(bot, job_id, on_progress))
+    
+    assert job['status'] == 'completed'
+    assert [chat_id for chat_id, _ in bot.sent] == ['10', '11', '12', '13', '14']
+    assert {priority for _, priority in bot.sent} == {telegram_scheduler.PRIORITY_BULK}
+    # Progress edits jump ahead of the queued broadcast sends
+    assert progress == [(2, telegram_scheduler.PRIORITY_ADMIN), (4, telegram_scheduler.PRIORITY_ADMIN), (5, telegram_scheduler.PRIORITY_ADMIN)]
+    stored = db.data(f"broadcasts/{job_id}")
+    assert (stored['status'], stored['delivered'], stored['cursor']) == ('completed', 5, '14')
+
+def test_run_stops_after_the_page_when_cancelled():
+    db = FakeAsyncClient()
+    add_users(db, 5)
+    engine = make_engine(db)
+    job_id = create_job(engine)
+    
+    async def cancel_on_first_page(job):
+        await engine.cancel(job_id)
+    
+    job = asyncio.run(engine.run(FakeBot(), job_id, cancel_on_first_page))
+    
+    assert job['status'] == 'cancelled'
+    stored = db.data(f"broadcasts/{job_id}")
+    assert (stored['status'], stored['delivered'], stored['cursor']) == ('cancelled', 4, '13')
+
+def test_delivery_errors_are_classified():
+    blocked = ApiTelegramException('sendMessage', None, {'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'})
+    gone = ApiTelegramException('sendMessage', None, {'error_code': 400, 'description': 'Bad Request: chat not found'})
+    
+    assert classify_delivery_error(blocked) == 'blocked'
+    assert classify_delivery_error(gone) == 'blocked'
+    assert classify_delivery_error(RuntimeError('timeout')) == 'failed'
+
+def test_start_broadcast_refuses_without_background_runs():
+    broadcast.enable_background_runs(False)
+    
+    async def start():
+        broadcast.start_broadcast(FakeBot(), 'job')
+    
+    with pytest.raises(RuntimeError):
+        asyncio.run(start())
@@ -0,0 +1,162 @@
+"""Tests for classifying and writing the documents of a bulk approval chunk"""
+import asyncio
+from unittest import mock
+from config import BotConfig
+from fake_firestore import FakeAsyncClient
+from firebase_service import AsyncFirebaseService, _bulk_user_ids, _write_bulk_approval
+
+class FakeRef:
+    """Document or collection reference that only knows its path"""
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def collection(self, name):
+        return FakeRef(f"{self.path}/{name}")
+    
+    def document(self, doc_id):
+        return FakeRef(f"{self.path}/{doc_id}")
+
+class FakeDb:
+    def collection(self, name):
+        return FakeRef(name)
+
+def write_chunk(collection_name, doc_ids, documents, users):
+    transaction = mock.Mock()
+    outcomes = _write_bulk_approval(transaction, FakeDb(), collection_name, doc_ids, documents, users)
+    updates = {call.args[0].path: call.args[1] for call in transaction.update.call_args_list}
+    return outcomes, updates, transaction
+
+def results(outcomes):
+    return {outcome['id']: outcome['result'] for outcome in outcomes}
+
+def test_deposit_chunk_outcomes():
+    documents = {
+        'D1': {'status': 'pending', 'amount': 10, 'user_id': '1'},
+        'D3': {'status': 'approved', 'amount': 30, 'user_id': '1'},
+        'D4': {'status': 'pending', 'amount': 5, 'user_id': '9'}
+    }
+    users = {'1': {'balance': 100}}
+    
+    outcomes, updates, _ = write_chunk('deposits', ['D1', 'D2', 'D3', 'D4'], documents, users)
+    
+    assert results(outcomes) == {
+        'D1': 'approved',
+        'D2': 'not_found',
+        'D3': 'not_pending',
+        'D4': 'user_not_found'
+    }
+    assert [outcome['id'] for outcome in outcomes] == ['D1', 'D2', 'D3', 'D4']
+    assert outcomes[0]['new_balance'] == 110
+    assert outcomes[2]['status'] == 'approved'
+    assert set(updates) == {'deposits/D1', 'users/1'}
+    assert updates['users/1']['balance'] == 110
+
+def test_withdrawals_debit_a_running_balance():
+    documents = {
+        'W1': {'status': 'pending', 'amount': 60, 'user_id': '1'},
+        'W2': {'status': 'pending', 'amount': 60, 'user_id': '1'},
+        'W3': {'status': 'pending', 'amount': 40, 'user_id': '1'}
+    }
+    users = {'1': {'balance': 100}}
+    
+    outcomes, updates, _ = write_chunk('withdrawals', ['W1', 'W2', 'W3'], documents, users)
+    
+    assert results(outcomes) == {'W1': 'approved', 'W2': 'insufficient_balance', 'W3': 'approved'}
+    assert outcomes[1]['current_balance'] == 40
+    assert 'withdrawals/W2' not in updates
+    # One balance write per user, with the final balance
+    assert updates['users/1']['balance'] == 0
+
+def test_statistics_are_incremented_once_per_chunk():
+    documents = {
+        'D1': {'status': 'pending', 'amount': 10, 'user_id': '1'},
+        'D2': {'status': 'pending', 'amount': 5, 'user_id': '2'}
+    }
+    users = {'1': {'balance': 0}, '2': {'balance': 0}}
+    
+    _, _, transaction = write_chunk('deposits', ['D1', 'D2'], documents, users)
+    
+    transaction.set.assert_called_once()
+    shard_ref, payload = transaction.set.call_args.args
+    assert shard_ref.path.startswith('stats/transactions/shards/')
+    assert payload['pending_deposits_count'].value == -2
+    assert payload['total_deposit_amount'].value == -15
+
+def test_chunk_without_approvals_writes_nothing():
+    documents = {'D1': {'status': 'rejected', 'amount': 10, 'user_id': '1'}}
+    
+    outcomes, updates, transaction = write_chunk('deposits', ['D1'], documents, {'1': {'balance': 0}})
+    
+    assert results(outcomes) == {'D1': 'not_pending'}
+    assert updates == {}
+    transaction.set.assert_not_called()
+
+def test_bulk_user_ids_are_distinct_owners_of_pending_documents():
+    documents = {
+        'D1': {'status': 'pending', 'user_id': 1},
+        'D2': {'status': 'pending', 'user_id': '1'},
+        'D3': {'status': 'approved', 'user_id': '2'},
+        'D4': {'status': 'pending', 'user_id': '3'},
+        'D5': {'status': 'pending'}
+    }
+    assert _bulk_user_ids(documents) == ['1', '3']
+
+def make_service(db):
+    with mock.patch('firebase_service.initialize_firebase_app'), \
+            mock.patch('firebase_service.firestore_async.client', return_value=db):
+        return AsyncFirebaseService()
+
+def seed_deposits(db, count, user_id='1'):
+    db.put(f"users/{user_id}", {'balance': 0})
+    for index in range(count):
+        db.put(f"deposits/D{index}", {'status': 'pending', 'amount': 10, 'user_id': user_id})
+
+def test_bulk_approval_commits_chunk_by_chunk():
+    db = FakeAsyncClient()
+    seed_deposits(db, 5)
+    service = make_service(db)
+    
+    with mock.patch.object(BotConfig, 'BULK_APPROVAL_CHUNK_SIZE', 2):
+        outcomes = asyncio.run(service.bulk_approve_deposits(['D0', 'D1', 'D1', 'D2', 'D3', 'D4', 'missing']))
+    
+    assert [outcome['id'] for outcome in outcomes] == ['D0', 'D1', 'D2', 'D3', 'D4', 'missing']
+    assert results(outcomes) == dict({f"D{index}": 'approved' for index in range(5)}, missing='not_found')
+    # Every chunk read the balance the previous chunk wrote
+    assert db.data('users/1')['balance'] == 50
+    assert [outcome['new_balance'] for outcome in outcomes[:5]] == [10, 20, 30, 40, 50]
+
+def test_bulk_approval_retries_a_chunk_that_raced_another_admin():
+    db = FakeAsyncClient()
+    seed_deposits(db, 2)
+    service = make_service(db)
+    
+    def approve_d0(transaction):
+        # Another admin approves D0 and credits it while this chunk is in flight
+        db.before_transaction_commit = None
+        db.put('deposits/D0', {'status': 'approved', 'amount': 10, 'user_id': '1'})
+        db.put('users/1', {'balance': 10})
+    db.before_transaction_commit = approve_d0
+    
+    outcomes = asyncio.run(service.bulk_approve_deposits(['D0', 'D1']))
+    
+    assert results(outcomes) == {'D0': 'not_pending', 'D1': 'approved'}
+    assert db.data('users/1')['balance'] == 20
+
+def test_failed_chunk_reports_every_id_and_later_chunks_still_run():
+    db = FakeAsyncClient()
+    seed_deposits(db, 4)
+    service = make_service(db)
+    
+    def keep_changing_d0(transaction):
+        # Every attempt of the first chunk aborts until the retries run out
+        if 'deposits/D0' in transaction._read_times:
+            db.put('deposits/D0', db.data('deposits/D0'))
+    db.before_transaction_commit = keep_changing_d0
+    
+    with mock.patch.object(BotConfig, 'BULK_APPROVAL_CHUNK_SIZE', 2):
+        outcomes = asyncio.run(service.bulk_approve_deposits(['D0', 'D1', 'D2', 'D3']))
+    
+    assert results(outcomes) == {'D0': 'error', 'D1': 'error', 'D2': 'approved', 'D3': 'approved'}
+    assert db.data('deposits/D1')['status'] == 'pending'
+    assert db.data('users/1')['balance'] == 20
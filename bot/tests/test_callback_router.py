@@ -0,0 +1,79 @@
+"""Tests for parsing callback_data into routes"""
+import pytest
+from handlers.callback_router import CallbackRouter
+
+async def handler(bot, call, *args):
+    pass
+
+@pytest.fixture
+def router():
+    router = CallbackRouter()
+    router.add('language', None, handler)
+    router.add('admin', 'pending', handler, admin_only=True)
+    router.add('admin', 'bulkdeposit', handler, 'deposits')
+    router.add('broadcast', 'cancel', handler, arg_count=1)
+    router.add('pending', 'd', handler, 'd', arg_count=2)
+    return router
+
+def test_action_without_arguments(router):
+    route, data = router.parse('admin_pending')
+    assert route is not None and route.admin_only
+    assert (data.prefix, data.action, data.args) == ('admin', 'pending', ())
+
+def test_bound_arguments_are_kept_on_the_route(router):
+    route, data = router.parse('admin_bulkdeposit')
+    assert route.bound_args == ('deposits',)
+    assert data.args == ()
+
+def test_none_action_passes_the_rest_as_argument(router):
+    route, data = router.parse('language_english')
+    assert route is not None
+    assert (data.prefix, data.action, data.args) == ('language', None, ('english',))
+
+def test_none_action_keeps_underscores_in_its_argument(router):
+    route, data = router.parse('language_pt_br')
+    assert route is not None
+    assert data.args == ('pt_br',)
+
+def test_last_argument_keeps_further_underscores(router):
+    route, data = router.parse('pending_d_n_1715934615123456-a_b')
+    assert route is not None
+    assert data.args == ('n', '1715934615123456-a_b')
+
+def test_single_argument(router):
+    route, data = router.parse('broadcast_cancel_job_1')
+    assert route is not None
+    assert data.args == ('job_1',)
+
+@pytest.mark.parametrize('callback_data', [
+    'broadcast_cancel',
+    'broadcast_cancel_',
+    'pending_d_n',
+    'pending_d_n_',
+    'pending_d__cursor',
+    'language_',
+    'language',
+])
+def test_missing_or_empty_arguments_are_rejected(router, callback_data):
+    route, _ = router.parse(callback_data)
+    assert route is None
+
+def test_unexpected_arguments_are_rejected(router):
+    route, data = router.parse('admin_pending_extra')
+    assert route is None
+    assert data.args == ()
+
+def test_trailing_underscore_without_arguments_is_accepted(router):
+    route, data = router.parse('admin_pending_')
+    assert route is not None
+    assert data.args == ()
+
+@pytest.mark.parametrize('callback_data', ['', 'unknown', 'unknown_action', 'admin_unknown'])
+def test_unknown_callbacks_have_no_route(router, callback_data):
+    route, data = router.parse(callback_data)
+    assert route is None
+    assert data.prefix == callback_data.partition('_')[0]
+
+def test_routes_keep_the_handler_name(router):
+    route, _ = router.parse('admin_pending')
+    assert route.handler.__name__ == 'handler'
@@ -0,0 +1,57 @@
+"""Tests for the pooled keep-alive Telegram HTTP sessions"""
+import asyncio
+from http_session import TelegramSessionManager
+
+def test_session_is_reused_within_a_loop():
+    manager = TelegramSessionManager(limit=7, keepalive_timeout=30, dns_cache_ttl=120)
+    
+    async def get_twice():
+        first = await manager.get_session()
+        second = await manager.get_session()
+        settings = (first.connector.limit, first.connector.limit_per_host)
+        await manager.close()
+        return first is second, settings, first.closed, manager.session
+    
+    same, settings, closed, remaining = asyncio.run(get_twice())
+    
+    assert same
+    assert settings == (7, 7)
+    # close shuts the pool down and forgets the session
+    assert closed and remaining is None
+
+def test_each_loop_gets_its_own_session():
+    manager = TelegramSessionManager()
+    
+    async def get_first():
+        session = await manager.get_session()
+        # Closed behind the manager's back, it stays registered under its loop
+        await session.close()
+        return session
+    
+    async def get_second():
+        second = await manager.get_session()
+        registered = list(manager._sessions.values())
+        await manager.close()
+        return second, registered
+    
+    first = asyncio.run(get_first())
+    second, registered = asyncio.run(get_second())
+    
+    assert first is not second
+    # The session of the closed first loop was dropped when the second loop asked
+    assert registered == [second]
+
+def test_closed_session_is_replaced():
+    manager = TelegramSessionManager()
+    
+    async def replace():
+        first = await manager.get_session()
+        await first.close()
+        second = await manager.get_session()
+        await manager.close()
+        return first is not second
+    
+    assert asyncio.run(replace())
+
+def test_session_property_is_none_outside_a_loop():
+    assert TelegramSessionManager().session is None
@@ -0,0 +1,85 @@
+"""Tests for sending photos by their cached Telegram file_id"""
+import asyncio
+import types
+from unittest import mock
+import pytest
+from telebot.asyncio_helper import ApiTelegramException
+import media_cache
+from fake_firestore import FakeAsyncClient
+from media_cache import MediaCache, send_cached_photo
+
+URL = 'https://example.com/welcome.jpg'
+
+class PhotoBot:
+    """Answers send_photo like Telegram, rejecting the file_ids in rejected"""
+    
+    def __init__(self, rejected=(), error=None):
+        self.sent = []
+        self.rejected = set(rejected)
+        self.error = error
+    
+    async def send_photo(self, chat_id, photo, **kwargs):
+        self.sent.append(photo)
+        if self.error is not None:
+            raise self.error
+        if photo in self.rejected:
+            raise ApiTelegramException('sendPhoto', None, {'error_code': 400, 'description': 'Bad Request: wrong file identifier'})
+        return types.SimpleNamespace(photo=[types.SimpleNamespace(file_id='small'), types.SimpleNamespace(file_id=f"id-{len(self.sent)}")])
+
+def send(bot, cache):
+    with mock.patch.object(media_cache, 'get_media_cache', return_value=cache):
+        return asyncio.run(send_cached_photo(bot, 1, URL, caption='Hi'))
+
+def test_photo_is_uploaded_once_and_then_sent_by_file_id():
+    db = FakeAsyncClient()
+    bot = PhotoBot()
+    
+    send(bot, MediaCache(db))
+    send(bot, MediaCache(db))
+    
+    # The second instance found the largest size's file_id in Firestore
+    assert bot.sent == [URL, 'id-1']
+
+def test_rejected_file_id_is_replaced():
+    db = FakeAsyncClient()
+    cache = MediaCache(db)
+    asyncio.run(cache.set(URL, 'stale'))
+    bot = PhotoBot(rejected={'stale'})
+    
+    send(bot, cache)
+    
+    assert bot.sent == ['stale', URL]
+    assert asyncio.run(MediaCache(db).get(URL)) == 'id-2'
+
+def test_other_telegram_errors_are_not_retried_by_url():
+    cache = MediaCache(FakeAsyncClient())
+    asyncio.run(cache.set(URL, 'cached'))
+    bot = PhotoBot(error=ApiTelegramException('sendPhoto', None, {'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'}))
+    
+    with pytest.raises(ApiTelegramException):
+        send(bot, cache)
+    assert bot.sent == ['cached']
+
+def test_failing_cache_still_sends_by_url():
+    bot = PhotoBot()
+    broken = mock.Mock(side_effect=RuntimeError('Firestore unavailable'))
+    
+    with mock.patch.object(media_cache, 'get_media_cache', broken):
+        asyncio.run(send_cached_photo(bot, 1, URL))
+    
+    assert bot.sent == [URL]
+
+def test_firestore_errors_only_cost_the_cache():
+    db = FakeAsyncClient()
+    
+    def unavailable(writes):
+        raise RuntimeError('Firestore unavailable')
+    db.before_commit = unavailable
+    bot = PhotoBot()
+    cache = MediaCache(db)
+    
+    send(bot, cache)
+    send(bot, cache)
+    
+    # The file_id is still remembered in memory for this instance
+    assert bot.sent == [URL, 'id-1']
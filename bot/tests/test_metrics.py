@@ -0,0 +1,108 @@
+"""Tests for the Prometheus metrics and the handler error counter"""
+import asyncio
+import types
+from unittest import mock
+import pytest
+from handlers import callback_handler, command_handler
+from metrics import ERRORS, Counter, Histogram, is_authorized, timed_handler
+
+def error_count(handler):
+    return ERRORS._values.get((handler,), 0)
+
+class FakeBot:
+    """Records the API calls of a handler and the handlers registered on it"""
+    
+    def __init__(self):
+        self.calls = []
+        self.handlers = {}
+    
+    def message_handler(self, commands=None, **kwargs):
+        def register(function):
+            self.handlers[function.__name__] = function
+            return function
+        return register
+    
+    def __getattr__(self, method):
+        async def api_call(*args, **kwargs):
+            self.calls.append((method, args, kwargs))
+        return api_call
+
+def make_call(data):
+    return types.SimpleNamespace(
+        id='query',
+        data=data,
+        from_user=types.SimpleNamespace(id=1),
+        message=types.SimpleNamespace(chat=types.SimpleNamespace(id=1), message_id=2)
+    )
+
+def failing_service():
+    service = mock.Mock()
+    service.get_pending_snapshot = mock.AsyncMock(side_effect=RuntimeError('Firestore unavailable'))
+    service.create_or_update_user = mock.AsyncMock(side_effect=RuntimeError('Firestore unavailable'))
+    return service
+
+def test_caught_callback_handler_error_is_counted():
+    bot = FakeBot()
+    before = error_count('handle_pending_transactions')
+    
+    with mock.patch.object(callback_handler, 'get_async_firebase_service', return_value=failing_service()):
+        asyncio.run(callback_handler.handle_pending_transactions(bot, make_call('admin_pending')))
+    
+    assert error_count('handle_pending_transactions') == before + 1
+    # The handler still tells the admin something went wrong
+    assert bot.calls[-1][0] == 'edit_message_text'
+
+def test_caught_command_handler_error_is_counted():
+    bot = FakeBot()
+    command_handler.setup_command_handlers(bot)
+    message = types.SimpleNamespace(
+        chat=types.SimpleNamespace(id=1),
+        from_user=types.SimpleNamespace(id=1, username='ann', first_name='Ann', last_name='')
+    )
+    before = error_count('start_handler')
+    
+    with mock.patch.object(command_handler, 'get_async_firebase_service', return_value=failing_service()):
+        asyncio.run(bot.handlers['start_handler'](message))
+    
+    # The bot still greets the user without Firestore, the failure is counted
+    assert error_count('start_handler') == before + 1
+    assert bot.calls[-1][0] == 'send_photo'
+
+def test_timed_handler_counts_escaping_errors_once():
+    async def broken_handler(message):
+        raise ValueError('boom')
+    
+    handler = timed_handler(broken_handler)
+    before = error_count('broken_handler')
+    with pytest.raises(ValueError):
+        asyncio.run(handler(None))
+    assert error_count('broken_handler') == before + 1
+    
+    uncounted = timed_handler(broken_handler, name='uncounted_handler', count_errors=False)
+    with pytest.raises(ValueError):
+        asyncio.run(uncounted(None))
+    assert error_count('uncounted_handler') == 0
+
+def test_counter_and_histogram_render_in_text_format():
+    counter = Counter('test_total', 'Test counter', ('kind',))
+    counter.inc('a')
+    counter.inc('a', amount=2)
+    histogram = Histogram('test_seconds', 'Test histogram', buckets=(0.1, 1.0))
+    histogram.observe(0.5)
+    
+    assert counter.render() == ['# HELP test_total Test counter', '# TYPE test_total counter', 'test_total{kind="a"} 3']
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{le="0.1"} 0',
+        'test_seconds_bucket{le="1"} 1',
+        'test_seconds_bucket{le="+Inf"} 1',
+        'test_seconds_sum 0.5',
+        'test_seconds_count 1'
+    ]
+
+def test_metrics_authorization():
+    assert is_authorized(None, None)
+    assert is_authorized('Bearer secret', 'secret')
+    assert is_authorized('bearer secret', 'secret')
+    assert not is_authorized(None, 'secret')
+    assert not is_authorized('Bearer wrong', 'secret')
+    assert not is_authorized('Basic secret', 'secret')
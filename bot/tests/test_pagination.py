@@ -0,0 +1,157 @@
+"""Tests for pending page cursors and navigation"""
+import asyncio
+import types
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+import pytest
+from config import BotConfig
+from fake_firestore import FakeAsyncClient
+from firebase_service import AsyncFirebaseService
+from handlers import callback_handler
+from handlers.callback_handler import pending_page_callback, pending_page_navigation
+from pagination import EPOCH, cursor_key, cursor_values, decode_cursor, encode_cursor
+
+CREATED_AT = datetime(2024, 5, 17, 8, 30, 15, 123456, tzinfo=timezone.utc)
+
+def test_cursor_round_trip():
+    document = {'id': 'AbC123', 'created_at': CREATED_AT}
+    cursor = encode_cursor(document)
+    
+    assert cursor == '1715934615123456-AbC123'
+    assert decode_cursor(cursor) == cursor_key(document)
+
+def test_document_id_may_contain_separators():
+    document = {'id': 'a-b_c', 'created_at': CREATED_AT}
+    assert decode_cursor(encode_cursor(document)) == (1715934615123456, 'a-b_c')
+
+def test_naive_timestamps_are_utc():
+    naive = {'id': 'x', 'created_at': CREATED_AT.replace(tzinfo=None)}
+    assert cursor_key(naive) == cursor_key({'id': 'x', 'created_at': CREATED_AT})
+
+def test_missing_timestamp_sorts_first():
+    assert cursor_key({'id': 'x'}) == (0, 'x')
+    assert cursor_key({'id': 'x', 'created_at': 'not a timestamp'}) == (0, 'x')
+
+def test_cursor_fits_in_callback_data():
+    # Telegram limits callback_data to 64 bytes
+    document = {'id': 'A' * 20, 'created_at': CREATED_AT}
+    assert len(pending_page_callback('d', 'n', 9999, encode_cursor(document)).encode('utf-8')) <= 64
+
+@pytest.mark.parametrize('cursor', ['', '123', '123-', 'abc-x'])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_cursor_values():
+    values = cursor_values(encode_cursor({'id': 'AbC123', 'created_at': CREATED_AT}))
+    assert values == {'created_at': CREATED_AT, '__name__': 'AbC123'}
+    assert cursor_values('0-x')['created_at'] == EPOCH
+
+def make_documents(count):
+    return [{'id': f"T{index}", 'created_at': CREATED_AT + timedelta(seconds=index)} for index in range(count)]
+
+def navigation_targets(buttons):
+    return [tuple(callback_data.split('_')[1:4]) for _, callback_data in buttons]
+
+def test_first_page_walked_back_to_has_no_prev():
+    documents = make_documents(5)
+    buttons = pending_page_navigation('d', 'p', 0, 'cursor', documents, has_more=False)
+    assert navigation_targets(buttons) == [('d', 'n', '1')]
+
+def test_middle_pages_link_both_ways():
+    documents = make_documents(5)
+    forwards = pending_page_navigation('w', 'n', 2, 'cursor', documents, has_more=True)
+    backwards = pending_page_navigation('w', 'p', 2, 'cursor', documents, has_more=True)
+    
+    assert navigation_targets(forwards) == navigation_targets(backwards) == [('w', 'p', '1'), ('w', 'n', '3')]
+    assert forwards[0][1].endswith(encode_cursor(documents[0]))
+    assert forwards[1][1].endswith(encode_cursor(documents[-1]))
+
+def test_last_page_has_no_next():
+    buttons = pending_page_navigation('d', 'n', 1, 'cursor', make_documents(5), has_more=False)
+    assert navigation_targets(buttons) == [('d', 'p', '0')]
+
+def test_empty_next_page_leads_back():
+    # The rest of the list was approved while the admin read the previous page
+    buttons = pending_page_navigation('d', 'n', 3, 'cursor', [], has_more=False)
+    assert buttons == [("⬅️ Prev", 'pending_d_p_2_cursor')]
+
+def test_empty_prev_page_leads_forward():
+    buttons = pending_page_navigation('d', 'p', 1, 'cursor', [], has_more=False)
+    assert buttons == [("Next ➡️", 'pending_d_n_1_cursor')]
+
+def make_service(db):
+    with mock.patch('firebase_service.initialize_firebase_app'), \
+            mock.patch('firebase_service.firestore_async.client', return_value=db):
+        return AsyncFirebaseService()
+
+def test_pending_pages_read_in_both_directions():
+    db = FakeAsyncClient()
+    for document in make_documents(5):
+        db.put(f"deposits/{document['id']}", {'status': 'pending', 'created_at': document['created_at']})
+    service = make_service(db)
+    
+    first = asyncio.run(service.get_pending_deposits(limit=2))
+    second = asyncio.run(service.get_pending_deposits(limit=2, start_after=encode_cursor(first[-1])))
+    back = asyncio.run(service.get_pending_deposits(limit=2, end_before=encode_cursor(second[0])))
+    
+    assert [doc['id'] for doc in first] == ['T0', 'T1']
+    assert [doc['id'] for doc in second] == ['T2', 'T3']
+    assert back == first
+
+def test_backfill_gives_untimed_pending_documents_a_creation_time():
+    db = FakeAsyncClient()
+    db.put('deposits/old', {'status': 'pending', 'amount': 5})
+    db.put('deposits/new', {'status': 'pending', 'amount': 5, 'created_at': CREATED_AT})
+    db.put('withdrawals/done', {'status': 'approved', 'amount': 5})
+    service = make_service(db)
+    
+    # Documents without created_at are invisible to the ordered query
+    assert [doc['id'] for doc in asyncio.run(service.get_pending_deposits(limit=10))] == ['new']
+    
+    assert asyncio.run(service.backfill_pending_created_at()) == 1
+    
+    # The backfilled time is the document's create time, so it sorts before the newer deposit
+    assert db.data('deposits/old')['created_at'] == db.create_times['deposits/old']
+    assert 'created_at' not in db.data('withdrawals/done')
+    assert [doc['id'] for doc in asyncio.run(service.get_pending_deposits(limit=10))] == ['old', 'new']
+    assert asyncio.run(service.backfill_pending_created_at()) == 0
+
+class RecordingBot:
+    def __init__(self):
+        self.edits = []
+    
+    async def edit_message_text(self, **kwargs):
+        self.edits.append(kwargs)
+
+def show_page(db, direction, page, cursor):
+    bot = RecordingBot()
+    call = types.SimpleNamespace(
+        id='query',
+        from_user=types.SimpleNamespace(id=1),
+        message=types.SimpleNamespace(chat=types.SimpleNamespace(id=1), message_id=2)
+    )
+    with mock.patch.object(BotConfig, 'PENDING_PAGE_SIZE', 2), \
+            mock.patch.object(callback_handler, 'get_async_firebase_service', return_value=make_service(db)):
+        asyncio.run(callback_handler.handle_pending_page(bot, call, 'd', direction, page, cursor))
+    edit = bot.edits[-1]
+    buttons = [button.callback_data for row in edit['reply_markup'].keyboard for button in row]
+    return edit['text'], buttons
+
+def test_pages_are_numbered_by_position():
+    db = FakeAsyncClient()
+    documents = make_documents(5)
+    for document in documents:
+        db.put(f"deposits/{document['id']}", {'status': 'pending', 'amount': 1, 'created_at': document['created_at']})
+    
+    text, buttons = show_page(db, 'n', '1', encode_cursor(documents[1]))
+    assert '3. **ID:** `T2`' in text and '4. **ID:** `T3`' in text
+    assert buttons[:2] == [
+        pending_page_callback('d', 'p', 0, encode_cursor(documents[2])),
+        pending_page_callback('d', 'n', 2, encode_cursor(documents[3]))
+    ]
+    
+    # Walking back onto the first page shows no Prev button, even though the page is full
+    text, buttons = show_page(db, 'p', '0', encode_cursor(documents[2]))
+    assert '1. **ID:** `T0`' in text
+    assert buttons == [pending_page_callback('d', 'n', 1, encode_cursor(documents[1])), 'admin_pending']
@@ -0,0 +1,111 @@
+"""Tests for splitting admin reports into Telegram-sized messages"""
+import random
+import asyncio
+from report_renderer import EMPTY_REPORT_TEXT, TELEGRAM_MESSAGE_LIMIT, ReportBuilder, _plain_text, send_report, telegram_length
+
+def assert_valid_pages(report):
+    pages = report.pages()
+    # Spans cut in two are closed and reopened, so only the plain text survives unchanged
+    assert _plain_text(''.join(pages)) == _plain_text(report.render())
+    assert all(0 < telegram_length(page) <= report.limit for page in pages)
+    return pages
+
+def test_telegram_length_counts_utf16_code_units():
+    assert telegram_length('abc') == 3
+    assert telegram_length('é') == 1
+    assert telegram_length('💰') == 2
+    assert telegram_length('🟡 **Pending**') == 14
+
+def test_len_is_the_utf16_length_of_the_report():
+    report = ReportBuilder()
+    report.add('💰 ', 'Deposit')
+    report.add('')
+    assert len(report) == 10
+    assert report.render() == '💰 Deposit'
+
+def test_empty_report_has_no_pages():
+    assert ReportBuilder().pages() == []
+
+def test_short_report_is_one_page():
+    report = ReportBuilder()
+    report.add('a' * 100)
+    report.add('b' * 100)
+    assert report.pages() == ['a' * 100 + 'b' * 100]
+
+def test_blocks_are_not_split_across_pages():
+    report = ReportBuilder(limit=10)
+    for block in ('aaaa', 'bbbb', 'cccc'):
+        report.add(block)
+    assert assert_valid_pages(report) == ['aaaabbbb', 'cccc']
+
+def test_limit_is_measured_in_utf16_units():
+    # Four code points but eight UTF-16 units, so the second block needs a new page
+    report = ReportBuilder(limit=8)
+    report.add('💰💸🟡💰')
+    report.add('x')
+    assert assert_valid_pages(report) == ['💰💸🟡💰', 'x']
+    
+    report = ReportBuilder(limit=8)
+    report.add('💰💸🟡')
+    report.add('xy')
+    assert assert_valid_pages(report) == ['💰💸🟡xy']
+
+def test_oversized_block_is_split_at_line_breaks():
+    report = ReportBuilder(limit=12)
+    report.add('line1\nline2\nline3\n')
+    assert assert_valid_pages(report) == ['line1\nline2\n', 'line3\n']
+
+def test_oversized_line_is_cut_without_exceeding_the_limit():
+    report = ReportBuilder(limit=10)
+    report.add('💰' * 12)
+    pages = assert_valid_pages(report)
+    assert len(pages) == 3
+
+def test_long_line_is_cut_at_whitespace_outside_entities():
+    report = ReportBuilder(limit=20)
+    report.add('**bold words** and `code words` end')
+    assert assert_valid_pages(report) == ['**bold words** and ', '`code words` end']
+
+def test_entities_cut_in_two_are_closed_and_reopened():
+    report = ReportBuilder(limit=10)
+    report.add('**abcdefghijkl**')
+    assert assert_valid_pages(report) == ['**abcdef**', '**ghijkl**']
+    
+    report = ReportBuilder(limit=12)
+    report.add('**`abcdefghijkl`**')
+    assert assert_valid_pages(report) == ['**`abcdef`**', '**`ghijkl`**']
+
+def test_bold_markers_inside_code_are_literal():
+    report = ReportBuilder(limit=10)
+    report.add('`ab**cdefghij`')
+    assert assert_valid_pages(report) == ['`ab**cdef`', '`ghij`']
+
+def test_cut_never_leaves_a_marker_at_the_end_of_a_page():
+    report = ReportBuilder(limit=8)
+    report.add('abcdef**ghij**')
+    assert assert_valid_pages(report) == ['abcdef', '**ghij**']
+
+def test_random_reports_always_fit():
+    rng = random.Random(0)
+    alphabet = 'ab \n*é💰🟡─'
+    for limit in (16, 64, TELEGRAM_MESSAGE_LIMIT):
+        report = ReportBuilder(limit=limit)
+        for _ in range(200):
+            report.add(''.join(rng.choice(alphabet) for _ in range(rng.randint(1, limit * 2))))
+        assert_valid_pages(report)
+
+class RecordingBot:
+    def __init__(self):
+        self.calls = []
+    
+    async def edit_message_text(self, **kwargs):
+        self.calls.append(('edit_message_text', kwargs['text']))
+    
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append(('send_message', text))
+
+def test_empty_report_is_sent_as_a_placeholder():
+    bot = RecordingBot()
+    asyncio.run(send_report(bot, 1, ReportBuilder(), message_id=2))
+    asyncio.run(send_report(bot, 1, ReportBuilder()))
+    assert bot.calls == [('edit_message_text', EMPTY_REPORT_TEXT), ('send_message', EMPTY_REPORT_TEXT)]
@@ -0,0 +1,61 @@
+"""Tests for the admin flow session stores"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from fake_firestore import FakeAsyncClient
+from session_store import FirestoreSessionStore, MemorySessionStore, SessionRecord
+
+SESSION = {'state': 'waiting_amount', 'chat_id': 1, 'deposit_id': 'D1', 'bulk_ids': ['D1', 'D2']}
+
+def test_record_round_trip_drops_unset_fields():
+    assert SessionRecord.from_dict(SESSION).to_dict() == SESSION
+
+def test_record_rejects_unknown_fields():
+    with pytest.raises(AttributeError):
+        SessionRecord.from_dict({'state': 'x', 'unknown': 1})
+
+def test_memory_store_returns_copies():
+    store = MemorySessionStore(maxsize=10, ttl=60)
+    asyncio.run(store.set('1', SESSION))
+    
+    session = asyncio.run(store.get('1'))
+    session['bulk_ids'].append('D3')
+    
+    assert asyncio.run(store.get('1')) == SESSION
+    asyncio.run(store.delete('1'))
+    assert asyncio.run(store.get('1')) is None
+
+def test_memory_store_is_bounded_in_size_and_time():
+    now = [0.0]
+    store = MemorySessionStore(maxsize=2, ttl=60)
+    store._sessions._timer = lambda: now[0]
+    for user_id in ('1', '2', '3'):
+        asyncio.run(store.set(user_id, {'state': 'x'}))
+    
+    # The least recently used session was dropped to stay within maxsize
+    assert asyncio.run(store.get('1')) is None
+    assert asyncio.run(store.get('3')) == {'state': 'x'}
+    
+    now[0] = 60
+    assert asyncio.run(store.get('3')) is None
+
+def test_firestore_store_is_shared_between_instances():
+    db = FakeAsyncClient()
+    asyncio.run(FirestoreSessionStore(db, ttl=60).set('1', SESSION))
+    
+    # Another bot instance reads the same flow state
+    assert asyncio.run(FirestoreSessionStore(db, ttl=60).get('1')) == SESSION
+    expires_at = db.data('sessions/1')['expires_at']
+    assert timedelta(seconds=59) < expires_at - datetime.now(timezone.utc) <= timedelta(seconds=60)
+
+def test_firestore_store_ignores_expired_sessions():
+    db = FakeAsyncClient()
+    store = FirestoreSessionStore(db, ttl=60)
+    db.put('sessions/1', dict(SESSION, expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    
+    # The TTL policy deletes expired documents late, so reads check expires_at themselves
+    assert asyncio.run(store.get('1')) is None
+    
+    asyncio.run(store.set('1', SESSION))
+    asyncio.run(store.delete('1'))
+    assert db.data('sessions/1') is None
@@ -0,0 +1,106 @@
+"""Tests for the sharded statistics counters and their aggregation fallback"""
+import asyncio
+from unittest import mock
+from config import BotConfig
+from fake_firestore import FakeAsyncClient
+from firebase_service import AsyncFirebaseService, _statistics_from_shards
+
+def make_service(db):
+    with mock.patch('firebase_service.initialize_firebase_app'), \
+            mock.patch('firebase_service.firestore_async.client', return_value=db):
+        return AsyncFirebaseService()
+
+def seed(db):
+    db.put('deposits/D1', {'status': 'pending', 'amount': 10, 'user_id': '1'})
+    db.put('deposits/D2', {'status': 'approved', 'amount': 99, 'user_id': '1'})
+    db.put('withdrawals/W1', {'status': 'pending', 'amount': 4, 'user_id': '2'})
+    db.put('users/1', {'balance': 0})
+    db.put('users/2', {'balance': 0})
+
+def put_shard(db, shard_id, **fields):
+    db.put(f"stats/transactions/shards/{shard_id}", fields)
+
+def test_uninitialized_shards_are_not_trusted():
+    assert _statistics_from_shards([]) is None
+    assert _statistics_from_shards([{'pending_deposits_count': 3}]) is None
+
+def test_shards_are_summed():
+    stats = _statistics_from_shards([
+        {'initialized': True, 'pending_deposits_count': 2, 'total_deposit_amount': 20},
+        {'pending_deposits_count': 1, 'pending_withdrawals_count': 1, 'total_withdrawal_amount': 5}
+    ])
+    
+    assert stats['pending_deposits_count'] == 3
+    assert stats['total_pending'] == 4
+    assert stats['total_deposit_amount'] == 20
+    assert stats['total_withdrawal_amount'] == 5
+    assert 'total_users' not in stats
+
+def test_negative_counters_are_not_trusted():
+    shards = [
+        {'initialized': True, 'pending_deposits_count': 0},
+        {'pending_deposits_count': -1, 'total_deposit_amount': -10}
+    ]
+    assert _statistics_from_shards(shards) is None
+
+def test_statistics_are_aggregated_while_counters_are_disabled():
+    db = FakeAsyncClient()
+    seed(db)
+    put_shard(db, 0, initialized=True, pending_deposits_count=50)
+    service = make_service(db)
+    
+    with mock.patch.object(BotConfig, 'STATS_COUNTERS_ENABLED', False):
+        stats = asyncio.run(service.get_transaction_statistics())
+    
+    assert stats['pending_deposits_count'] == 1
+    assert stats['total_deposit_amount'] == 10
+    assert stats['pending_withdrawals_count'] == 1
+    assert stats['total_users'] == 2
+
+def test_enabled_counters_serve_pending_totals_and_count_users():
+    db = FakeAsyncClient()
+    seed(db)
+    put_shard(db, 0, initialized=True, pending_deposits_count=7, total_deposit_amount=70)
+    service = make_service(db)
+    
+    with mock.patch.object(BotConfig, 'STATS_COUNTERS_ENABLED', True):
+        stats = asyncio.run(service.get_transaction_statistics())
+    
+    assert stats['pending_deposits_count'] == 7
+    assert stats['total_deposit_amount'] == 70
+    # Users are counted directly, mini app signups never touch the shards
+    assert stats['total_users'] == 2
+
+def test_enabled_counters_fall_back_when_inconsistent():
+    db = FakeAsyncClient()
+    seed(db)
+    put_shard(db, 3, pending_deposits_count=-1)
+    service = make_service(db)
+    
+    with mock.patch.object(BotConfig, 'STATS_COUNTERS_ENABLED', True):
+        stats = asyncio.run(service.get_transaction_statistics())
+    
+    assert stats['pending_deposits_count'] == 1
+    # Reading the statistics never resets the shards
+    assert db.data('stats/transactions/shards/3') == {'pending_deposits_count': -1}
+
+def test_rebuild_resets_the_shards_to_the_aggregated_values():
+    db = FakeAsyncClient()
+    seed(db)
+    put_shard(db, 1, pending_deposits_count=-4)
+    service = make_service(db)
+    
+    stats = asyncio.run(service.rebuild_transaction_statistics())
+    
+    shards = [db.data(f"stats/transactions/shards/{index}") for index in range(BotConfig.STATS_SHARD_COUNT)]
+    assert _statistics_from_shards(shards)['pending_deposits_count'] == stats['pending_deposits_count'] == 1
+    assert shards[1]['pending_deposits_count'] == 0
+
+def test_new_users_are_created_without_touching_the_shards():
+    db = FakeAsyncClient()
+    service = make_service(db)
+    
+    assert asyncio.run(service.create_or_update_user({'user_id': 5, 'first_name': 'Ann'}))
+    
+    assert db.data('users/5')['balance'] == 0
+    assert not any(path.startswith('stats/') for path in db.documents)
@@ -0,0 +1,163 @@
+"""Tests for the outbound rate limiting primitives"""
+import asyncio
+import pytest
+from telebot import asyncio_helper
+from telebot.asyncio_helper import ApiTelegramException
+from metrics import install_request_timer
+from telegram_scheduler import PRIORITY_ADMIN, PRIORITY_BULK, PRIORITY_USER, OutboundScheduler, PriorityGate, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class CountingBucket:
+    """Bucket holding a number of tokens set by the test, refilled only by hand"""
+    
+    def __init__(self, tokens=0):
+        self.tokens = tokens
+    
+    def try_take(self):
+        if self.tokens > 0:
+            self.tokens -= 1
+            return 0.0
+        return 0.001
+
+def test_bucket_allows_a_burst_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+    assert [bucket.try_take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_take() == pytest.approx(0.5)
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+    for _ in range(3):
+        bucket.try_take()
+        
+    clock.now = 0.25
+    assert bucket.try_take() == pytest.approx(0.25)
+    clock.now = 0.5
+    assert bucket.try_take() == 0.0
+    
+    clock.now = 100
+    assert bucket.is_full()
+
+def test_reserve_goes_into_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+    assert not bucket.is_full()
+
+def test_pause_blocks_tokens_for_the_given_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=3, clock=clock)
+    bucket.pause(5)
+    assert bucket.try_take() == pytest.approx(6.0)
+    clock.now = 6
+    assert bucket.try_take() == 0.0
+
+def test_gate_passes_straight_through_while_tokens_are_available():
+    async def scenario():
+        gate = PriorityGate(CountingBucket(tokens=2))
+        await gate.acquire(PRIORITY_BULK)
+        await gate.acquire(PRIORITY_BULK)
+        return len(gate)
+        
+    assert asyncio.run(scenario()) == 0
+
+def test_gate_releases_waiters_by_priority_then_arrival():
+    async def scenario():
+        bucket = CountingBucket()
+        gate = PriorityGate(bucket)
+        order = []
+        
+        async def send(priority, name):
+            await gate.acquire(priority)
+            order.append(name)
+            
+        tasks = [
+            asyncio.create_task(send(PRIORITY_BULK, 'bulk 1')),
+            asyncio.create_task(send(PRIORITY_USER, 'user')),
+            asyncio.create_task(send(PRIORITY_BULK, 'bulk 2')),
+            asyncio.create_task(send(PRIORITY_ADMIN, 'admin'))
+        ]
+        await asyncio.sleep(0)
+        waiting = len(gate)
+        bucket.tokens = len(tasks)
+        await asyncio.gather(*tasks)
+        return waiting, order
+        
+    waiting, order = asyncio.run(scenario())
+    assert waiting == 4
+    assert order == ['admin', 'user', 'bulk 1', 'bulk 2']
+
+def test_cancelled_waiter_does_not_take_a_token():
+    async def scenario():
+        bucket = CountingBucket()
+        gate = PriorityGate(bucket)
+        cancelled = asyncio.create_task(gate.acquire(PRIORITY_ADMIN))
+        waiting = asyncio.create_task(gate.acquire(PRIORITY_USER))
+        await asyncio.sleep(0)
+        
+        cancelled.cancel()
+        bucket.tokens = 1
+        await waiting
+        return bucket.tokens, len(gate)
+        
+    assert asyncio.run(scenario()) == (0, 0)
+
+def rate_limited(retry_after):
+    async def process_request(token, url, method='get', params=None, files=None, **kwargs):
+        raise ApiTelegramException(url, None, {
+            'error_code': 429,
+            'description': 'Too Many Requests',
+            'parameters': {'retry_after': retry_after}
+        })
+    return process_request
+
+def send_rate_limited(scheduler, retry_after):
+    with pytest.raises(ApiTelegramException):
+        asyncio.run(scheduler.request(rate_limited(retry_after), 'token', 'sendMessage', params={'chat_id': 5}))
+
+def test_long_retry_after_pauses_every_chat():
+    scheduler = OutboundScheduler(global_rate=30, chat_rate=1, chat_burst=3, max_retries=0)
+    send_rate_limited(scheduler, 5)
+    
+    assert scheduler._chat_bucket(5).try_take() > 4
+    assert scheduler._gate.bucket.try_take() > 4
+
+def test_short_retry_after_pauses_only_its_chat():
+    scheduler = OutboundScheduler(global_rate=30, chat_rate=1, chat_burst=3, max_retries=0)
+    send_rate_limited(scheduler, 1)
+    
+    assert scheduler._chat_bucket(5).try_take() > 0
+    assert scheduler._gate.bucket.try_take() == 0.0
+
+def request_layers():
+    layers = []
+    process_request = asyncio_helper._process_request
+    while hasattr(process_request, 'request_layer'):
+        layers.append(process_request.request_layer)
+        process_request = process_request.__wrapped__
+    return layers, process_request
+
+@pytest.mark.parametrize('scheduler_first', [True, False])
+def test_request_hooks_nest_in_a_fixed_order_once(monkeypatch, scheduler_first):
+    async def process_request(token, url, method='get', params=None, files=None, **kwargs):
+        return url
+    monkeypatch.setattr(asyncio_helper, '_process_request', process_request)
+    scheduler = OutboundScheduler(global_rate=30, chat_rate=1, chat_burst=3)
+    
+    installs = [scheduler.install, install_request_timer]
+    if not scheduler_first:
+        installs.reverse()
+    for install in installs + installs:
+        install()
+        
+    assert request_layers() == (['scheduler', 'timer'], process_request)
+    assert asyncio.run(asyncio_helper._process_request('token', 'getMe')) == 'getMe'
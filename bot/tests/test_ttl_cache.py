@@ -0,0 +1,69 @@
+"""Tests for the LRU/TTL cache"""
+from ttl_cache import TTLCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_get_returns_stored_value_until_ttl_expires():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, timer=clock)
+    cache.set('a', 1)
+    
+    clock.now = 4.9
+    assert cache.get('a') == 1
+    
+    clock.now = 5.0
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+def test_set_restarts_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, timer=clock)
+    cache.set('a', 1)
+    clock.now = 4
+    cache.set('a', 2)
+    clock.now = 8
+    assert cache.get('a') == 2
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60, timer=FakeClock())
+    cache.set('a', 1)
+    cache.set('b', 2)
+    
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+def test_zero_maxsize_stores_nothing():
+    cache = TTLCache(maxsize=0, ttl=60, timer=FakeClock())
+    cache.set('a', 1)
+    assert cache.get('a', 'missing') == 'missing'
+
+def test_pop_and_clear():
+    cache = TTLCache(maxsize=10, ttl=60, timer=FakeClock())
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.pop('a')
+    cache.pop('unknown')
+    assert cache.get('a') is None
+    cache.clear()
+    assert len(cache) == 0
+
+def test_stats_count_hits_and_misses():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, timer=clock)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+    clock.now = 10
+    cache.get('a')
+    
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'size': 0, 'maxsize': 10}
@@ -0,0 +1,47 @@
+"""Tests for dropping redelivered webhook updates"""
+from update_dedup import UpdateDeduplicator, is_valid_update
+
+def test_repeated_update_id_is_a_duplicate():
+    deduplicator = UpdateDeduplicator(window=10)
+    assert deduplicator.is_duplicate(1) is False
+    assert deduplicator.is_duplicate(2) is False
+    assert deduplicator.is_duplicate(1) is True
+    assert deduplicator.duplicates == 1
+
+def test_only_the_last_window_update_ids_are_remembered():
+    deduplicator = UpdateDeduplicator(window=3)
+    for update_id in (1, 2, 3, 4):
+        deduplicator.is_duplicate(update_id)
+        
+    # 1 fell out of the window, 2-4 are still remembered
+    assert deduplicator.is_duplicate(1) is False
+    assert deduplicator.is_duplicate(3) is True
+    # Seeing 1 again pushed 2 out
+    assert deduplicator.is_duplicate(2) is False
+
+def test_duplicates_do_not_extend_the_window():
+    deduplicator = UpdateDeduplicator(window=2)
+    deduplicator.is_duplicate(1)
+    deduplicator.is_duplicate(1)
+    deduplicator.is_duplicate(2)
+    assert deduplicator.is_duplicate(1) is True
+
+def test_missing_update_id_is_never_a_duplicate():
+    deduplicator = UpdateDeduplicator(window=10)
+    assert deduplicator.is_duplicate(None) is False
+    assert deduplicator.is_duplicate(None) is False
+
+def test_zero_window_disables_deduplication():
+    deduplicator = UpdateDeduplicator(window=0)
+    assert deduplicator.is_duplicate(1) is False
+    assert deduplicator.is_duplicate(1) is False
+    assert deduplicator.duplicates == 0
+
+def test_only_update_objects_are_valid():
+    assert is_valid_update({'update_id': 1, 'message': {}})
+    assert is_valid_update({'message': {}})
+    assert not is_valid_update([{'update_id': 1}])
+    assert not is_valid_update('update')
+    assert not is_valid_update(None)
+    assert not is_valid_update({'update_id': [1]})
+    assert not is_valid_update({'update_id': True})
@@ -0,0 +1,75 @@
+"""Tests for the bounded queue behind the ack-first webhook"""
+import asyncio
+from update_queue import UpdateQueue
+
+def test_queued_updates_are_processed_and_drained():
+    processed = []
+    
+    async def process(update_dict):
+        await asyncio.sleep(0)
+        if update_dict['update_id'] == 2:
+            raise RuntimeError('handler failed')
+        processed.append(update_dict['update_id'])
+    
+    async def run():
+        queue = UpdateQueue(process, maxsize=10, workers=2)
+        queue.start()
+        accepted = [queue.submit({'update_id': update_id}) for update_id in range(5)]
+        remaining = await queue.drain()
+        return queue, accepted, remaining
+    
+    queue, accepted, remaining = asyncio.run(run())
+    
+    assert accepted == [True] * 5 and remaining == 0
+    assert sorted(processed) == [0, 1, 3, 4]
+    # A failing update is counted and the worker carries on
+    assert queue.stats() == {
+        'depth': 0, 'max_depth': 5, 'capacity': 10, 'workers': 0,
+        'enqueued': 5, 'processed': 4, 'failed': 1, 'rejected': 0
+    }
+
+def test_full_or_stopped_queue_refuses_updates():
+    async def run():
+        blocked = asyncio.Event()
+        
+        async def process(update_dict):
+            await blocked.wait()
+        
+        queue = UpdateQueue(process, maxsize=1, workers=1)
+        refused_before_start = queue.submit({'update_id': 0})
+        queue.start()
+        first = queue.submit({'update_id': 1})
+        # Let the worker take the first update, then fill the single slot
+        await asyncio.sleep(0)
+        second = queue.submit({'update_id': 2})
+        full = queue.submit({'update_id': 3})
+        blocked.set()
+        await queue.drain()
+        after_drain = queue.submit({'update_id': 4})
+        return queue, (refused_before_start, first, second, full, after_drain)
+    
+    queue, accepted = asyncio.run(run())
+    
+    # The caller processes refused updates itself, that is the backpressure
+    assert accepted == (False, True, True, False, False)
+    assert queue.rejected == 3
+    assert queue.processed == 2
+
+def test_drain_gives_up_after_the_timeout():
+    async def run():
+        async def process(update_dict):
+            await asyncio.sleep(60)
+        
+        queue = UpdateQueue(process, maxsize=10, workers=1)
+        queue.start()
+        for update_id in range(3):
+            queue.submit({'update_id': update_id})
+        await asyncio.sleep(0)
+        remaining = await queue.drain(timeout=0.01)
+        return queue, remaining
+    
+    queue, remaining = asyncio.run(run())
+    
+    # One update was in progress when the worker was cancelled, two never started
+    assert remaining == 2
+    assert not queue.is_running
@@ -0,0 +1,53 @@
+"""Tests for writing users on /start without reading them first"""
+import asyncio
+from unittest import mock
+from fake_firestore import FakeAsyncClient, FakeDocumentReference
+from firebase_service import AsyncFirebaseService
+
+def make_service(db):
+    with mock.patch('firebase_service.initialize_firebase_app'), \
+            mock.patch('firebase_service.firestore_async.client', return_value=db):
+        return AsyncFirebaseService()
+
+def start(service, **profile):
+    user_data = dict({'user_id': 1, 'first_name': 'Ann', 'username': 'ann'}, **profile)
+    
+    async def no_reads(reference, transaction=None):
+        raise AssertionError(f"{reference.path} was read")
+    
+    with mock.patch.object(FakeDocumentReference, 'get', no_reads):
+        return asyncio.run(service.create_or_update_user(user_data))
+
+def test_new_user_is_created_with_a_zero_balance():
+    db = FakeAsyncClient()
+    
+    assert start(make_service(db))
+    
+    user = db.data('users/1')
+    assert (user['first_name'], user['balance']) == ('Ann', 0)
+    assert 'created_at' in user
+
+def test_existing_user_keeps_balance_and_creation_time():
+    db = FakeAsyncClient()
+    start(make_service(db))
+    created_at = db.data('users/1')['created_at']
+    db.put('users/1', dict(db.data('users/1'), balance=75))
+    
+    # A fresh instance does not know the user and falls back from create to a merge
+    assert start(make_service(db), first_name='Anna', balance=0)
+    
+    user = db.data('users/1')
+    assert (user['first_name'], user['balance'], user['created_at']) == ('Anna', 75, created_at)
+    assert user['updated_at'] > created_at
+
+def test_known_user_is_merged_without_trying_to_create():
+    db = FakeAsyncClient()
+    service = make_service(db)
+    start(service)
+    kinds = []
+    db.before_commit = lambda writes: kinds.extend(kind for kind, *_ in writes)
+    
+    assert start(service, username='ann2')
+    
+    assert kinds == ['set']
+    assert db.data('users/1')['username'] == 'ann2'
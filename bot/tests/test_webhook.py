@@ -0,0 +1,87 @@
+"""Tests for rejecting malformed webhook bodies and bounding the wait for an update"""
+import asyncio
+import concurrent.futures
+import json
+import threading
+import types
+import urllib.error
+import urllib.request
+from http.server import HTTPServer
+from unittest import mock
+import pytest
+import server
+import webhook
+from config import BotConfig
+
+class RecordingBot:
+    def __init__(self, error=None):
+        self.updates = []
+        self.timeouts = []
+        self.error = error
+    
+    def process_update_threadsafe(self, update_dict, timeout=None):
+        self.updates.append(update_dict)
+        self.timeouts.append(timeout)
+        if self.error is not None:
+            raise self.error
+    
+    async def process_update(self, update_dict):
+        self.updates.append(update_dict)
+
+@pytest.fixture
+def post():
+    httpd = HTTPServer(('127.0.0.1', 0), webhook.Handler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    
+    def send(body):
+        request = urllib.request.Request(f"http://127.0.0.1:{httpd.server_port}/", data=body, method='POST')
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    
+    yield send
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.mark.parametrize('body', [b'[1, 2]', b'"update"', b'{"update_id": [1]}', b'not json', b'\xff'])
+def test_webhook_rejects_bodies_that_are_not_updates(post, body):
+    bot = RecordingBot()
+    with mock.patch.object(webhook, 'get_investment_bot', return_value=bot), \
+            mock.patch.object(BotConfig, 'UPDATE_QUEUE_ENABLED', False):
+        assert post(body) == 400
+    assert bot.updates == []
+
+def test_webhook_bounds_the_wait_for_an_update(post):
+    bot = RecordingBot(error=concurrent.futures.TimeoutError())
+    with mock.patch.object(webhook, 'get_investment_bot', return_value=bot), \
+            mock.patch.object(BotConfig, 'UPDATE_QUEUE_ENABLED', False), \
+            mock.patch.object(BotConfig, 'WEBHOOK_PROCESS_TIMEOUT', 3.0):
+        # Telegram still gets its answer when processing outlives the timeout
+        assert post(json.dumps({'update_id': 1, 'message': {}}).encode('utf-8')) == 200
+    assert bot.timeouts == [3.0]
+
+def make_request(body):
+    bot = RecordingBot()
+    
+    async def read_json():
+        return json.loads(body)
+    
+    return types.SimpleNamespace(json=read_json, app={server.INVESTMENT_BOT_KEY: bot}), bot
+
+@pytest.mark.parametrize('body', ['[1, 2]', '"update"', '{"update_id": "1"}'])
+def test_server_rejects_bodies_that_are_not_updates(body):
+    request, bot = make_request(body)
+    with mock.patch.object(BotConfig, 'UPDATE_QUEUE_ENABLED', False):
+        response = asyncio.run(server.handle_update(request))
+    assert response.status == 400
+    assert bot.updates == []
+
+def test_server_processes_updates():
+    request, bot = make_request('{"update_id": 1, "message": {}}')
+    with mock.patch.object(BotConfig, 'UPDATE_QUEUE_ENABLED', False):
+        response = asyncio.run(server.handle_update(request))
+    assert response.status == 200
+    assert bot.updates == [{'update_id': 1, 'message': {}}]
@@ -0,0 +1,94 @@
+"""Tests for the write-behind buffer"""
+import asyncio
+from unittest import mock
+from config import BotConfig
+from fake_firestore import FakeAsyncClient
+from firebase_service import AsyncFirebaseService
+from write_buffer import WriteBehindBuffer
+
+class FakeRef:
+    def __init__(self, path):
+        self.path = path
+
+def test_writes_to_one_document_are_coalesced():
+    buffer = WriteBehindBuffer(max_pending=10)
+    ref = FakeRef('users/1')
+    buffer.add(ref, {'first_name': 'A', 'last_activity': 1})
+    buffer.add(FakeRef('users/1'), {'last_activity': 2})
+    
+    assert len(buffer) == 1
+    assert buffer.coalesced == 1
+    assert buffer.drain() == [(ref, {'first_name': 'A', 'last_activity': 2})]
+    assert len(buffer) == 0
+
+def test_add_reports_when_threshold_is_reached():
+    buffer = WriteBehindBuffer(max_pending=2)
+    assert buffer.add(FakeRef('users/1'), {'a': 1}) is False
+    assert buffer.add(FakeRef('users/1'), {'a': 2}) is False
+    assert buffer.add(FakeRef('users/2'), {'a': 1}) is True
+
+def test_add_copies_fields():
+    buffer = WriteBehindBuffer(max_pending=10)
+    fields = {'a': 1}
+    buffer.add(FakeRef('users/1'), fields)
+    buffer.add(FakeRef('users/1'), {'b': 2})
+    assert fields == {'a': 1}
+
+def test_requeue_keeps_newer_fields():
+    buffer = WriteBehindBuffer(max_pending=10)
+    ref = FakeRef('users/1')
+    buffer.add(ref, {'first_name': 'A', 'last_activity': 1})
+    failed = buffer.drain()
+    
+    # A newer write arrived while the flush was failing
+    buffer.add(ref, {'last_activity': 2})
+    buffer.requeue(failed)
+    
+    assert buffer.drain() == [(ref, {'first_name': 'A', 'last_activity': 2})]
+
+def test_requeue_into_empty_buffer():
+    buffer = WriteBehindBuffer(max_pending=10)
+    buffer.add(FakeRef('users/1'), {'a': 1})
+    failed = buffer.drain()
+    buffer.requeue(failed)
+    assert [(ref.path, fields) for ref, fields in buffer.drain()] == [('users/1', {'a': 1})]
+
+def make_service(db):
+    with mock.patch('firebase_service.initialize_firebase_app'), \
+            mock.patch('firebase_service.firestore_async.client', return_value=db):
+        return AsyncFirebaseService()
+
+def touch_user(service, first_name):
+    return service.create_or_update_user({'user_id': 1, 'first_name': first_name})
+
+def test_users_are_written_through_without_a_flusher():
+    db = FakeAsyncClient()
+    db.put('users/1', {'first_name': 'A', 'balance': 5})
+    service = make_service(db)
+    
+    with mock.patch.object(BotConfig, 'WRITE_BEHIND_ENABLED', True):
+        asyncio.run(touch_user(service, 'B'))
+        
+    assert service.get_pending_user_writes() == 0
+    assert db.data('users/1')['first_name'] == 'B'
+
+def test_flusher_buffers_writes_and_flushes_them_when_stopped():
+    db = FakeAsyncClient()
+    db.put('users/1', {'first_name': 'A', 'balance': 5})
+    service = make_service(db)
+    
+    async def scenario():
+        flusher = asyncio.create_task(service.run_write_behind(interval=60))
+        await asyncio.sleep(0)
+        await touch_user(service, 'B')
+        await touch_user(service, 'C')
+        pending = service.get_pending_user_writes()
+        buffered_name = db.data('users/1')['first_name']
+        
+        flusher.cancel()
+        await asyncio.gather(flusher, return_exceptions=True)
+        return pending, buffered_name
+        
+    assert asyncio.run(scenario()) == (1, 'A')
+    assert db.data('users/1')['first_name'] == 'C'
+    assert db.data('users/1')['balance'] == 5
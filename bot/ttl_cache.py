@@ -0,0 +1,98 @@
+"""
+Size-bounded cache with per-entry TTL and least-recently-used eviction
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time to live"""
+    
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        """
+        Initialize cache
+        
+        Args:
+            maxsize (int): Maximum number of entries kept
+            ttl (float): Seconds an entry stays valid after it was stored
+            timer (callable): Clock returning seconds, monotonic by default
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, default=None):
+        """
+        Get a cached value and mark it as recently used
+        
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+            
+        Returns:
+            Cached value or default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._timer():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+    
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entries when full
+        
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        if self.maxsize <= 0:
+            return
+            
+        with self._lock:
+            self._entries[key] = (self._timer() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def pop(self, key):
+        """
+        Remove an entry
+        
+        Args:
+            key: Cache key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        """
+        Get cache counters
+        
+        Returns:
+            dict: Hits, misses and current size
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize
+        }
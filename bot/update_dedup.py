@@ -0,0 +1,60 @@
+"""
+Fixed-size window of recently seen update_ids for dropping redelivered webhook updates
+"""
+import threading
+from collections import deque
+
+class UpdateDeduplicator:
+    """Remembers the last N update_ids in a ring buffer with a set for constant-time lookups"""
+    
+    def __init__(self, window=1000):
+        """
+        Initialize deduplicator
+        
+        Args:
+            window (int): Number of most recent update_ids remembered, 0 disables de-duplication
+        """
+        self.window = window
+        self._order = deque()
+        self._seen = set()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+    
+    def is_duplicate(self, update_id):
+        """
+        Record an update_id and check whether it was already seen
+        
+        Args:
+            update_id (int): update_id of an incoming update, None is never a duplicate
+            
+        Returns:
+            bool: True if the update was seen within the window and must be dropped
+        """
+        if update_id is None or self.window <= 0:
+            return False
+            
+        with self._lock:
+            if update_id in self._seen:
+                self.duplicates += 1
+                return True
+                
+            self._seen.add(update_id)
+            self._order.append(update_id)
+            if len(self._order) > self.window:
+                self._seen.discard(self._order.popleft())
+            return False
+
+def is_valid_update(payload):
+    """
+    Check that a decoded webhook body has the shape of a Telegram update
+    
+    Args:
+        payload: JSON-decoded request body
+        
+    Returns:
+        bool: True for an object whose update_id, if present, is an integer
+    """
+    if not isinstance(payload, dict):
+        return False
+    update_id = payload.get('update_id')
+    return update_id is None or (isinstance(update_id, int) and not isinstance(update_id, bool))
@@ -0,0 +1,138 @@
+"""
+Bounded in-process queue that lets the webhook acknowledge updates before processing them
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UpdateQueue:
+    """Buffers incoming updates and processes them with a fixed number of async workers"""
+    
+    def __init__(self, process, maxsize=1000, workers=8):
+        """
+        Initialize update queue
+        
+        Args:
+            process (callable): Coroutine called with each raw update dict
+            maxsize (int): Updates buffered before submit() refuses more
+            workers (int): Updates processed concurrently
+        """
+        self.process = process
+        self.maxsize = maxsize
+        self.workers = workers
+        self._queue = None
+        self._worker_tasks = []
+        self._closing = False
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_depth = 0
+    
+    @property
+    def depth(self):
+        """Number of updates waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    @property
+    def is_running(self):
+        """Check whether workers are draining the queue"""
+        return bool(self._worker_tasks) and not self._closing
+    
+    def start(self):
+        """Start the workers on the running event loop"""
+        if self._worker_tasks:
+            return
+            
+        self._closing = False
+        self._queue = asyncio.Queue(self.maxsize)
+        loop = asyncio.get_running_loop()
+        self._worker_tasks = [
+            loop.create_task(self._work(), name=f'update-worker-{index}')
+            for index in range(self.workers)
+        ]
+        logger.info(f"Update queue started with {self.workers} workers and room for {self.maxsize} updates")
+    
+    def submit(self, update_dict):
+        """
+        Queue an update for processing
+        
+        Args:
+            update_dict (dict): Raw Telegram update
+            
+        Returns:
+            bool: False if the queue is full or shutting down, the caller must process it itself
+        """
+        if not self.is_running:
+            self.rejected += 1
+            return False
+            
+        try:
+            self._queue.put_nowait(update_dict)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Update queue full at {self.maxsize} updates")
+            return False
+            
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+    
+    async def _work(self):
+        """Process queued updates until cancelled"""
+        while True:
+            update_dict = await self._queue.get()
+            try:
+                await self.process(update_dict)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing queued update: {e}")
+            finally:
+                self._queue.task_done()
+    
+    async def drain(self, timeout=None):
+        """
+        Stop accepting updates, wait for the queued ones and stop the workers
+        
+        Args:
+            timeout (float): Seconds to wait for the queue to empty, None to wait until it does
+            
+        Returns:
+            int: Updates left unprocessed because the timeout expired
+        """
+        if not self._worker_tasks:
+            return 0
+            
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Update queue drain timed out with {self.depth} updates left")
+            
+        remaining = self.depth
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        logger.info(f"Update queue drained, {self.processed} updates processed")
+        return remaining
+    
+    def stats(self):
+        """
+        Get queue metrics
+        
+        Returns:
+            dict: Current and peak depth and update counters
+        """
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'capacity': self.maxsize,
+            'workers': len(self._worker_tasks),
+            'enqueued': self.enqueued,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected
+        }
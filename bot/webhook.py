@@ -4,17 +4,31 @@ Telegram Bot Webhook Handler - Refactored for Scalability
 import logging
 import json
 import asyncio
+import concurrent.futures
+import threading
+import time
 from http.server import BaseHTTPRequestHandler
 from telebot.async_telebot import AsyncTeleBot
-from telebot import types
+from telebot import types, asyncio_helper
 
 # Import configuration and services
 from config import BotConfig
-from firebase_service import get_firebase_service
+from http_session import TelegramSessionManager
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, QUEUE_DEPTH, UPDATE_DURATION, UPDATES,
+    install_request_timer, instrument_bot, is_authorized, render_metrics, update_type
+)
+from services import get_async_firebase_service
+from telegram_scheduler import get_outbound_scheduler
+from update_dedup import UpdateDeduplicator, is_valid_update
+from update_queue import UpdateQueue
 
 # Import separated handlers
 from handlers import setup_command_handlers, setup_callback_handlers, setup_message_handlers
 
+# Text returned by health-check GET requests
+STATUS_TEXT = 'Investment Bot v2.0 - Running with separated handlers!'
+
 # Configure logging
 logging.basicConfig(
     level=getattr(logging, BotConfig.LOG_LEVEL),
@@ -28,9 +42,21 @@ class InvestmentBot:
     def __init__(self):
         """Initialize the bot application"""
         self.bot = None
-        self.firebase_service = None
+        self.session_manager = None
+        self._firebase_service = None
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self.update_deduplicator = UpdateDeduplicator(BotConfig.UPDATE_DEDUP_WINDOW)
+        self.update_queue = UpdateQueue(
+            self._process_update,
+            maxsize=BotConfig.UPDATE_QUEUE_SIZE,
+            workers=BotConfig.UPDATE_QUEUE_WORKERS
+        )
         self._initialize_services()
         self._setup_handlers()
+        if BotConfig.METRICS_ENABLED:
+            self._setup_metrics()
     
     def _initialize_services(self):
         """Initialize bot and external services"""
@@ -39,13 +65,25 @@ class InvestmentBot:
             BotConfig.validate()
             logger.info("Configuration validated successfully")
             
-            # Initialize bot
+            # Initialize bot, Firebase is initialized by the first handler that needs it
             self.bot = AsyncTeleBot(BotConfig.BOT_TOKEN)
             logger.info("Bot initialized successfully")
             
-            # Initialize Firebase service
-            self.firebase_service = get_firebase_service()
-            logger.info("Firebase service initialized successfully")
+            # Outgoing requests reuse pooled keep-alive connections of this bot's session manager
+            self.session_manager = TelegramSessionManager(
+                limit=BotConfig.TELEGRAM_POOL_LIMIT,
+                keepalive_timeout=BotConfig.TELEGRAM_KEEPALIVE_TIMEOUT,
+                dns_cache_ttl=BotConfig.TELEGRAM_DNS_CACHE_TTL
+            )
+            asyncio_helper.session_manager = self.session_manager
+            
+            # The timer always nests inside the scheduler, so rate limit waits are not counted as latency
+            if BotConfig.METRICS_ENABLED:
+                install_request_timer()
+            
+            # Every send and edit goes through the global and per-chat rate limits
+            if BotConfig.TELEGRAM_SCHEDULER_ENABLED:
+                get_outbound_scheduler().install()
             
         except ValueError as e:
             logger.error(f"Configuration error: {e}")
@@ -54,6 +92,14 @@ class InvestmentBot:
             logger.error(f"Failed to initialize services: {e}")
             raise
     
+    @property
+    def firebase_service(self):
+        """Firebase service, created on first access"""
+        if self._firebase_service is None:
+            self._firebase_service = get_async_firebase_service()
+            logger.info("Firebase service initialized successfully")
+        return self._firebase_service
+    
     def _setup_handlers(self):
         """Setup all bot handlers"""
         try:
@@ -73,38 +119,200 @@ class InvestmentBot:
             logger.error(f"Failed to setup handlers: {e}")
             raise
     
+    def _setup_metrics(self):
+        """Record handler latency and errors and queue depths"""
+        instrument_bot(self.bot)
+        QUEUE_DEPTH.set_function(lambda: self.update_queue.depth, 'updates')
+        QUEUE_DEPTH.set_function(lambda: get_outbound_scheduler().queue_depth, 'telegram_outbound')
+        QUEUE_DEPTH.set_function(
+            lambda: self._firebase_service.get_pending_user_writes() if self._firebase_service is not None else None,
+            'user_writes'
+        )
+        if not BotConfig.METRICS_TOKEN:
+            logger.warning(f"METRICS_TOKEN is not set, {BotConfig.METRICS_PATH} is served without authentication")
+        logger.info("Metrics setup complete")
+    
+    def _is_duplicate(self, update_dict):
+        """Check whether Telegram already delivered this update, before it is parsed"""
+        if self.update_deduplicator.is_duplicate(update_dict.get('update_id')):
+            logger.info(f"Dropped duplicate update {update_dict.get('update_id')}")
+            UPDATES.inc(update_type(update_dict), 'duplicate')
+            return True
+        return False
+    
     async def process_update(self, update_dict):
-        """Process incoming Telegram update"""
+        """Process incoming Telegram update unless it is a redelivery"""
+        if not self._is_duplicate(update_dict):
+            await self._process_update(update_dict)
+    
+    async def _process_update(self, update_dict):
+        """Parse and dispatch an update"""
+        kind = update_type(update_dict)
+        started = time.perf_counter()
         try:
             update = types.Update.de_json(update_dict)
             await self.bot.process_new_updates([update])
+            UPDATES.inc(kind, 'processed')
         except Exception as e:
+            UPDATES.inc(kind, 'error')
             logger.error(f"Error processing update: {e}")
+        finally:
+            UPDATE_DURATION.observe(time.perf_counter() - started, kind)
+    
+    async def enqueue_update(self, update_dict):
+        """
+        Queue an update for the background workers so the webhook can answer at once
+        
+        A full queue applies backpressure: the update is processed before returning.
+        
+        Args:
+            update_dict (dict): Raw Telegram update
+        """
+        if self._is_duplicate(update_dict):
+            return
+        
+        self.update_queue.start()
+        if not self.update_queue.submit(update_dict):
+            await self._process_update(update_dict)
+    
+    def get_event_loop(self):
+        """
+        Get the long-lived event loop, starting it in a background thread on first use
+        
+        Returns:
+            asyncio.AbstractEventLoop: Event loop shared by all updates of this process
+        """
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='investment-bot-loop',
+                    daemon=True
+                )
+                self._loop_thread.start()
+                logger.info("Bot event loop started")
+            return self._loop
+    
+    def process_update_threadsafe(self, update_dict, timeout=None):
+        """
+        Process an update from synchronous code on the shared event loop
+        
+        Args:
+            update_dict (dict): Raw Telegram update
+            timeout (float): Seconds to wait for processing, None to wait until done
+        """
+        loop = self.get_event_loop()
+        future = asyncio.run_coroutine_threadsafe(self.process_update(update_dict), loop)
+        future.result(timeout)
+    
+    def enqueue_update_threadsafe(self, update_dict, timeout=None):
+        """
+        Queue an update from synchronous code on the shared event loop
+        
+        Args:
+            update_dict (dict): Raw Telegram update
+            timeout (float): Seconds to wait, only reached when a full queue processes inline
+        """
+        loop = self.get_event_loop()
+        future = asyncio.run_coroutine_threadsafe(self.enqueue_update(update_dict), loop)
+        future.result(timeout)
+    
+    async def close(self):
+        """Finish queued updates, flush buffered writes and release network resources held by the bot"""
+        await self.update_queue.drain(BotConfig.UPDATE_QUEUE_DRAIN_TIMEOUT)
+        
+        if self._firebase_service is not None:
+            await self._firebase_service.flush_user_writes()
+        
+        try:
+            await self.session_manager.close()
+        except Exception as e:
+            logger.warning(f"Error closing bot session: {e}")
+    
+    def shutdown(self):
+        """Close the bot and stop the background event loop if it is running"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = None
+            self._loop_thread = None
+        
+        if loop is None or loop.is_closed():
+            return
+        
+        asyncio.run_coroutine_threadsafe(self.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        logger.info("Bot event loop stopped")
     
     def get_bot(self):
         """Get bot instance"""
         return self.bot
 
-# Global bot instance
-investment_bot = InvestmentBot()
-bot = investment_bot.get_bot()
+# Global bot instance, created by the first request so cold starts only pay for what they use
+investment_bot = None
+_investment_bot_lock = threading.Lock()
+
+def get_investment_bot():
+    """Get the global bot application, creating it on first use"""
+    global investment_bot
+    with _investment_bot_lock:
+        if investment_bot is None:
+            investment_bot = InvestmentBot()
+        return investment_bot
 
 # HTTP Server Handler
 class Handler(BaseHTTPRequestHandler):
     def do_POST(self):
-        content_length = int(self.headers['Content-Length'])
+        content_length = int(self.headers.get('Content-Length', 0))
         post_data = self.rfile.read(content_length)
-        update_dict = json.loads(post_data.decode('utf-8'))
+        try:
+            update_dict = json.loads(post_data.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.warning(f"Rejected malformed update: {e}")
+            self.send_response(400)
+            self.end_headers()
+            return
+        if not is_valid_update(update_dict):
+            logger.warning(f"Rejected update that is not a Telegram update object: {type(update_dict).__name__}")
+            self.send_response(400)
+            self.end_headers()
+            return
         
-        asyncio.run(investment_bot.process_update(update_dict))
+        # Reuse the process-wide event loop instead of creating one per update
+        timeout = BotConfig.WEBHOOK_PROCESS_TIMEOUT
+        try:
+            if BotConfig.UPDATE_QUEUE_ENABLED:
+                get_investment_bot().enqueue_update_threadsafe(update_dict, timeout)
+            else:
+                get_investment_bot().process_update_threadsafe(update_dict, timeout)
+        except concurrent.futures.TimeoutError:
+            # Processing goes on in the background, a redelivery would be dropped as a duplicate anyway
+            logger.warning(f"Update {update_dict.get('update_id')} still processing after {timeout}s, answering Telegram")
         
         self.send_response(200)
         self.end_headers()
     
     def do_GET(self):
+        if BotConfig.METRICS_ENABLED and self.path.split('?', 1)[0] == BotConfig.METRICS_PATH:
+            if not is_authorized(self.headers.get('Authorization'), BotConfig.METRICS_TOKEN):
+                self.send_response(401)
+                self.send_header('WWW-Authenticate', 'Bearer')
+                self.end_headers()
+                return
+                
+            # Metrics of this instance only, every serverless instance counts separately
+            body = render_metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+            self.end_headers()
+            self.wfile.write(body)
+            return
+            
         self.send_response(200)
         self.end_headers()
-        self.wfile.write('Investment Bot v2.0 - Running with separated handlers!'.encode('utf-8'))
+        self.wfile.write(STATUS_TEXT.encode('utf-8'))
         
 # Start polling
 # if __name__ == '__main__':
@@ -5,7 +5,7 @@ from http.server import BaseHTTPRequestHandler
 from telebot.async_telebot import AsyncTeleBot
 from telebot import types
 from config import BotConfig
-from firebase_service import get_firebase_service
+from firebase_service import get_async_firebase_service
 
 # Configure logging
 logging.basicConfig(
@@ -26,7 +26,7 @@ bot = AsyncTeleBot(BotConfig.BOT_TOKEN)
 
 # Initialize Firebase service
 try:
-    firebase_service = get_firebase_service()
+    firebase_service = get_async_firebase_service()
     logger.info("Firebase service initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize Firebase service: {e}")
@@ -135,7 +135,7 @@ async def start_handler(message):
         }
         
         # Store user data in Firebase
-        success = firebase_service.create_or_update_user(user_data)
+        success = await firebase_service.create_or_update_user(user_data)
         
         if success:
             logger.info(f"User data stored successfully for user {user_id}")
@@ -0,0 +1,71 @@
+"""
+Write-behind buffer that coalesces merge writes per document
+"""
+import threading
+
+class WriteBehindBuffer:
+    """Keeps the latest pending fields per document until they are flushed"""
+    
+    def __init__(self, max_pending):
+        """
+        Initialize write buffer
+        
+        Args:
+            max_pending (int): Number of buffered documents that triggers a flush
+        """
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+    
+    def add(self, doc_ref, fields):
+        """
+        Buffer a merge write, folding it into any pending write for the same document
+        
+        Args:
+            doc_ref: Firestore document reference
+            fields (dict): Fields to merge into the document
+            
+        Returns:
+            bool: True if the buffer reached its size threshold
+        """
+        with self._lock:
+            entry = self._pending.get(doc_ref.path)
+            if entry is not None:
+                entry[1].update(fields)
+                self.coalesced += 1
+            else:
+                self._pending[doc_ref.path] = (doc_ref, dict(fields))
+            return len(self._pending) >= self.max_pending
+    
+    def drain(self):
+        """
+        Take every buffered write, leaving the buffer empty
+        
+        Returns:
+            list: (document reference, fields) pairs
+        """
+        with self._lock:
+            writes = list(self._pending.values())
+            self._pending.clear()
+            return writes
+    
+    def requeue(self, writes):
+        """
+        Put back writes that failed to flush without overriding newer buffered fields
+        
+        Args:
+            writes (list): (document reference, fields) pairs returned by drain
+        """
+        with self._lock:
+            for doc_ref, fields in writes:
+                entry = self._pending.get(doc_ref.path)
+                if entry is not None:
+                    merged = dict(fields)
+                    merged.update(entry[1])
+                    self._pending[doc_ref.path] = (doc_ref, merged)
+                else:
+                    self._pending[doc_ref.path] = (doc_ref, fields)
+    
+    def __len__(self):
+        return len(self._pending)